@@ -0,0 +1,85 @@
+"""
+Benchmarks the indexed VoiceMatcher against a full scan with thefuzz's process.extractOne, on a synthetic voice catalog.
+
+Run it from the root of the repository, e.g.:
+
+    python -m benchmarks.matcher_benchmark --voices 10000 --queries 200
+
+The names and queries are generated from --seed. Most queries are misspelled catalog names, and the rest are random letters that usually match nothing.
+Every query is answered by both, and the benchmark exits with an AssertionError if any result differs.
+"""
+import argparse
+import random
+import statistics
+import string
+import time
+from sitcom_simulator.script.integrations.fakeyou.voice_matcher import VoiceMatcher
+
+SYLLABLES = ["ma", "ri", "lu", "gi", "pe", "ach", "bow", "ser", "to", "ad", "yo", "shi", "kir", "by", "don", "key", "kong", "wa", "zel", "da", "link", "gan", "non", "sam", "us"]
+
+def synthetic_names(count: int, rng: random.Random) -> list[str]:
+    """
+    Returns the given number of made-up character names, mostly single words like FakeYou's pure names, with some multi-word ones.
+    """
+    def word():
+        return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).capitalize()
+    return [word() if rng.random() < 0.9 else f"{word()} {word()}" for _ in range(count)]
+
+def misspelled(name: str, rng: random.Random) -> str:
+    """
+    Returns the name with a random typo: a dropped, doubled or swapped letter, or a change of case.
+    """
+    i = rng.randrange(len(name))
+    typo = rng.choice(["drop", "double", "swap", "case"])
+    if typo == "drop" and len(name) > 1:
+        return name[:i] + name[i+1:]
+    if typo == "double":
+        return name[:i] + name[i] + name[i:]
+    if typo == "swap" and i < len(name) - 1:
+        return name[:i] + name[i+1] + name[i] + name[i+2:]
+    return name.lower()
+
+def main():
+    from thefuzz import process
+
+    parser = argparse.ArgumentParser(description="Benchmark the indexed voice matcher against a full scan")
+    parser.add_argument('--voices', type=int, default=10000, help="the number of voices in the synthetic catalog")
+    parser.add_argument('--queries', type=int, default=200, help="the number of names to look up")
+    parser.add_argument('--score-cutoff', type=float, default=75, help="the minimum similarity score out of 100")
+    parser.add_argument('--seed', type=int, default=0, help="the seed of the names and queries")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    names = synthetic_names(args.voices, rng)
+    queries = [
+        misspelled(rng.choice(names), rng) if rng.random() < 0.8
+        else "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 12)))
+        for _ in range(args.queries)
+    ]
+
+    start = time.perf_counter()
+    matcher = VoiceMatcher(names)
+    build_seconds = time.perf_counter() - start
+
+    indexed_seconds = []
+    scan_seconds = []
+    for query in queries:
+        start = time.perf_counter()
+        indexed = matcher.best_match(query, score_cutoff=args.score_cutoff)
+        indexed_seconds.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        scanned = process.extractOne(query, names, score_cutoff=args.score_cutoff)
+        scan_seconds.append(time.perf_counter() - start)
+
+        assert indexed == scanned, f"{query!r}: the matcher returned {indexed}, the full scan {scanned}"
+
+    matched = sum(1 for query in queries if matcher.best_match(query, score_cutoff=args.score_cutoff))
+    print(f"{args.voices} voices, {args.queries} queries ({matched} matched), same results from both")
+    print(f"building the index: {build_seconds * 1000:.0f} ms")
+    print(f"{'lookup':<20}{'mean ms':>10}{'median ms':>11}{'max ms':>9}")
+    for name, seconds in [("VoiceMatcher", indexed_seconds), ("process.extractOne", scan_seconds)]:
+        print(f"{name:<20}{statistics.mean(seconds) * 1000:>10.2f}{statistics.median(seconds) * 1000:>11.2f}{max(seconds) * 1000:>9.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,357 @@
+"""
+Reproducible render benchmarks, run on a synthetic script so they need no API keys or network access.
+
+Run them from the root of the repository, e.g.:
+
+    python -m benchmarks.render_benchmark engines --clips 12 --repeat 3
+
+The script's images (random shapes) and voices (sine tones) are generated from --seed,
+so two runs with the same arguments render exactly the same video. Compare results on the same machine only.
+Needs ffmpeg on the PATH, and the drawtext filter unless every caption is drawn with Pillow.
+
+Each row reports:
+    wall s: the median wall time of the render
+    cpu s: the CPU time of this process and every ffmpeg it ran
+    written MB: the bytes this process and its ffmpegs wrote to the filesystem, including intermediate files
+    output MB: the size of the rendered file
+"""
+import argparse
+import os
+import random
+import resource
+import statistics
+import tempfile
+import time
+from dataclasses import dataclass
+from typing import Callable
+from sitcom_simulator import artifacts
+from sitcom_simulator.models import Script, Clip, Character, ScriptMetadata
+from sitcom_simulator.video.integrations import ffmpeg as render
+
+SPEECHES = [
+    "Luigi, I'm hungry. Do you mind if I have a bite of your soul?",
+    "Absolutely not, Mario! My soul is not food!",
+    "A fierce battle ensues as Luigi fights to protect his soul.",
+    "Let's end this, Mario! No soul-eating today.",
+    "Fine. But I'm ordering a pizza, and you're paying for it.",
+    "Meanwhile, in the castle, Peach wonders where everyone went.",
+]
+
+@dataclass
+class Measurement:
+    """
+    What one benchmark case cost. See the module docstring for what each field measures.
+    """
+    seconds: float
+    cpu_seconds: float
+    written_bytes: int
+    output_bytes: int
+
+def synthetic_script(directory: str, clip_count: int=8, width: int=720, height: int=1280, seed: int=0) -> Script:
+    """
+    Returns a script shaped like a generated sitcom: a title card, then clips that each have an image, a voice and a caption.
+    The images, voices and background music are written to the given directory.
+
+    :param directory: The directory to write the assets to
+    :param clip_count: The number of clips after the title card
+    :param width: The width of the images
+    :param height: The height of the images
+    :param seed: The seed of the assets, so the same arguments always produce the same script
+    """
+    import ffmpeg
+    from PIL import Image, ImageDraw
+    rng = random.Random(seed)
+
+    clips = [Clip(speaker=None, speech=None, image_prompt=None, image_path=None, image_url=None, audio_url=None, audio_path=None, title="Benchmark", duration="2")]
+    for i in range(clip_count):
+        # detailed images, so the encoder has real work to do (a solid color compresses to nothing)
+        image = Image.new('RGB', (width, height), color=tuple(rng.randrange(256) for _ in range(3)))
+        draw = ImageDraw.Draw(image)
+        for _ in range(40):
+            x, y = rng.randrange(width), rng.randrange(height)
+            size = rng.randrange(20, width // 2)
+            draw.ellipse((x, y, x + size, y + size), fill=tuple(rng.randrange(256) for _ in range(3)))
+        image_path = os.path.join(directory, f"image_{i}.png")
+        image.save(image_path)
+
+        audio_path = os.path.join(directory, f"voice_{i}.wav")
+        ffmpeg.input(f"sine=frequency={rng.randrange(200, 800)}:duration={rng.uniform(1.5, 4):.2f}", f='lavfi').output(audio_path, ac=1, ar=24000).overwrite_output().run(quiet=True)
+
+        clips.append(Clip(speaker="Mario", speech=SPEECHES[i % len(SPEECHES)], image_prompt=None, image_path=image_path, image_url=None, audio_url=None, audio_path=audio_path, title=None, duration=None))
+
+    bgm_path = os.path.join(directory, "bgm.wav")
+    ffmpeg.input("sine=frequency=110:duration=120", f='lavfi').output(bgm_path).overwrite_output().run(quiet=True)
+    metadata = ScriptMetadata(title="Benchmark", bgm_style=None, bgm_path=bgm_path, bgm_url=None, art_style=None, prompt=None, orientation="portrait")
+    return Script(characters=[Character(name="Mario", voice_token="")], clips=clips, metadata=metadata)
+
+def measure(run: Callable[[], str | None], repeat: int=1) -> Measurement:
+    """
+    Runs a render the given number of times and returns the median of its measurements.
+
+    :param run: A function that renders something and returns the path of the output file, or None if it has no output file
+    :param repeat: The number of times to run it
+    """
+    measurements = []
+    for _ in range(repeat):
+        cpu_before, written_before = _usage()
+        start = time.perf_counter()
+        output_path = run()
+        seconds = time.perf_counter() - start
+        cpu_after, written_after = _usage()
+        measurements.append(Measurement(
+            seconds=seconds,
+            cpu_seconds=cpu_after - cpu_before,
+            written_bytes=written_after - written_before,
+            output_bytes=os.path.getsize(output_path) if output_path else 0,
+        ))
+    return Measurement(
+        seconds=statistics.median(m.seconds for m in measurements),
+        cpu_seconds=statistics.median(m.cpu_seconds for m in measurements),
+        written_bytes=round(statistics.median(m.written_bytes for m in measurements)),
+        output_bytes=round(statistics.median(m.output_bytes for m in measurements)),
+    )
+
+def _usage() -> tuple[float, int]:
+    """
+    Returns the CPU seconds and bytes written so far by this process and its finished children.
+    """
+    cpu_seconds = 0.0
+    written_bytes = 0
+    for who in [resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN]:
+        usage = resource.getrusage(who)
+        cpu_seconds += usage.ru_utime + usage.ru_stime
+        written_bytes += usage.ru_oublock * 512 # the kernel counts writes in 512-byte blocks
+    return cpu_seconds, written_bytes
+
+def print_table(title: str, rows: list[tuple[str, Measurement]]):
+    print(f"\n{title}")
+    print(f"{'case':<24}{'wall s':>9}{'cpu s':>9}{'written MB':>12}{'output MB':>11}")
+    for name, m in rows:
+        print(f"{name:<24}{m.seconds:>9.2f}{m.cpu_seconds:>9.2f}{m.written_bytes / 1e6:>12.1f}{m.output_bytes / 1e6:>11.2f}")
+
+def bench_engines(script: Script, args, directory: str) -> list[tuple[str, Measurement]]:
+    """
+    Renders the whole script with each render engine, e.g. to compare the single encode of single_pass
+    with the intermediate clip files and second encode of the two-stage clips engine.
+    """
+    rows = []
+    for engine in args.engines:
+        def run():
+            with artifacts.Lease() as lease:
+                return render.render_video(
+                    script,
+                    output_path=os.path.join(directory, f"engine_{engine}.mp4"),
+                    engine=engine,
+                    encoder_profile=args.profile,
+                    lease=lease,
+                    **_render_options(args),
+                )
+        rows.append((engine, measure(run, repeat=args.repeat)))
+    return rows
+
+def bench_captions(script: Script, args, directory: str) -> list[tuple[str, Measurement]]:
+    """
+    Renders each clip of the script on its own with each caption engine and reports the mean per clip,
+    e.g. to compare drawing the caption on every frame (drawtext) with overlaying an image rasterized once (pillow).
+    """
+    return [
+        (f"{caption_engine} per clip", _measure_clips(
+            script,
+            args,
+            pan_and_zoom=not args.no_pan_and_zoom,
+            clip_settings=render.ClipSettings(pan_and_zoom_engine=args.pan_and_zoom_engine),
+            caption_settings=render.CaptionSettings(font=args.font, engine=caption_engine),
+        ))
+        for caption_engine in args.caption_engines
+    ]
+
+def bench_pan_and_zoom(script: Script, args, directory: str) -> list[tuple[str, Measurement]]:
+    """
+    Renders each clip of the script on its own with each pan and zoom engine and reports the mean per clip,
+    e.g. to compare ffmpeg's zoompan on an upscaled image with warping the image at the output size with Pillow.
+    The clips are also rendered without pan and zoom, as the baseline.
+    """
+    caption_settings = render.CaptionSettings(font=args.font, engine=args.caption_engine)
+    rows = [("none per clip", _measure_clips(script, args, pan_and_zoom=False, clip_settings=render.ClipSettings(), caption_settings=caption_settings))]
+    for pan_and_zoom_engine in args.pan_and_zoom_engines:
+        rows.append((f"{pan_and_zoom_engine} per clip", _measure_clips(
+            script,
+            args,
+            pan_and_zoom=True,
+            clip_settings=render.ClipSettings(pan_and_zoom_engine=pan_and_zoom_engine),
+            caption_settings=caption_settings,
+        )))
+    return rows
+
+def _measure_clips(script: Script, args, pan_and_zoom: bool, clip_settings: render.ClipSettings, caption_settings: render.CaptionSettings) -> Measurement:
+    """
+    Renders each clip of the script on its own and returns the mean measurement per clip.
+    """
+    store = artifacts.get_store()
+    measurements = []
+    for clip in script.clips:
+        clips = []
+        def run():
+            # a new lease each time, so every run rasterizes its caption again
+            with artifacts.Lease() as lease:
+                clips.append(render.render_clip(
+                    clip,
+                    width=args.width,
+                    height=args.height,
+                    pan_and_zoom=pan_and_zoom,
+                    clip_settings=clip_settings,
+                    caption_settings=caption_settings,
+                    encoder_settings=render.ENCODER_PROFILES[args.profile].intermediate,
+                    lease=lease,
+                ))
+                return clips[-1]
+        measurements.append(measure(run, repeat=args.repeat))
+        for path in clips:
+            store.release(path)
+    return _mean(measurements)
+
+def bench_profiles(script: Script, args, directory: str) -> list[tuple[str, Measurement]]:
+    """
+    Renders the whole script with each encoder profile and render engine, and once more like the CLI's --draft mode
+    (the draft profile at a lower resolution and frame rate, without pan and zoom), to compare wall time with output size.
+    """
+    from sitcom_simulator.video.video_generator import DRAFT_RESOLUTION, DRAFT_FRAME_RATE
+    rows = []
+    for engine in args.engines:
+        for profile in args.profiles:
+            def run():
+                with artifacts.Lease() as lease:
+                    return render.render_video(
+                        script,
+                        output_path=os.path.join(directory, f"profile_{profile}_{engine}.mp4"),
+                        engine=engine,
+                        encoder_profile=profile,
+                        lease=lease,
+                        **_render_options(args),
+                    )
+            rows.append((f"{profile} {engine}", measure(run, repeat=args.repeat)))
+
+        def run_draft_mode():
+            scale = min(1, DRAFT_RESOLUTION / min(args.width, args.height))
+            options = {
+                **_render_options(args),
+                # x264 needs even dimensions
+                'width': round(args.width * scale / 2) * 2,
+                'height': round(args.height * scale / 2) * 2,
+                'pan_and_zoom': False,
+                'clip_settings': render.ClipSettings(pan_and_zoom_engine=args.pan_and_zoom_engine, frame_rate=DRAFT_FRAME_RATE),
+            }
+            with artifacts.Lease() as lease:
+                return render.render_video(
+                    script,
+                    output_path=os.path.join(directory, f"draft_mode_{engine}.mp4"),
+                    engine=engine,
+                    encoder_profile="draft",
+                    lease=lease,
+                    **options,
+                )
+        rows.append((f"--draft {engine}", measure(run_draft_mode, repeat=args.repeat)))
+    return rows
+
+def bench_music(script: Script, args, directory: str) -> list[tuple[str, Measurement]]:
+    """
+    Joins the same pre-rendered clips with the background music mixed in, once with the music brought to --bgm-volume by a static gain
+    (its loudness measured ahead of time, as for every downloaded song) and once with the loudnorm filter that was used before,
+    which analyzes the music while rendering. The video is stream-copied, so the rows differ only in the audio mix.
+    Also reports the one-off cost of measuring the music's loudness.
+    """
+    from unittest import mock
+    from sitcom_simulator.music import loudness
+    store_path = os.path.join(directory, "music_loudness.json") # keep the benchmark's measurement out of the real cache
+    encoder_settings = render.ENCODER_PROFILES[args.profile].final
+    with artifacts.Lease() as lease:
+        clips = [
+            render.render_clip(
+                clip,
+                width=args.width,
+                height=args.height,
+                pan_and_zoom=False,
+                clip_settings=render.ClipSettings(),
+                caption_settings=render.CaptionSettings(font=args.font, engine=args.caption_engine),
+                encoder_settings=encoder_settings,
+                lease=lease,
+            )
+            for clip in script.clips
+        ]
+        durations = [render.clip_duration(clip) for clip in script.clips]
+
+        def run(name: str):
+            return lambda: render.concatenate_clips(
+                clips,
+                os.path.join(directory, f"music_{name}.mp4"),
+                background_music=script.metadata.bgm_path,
+                bgm_volume=args.bgm_volume,
+                stream_copy=True,
+                durations=durations,
+            )
+
+        def run_measurement():
+            loudness.measure_loudness(script.metadata.bgm_path)
+
+        rows = [("measure loudness once", measure(run_measurement, repeat=args.repeat))]
+        with mock.patch.object(loudness, 'default_store_path', return_value=store_path):
+            assert loudness.track_loudness(script.metadata.bgm_path) is not None, "the background music's loudness couldn't be measured"
+            rows.append(("static gain", measure(run("static_gain"), repeat=args.repeat)))
+        with mock.patch.object(loudness, 'track_loudness', return_value=None): # as if it couldn't be measured
+            rows.append(("loudnorm", measure(run("loudnorm"), repeat=args.repeat)))
+    return rows
+
+def _mean(measurements: list[Measurement]) -> Measurement:
+    return Measurement(
+        seconds=statistics.mean(m.seconds for m in measurements),
+        cpu_seconds=statistics.mean(m.cpu_seconds for m in measurements),
+        written_bytes=round(statistics.mean(m.written_bytes for m in measurements)),
+        output_bytes=round(statistics.mean(m.output_bytes for m in measurements)),
+    )
+
+def _render_options(args) -> dict:
+    return dict(
+        width=args.width,
+        height=args.height,
+        pan_and_zoom=not args.no_pan_and_zoom,
+        max_workers=args.workers,
+        clip_settings=render.ClipSettings(pan_and_zoom_engine=args.pan_and_zoom_engine),
+        caption_settings=render.CaptionSettings(font=args.font, engine=args.caption_engine),
+    )
+
+BENCHMARKS = {
+    "engines": bench_engines,
+    "captions": bench_captions,
+    "profiles": bench_profiles,
+    "pan_and_zoom": bench_pan_and_zoom,
+    "music": bench_music,
+}
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark video rendering on a synthetic script")
+    parser.add_argument('benchmark', choices=list(BENCHMARKS), help="engines: wall time and disk writes of each render engine. captions: encode time per clip of each caption engine. profiles: wall time and output size of each encoder profile and engine. pan_and_zoom: encode time per clip of each pan and zoom engine. music: time to mix in the background music with a static gain and with loudnorm")
+    parser.add_argument('--clips', type=int, default=8, help="the number of speaking clips in the script")
+    parser.add_argument('--width', type=int, default=720, help="the width of the video")
+    parser.add_argument('--height', type=int, default=1280, help="the height of the video")
+    parser.add_argument('--seed', type=int, default=0, help="the seed of the synthetic script")
+    parser.add_argument('--repeat', type=int, default=1, help="render each case this many times and report the median")
+    parser.add_argument('--workers', type=int, default=1, help="the number of clips to render in parallel")
+    parser.add_argument('--font', type=str, default='Arial', help="the caption font")
+    parser.add_argument('--engines', nargs='+', default=['clips', 'stream_copy', 'single_pass'], choices=['clips', 'stream_copy', 'single_pass'], help="the render engines to compare")
+    parser.add_argument('--profile', type=str, default='final', choices=list(render.ENCODER_PROFILES), help="the encoder profile, except in the profiles benchmark")
+    parser.add_argument('--profiles', nargs='+', default=list(render.ENCODER_PROFILES), choices=list(render.ENCODER_PROFILES), help="the encoder profiles to compare in the profiles benchmark")
+    parser.add_argument('--caption-engines', nargs='+', default=['drawtext', 'pillow'], choices=['drawtext', 'pillow'], help="the caption engines to compare")
+    parser.add_argument('--no-pan-and-zoom', action='store_true', help="disable pan and zoom, e.g. to isolate the cost of the captions")
+    parser.add_argument('--pan-and-zoom-engine', type=str, default='zoompan', choices=['zoompan', 'pillow'], help="how the pan and zoom effect is rendered")
+    parser.add_argument('--pan-and-zoom-engines', nargs='+', default=['zoompan', 'pillow'], choices=['zoompan', 'pillow'], help="the pan and zoom engines to compare")
+    parser.add_argument('--bgm-volume', type=float, default=-24, help="the loudness of the background music in LUFS, in the music benchmark")
+    parser.add_argument('--caption-engine', type=str, default='drawtext', choices=['drawtext', 'pillow'], help="how captions are drawn")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="sitcom-benchmark-") as directory:
+        script = synthetic_script(directory, clip_count=args.clips, width=args.width, height=args.height, seed=args.seed)
+        rows = BENCHMARKS[args.benchmark](script, args, directory)
+    print_table(f"{args.benchmark}: {args.clips} clips at {args.width}x{args.height}, median of {args.repeat}", rows)
+
+if __name__ == "__main__":
+    main()
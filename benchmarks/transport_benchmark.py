@@ -0,0 +1,195 @@
+"""
+Benchmarks of the shared HTTP transport against a local stub server, so they need no network access.
+
+Run them from the root of the repository, e.g.:
+
+    python -m benchmarks.transport_benchmark connections --requests 50
+    python -m benchmarks.transport_benchmark download --sizes 16 64 256
+
+Each benchmark also checks the behavior it measures, and exits with an AssertionError if it doesn't hold.
+"""
+import argparse
+import multiprocessing
+import os
+import re
+import resource
+import tempfile
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from sitcom_simulator import transport
+
+class StubServer(ThreadingHTTPServer):
+    """
+    A keep-alive HTTP server on a free local port that counts the connections it accepts and the requests to each path.
+
+    GET /ok answers with a small body. GET /flaky/<name> answers 503 to the first request for each name, then like /ok.
+    GET /file/<bytes> streams a file of that size (see file_content), and honors Range requests.
+    GET /interrupted/<bytes>/<name> does the same, except the first request for each name is cut off halfway through.
+    """
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), _StubHandler)
+        self.connections = 0
+        self.requests: Counter[str] = Counter()
+        self.counter_lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def process_request(self, request, client_address):
+        with self.counter_lock:
+            self.connections += 1
+        super().process_request(request, client_address)
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1' # keep connections alive between requests
+    disable_nagle_algorithm = True # otherwise each response on a kept-alive connection waits for a delayed ACK
+    server: StubServer
+
+    def do_GET(self):
+        with self.server.counter_lock:
+            self.server.requests[self.path] += 1
+            count = self.server.requests[self.path]
+        if self.path.startswith('/flaky/') and count == 1:
+            self._respond(503, b'')
+        elif match := re.match(r'/(file|interrupted)/(\d+)', self.path):
+            self._send_file(int(match[2]), interrupt=match[1] == 'interrupted' and count == 1)
+        else:
+            self._respond(200, b'ok')
+
+    def _send_file(self, size: int, interrupt: bool):
+        range_match = re.match(r'bytes=(\d+)-', self.headers.get('Range', ''))
+        start = int(range_match[1]) if range_match else 0
+        self.send_response(206 if range_match else 200)
+        if range_match:
+            self.send_header('Content-Range', f"bytes {start}-{size - 1}/{size}")
+        self.send_header('Content-Length', str(size - start))
+        self.end_headers()
+        end = size // 2 if interrupt else size
+        position = start
+        while position < end:
+            chunk = file_content(position, min(FILE_CHUNK_SIZE, end - position))
+            self.wfile.write(chunk)
+            position += len(chunk)
+        if interrupt:
+            self.close_connection = True
+
+    def _respond(self, status: int, body: bytes):
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass # keep the benchmark output readable
+
+FILE_CHUNK_SIZE = 64 * 1024
+_PATTERN = bytes(range(256)) * (FILE_CHUNK_SIZE // 256 + 1)
+
+def file_content(offset: int, length: int) -> bytes:
+    """
+    Returns the bytes of the stub server's files from the given offset. Every file is the same repeating pattern, so a download can be checked without keeping a copy.
+    """
+    start = offset % 256
+    return _PATTERN[start:start + length]
+
+def bench_connections(args):
+    """
+    Sends the same GET requests with a new connection each time (plain requests.get) and with the shared transport session,
+    and reports how many connections (and so TCP handshakes, and TLS handshakes for HTTPS) each needed.
+    Then checks that the transport retries a 503.
+    """
+    import requests
+
+    print(f"{'client':<16}{'requests':>10}{'connections':>13}{'seconds':>10}")
+    for name, get in [("requests.get", requests.get), ("transport.get", transport.get)]:
+        with StubServer() as server:
+            start = time.perf_counter()
+            for _ in range(args.requests):
+                get(f"{server.url}/ok").raise_for_status()
+            seconds = time.perf_counter() - start
+            print(f"{name:<16}{args.requests:>10}{server.connections:>13}{seconds:>10.3f}")
+            if get is transport.get:
+                assert server.connections == 1, f"the transport opened {server.connections} connections for {args.requests} requests"
+
+    with StubServer() as server:
+        response = transport.get(f"{server.url}/flaky/retry")
+        assert response.status_code == 200, f"the transport returned {response.status_code} instead of retrying"
+        assert server.requests['/flaky/retry'] == 2, f"the server saw {server.requests['/flaky/retry']} requests instead of 2"
+    print("transport.get retried a 503 and got a 200")
+
+def bench_download(args):
+    """
+    Downloads files of increasing size in a fresh process each, with transport.download and by reading the whole response
+    into memory (response.content, which is how files were downloaded before), and reports how much each grew the process's peak RSS.
+    Then checks that an interrupted download resumes with a Range request and produces the complete file.
+    """
+    context = multiprocessing.get_context('spawn') # a fresh process per download, so each peak RSS is its own
+    print(f"{'size MB':>8}{'transport.download MB':>24}{'response.content MB':>22}")
+    with StubServer() as server, tempfile.TemporaryDirectory(prefix="sitcom-benchmark-") as directory:
+        for size_mb in args.sizes:
+            url = f"{server.url}/file/{size_mb * 1024 * 1024}"
+            peaks = []
+            for streamed in [True, False]:
+                with context.Pool(1) as pool:
+                    peaks.append(pool.apply(_download_peak_rss, (url, os.path.join(directory, "file"), streamed)))
+            print(f"{size_mb:>8}{peaks[0] / 1e6:>24.1f}{peaks[1] / 1e6:>22.1f}")
+
+        size = 8 * 1024 * 1024
+        destination = os.path.join(directory, "resumed")
+        transport.download(f"{server.url}/interrupted/{size}/resume", destination)
+        assert server.requests[f'/interrupted/{size}/resume'] == 2, "the interrupted download wasn't resumed"
+        assert os.path.getsize(destination) == size, f"the resumed download has {os.path.getsize(destination)} bytes instead of {size}"
+        with open(destination, 'rb') as f:
+            offset = 0
+            while chunk := f.read(FILE_CHUNK_SIZE):
+                assert chunk == file_content(offset, len(chunk)), f"the resumed download is corrupt at byte {offset}"
+                offset += len(chunk)
+    print("transport.download resumed an interrupted download and got the complete file")
+
+def _download_peak_rss(url: str, destination: str, streamed: bool) -> int:
+    """
+    Downloads the file and returns how many bytes the download added to this process's peak RSS.
+    """
+    import requests
+    # load everything a download needs first, so it isn't counted
+    requests.get(url.rsplit('/', 1)[0] + "/0")
+    transport.get(url.rsplit('/', 1)[0] + "/0")
+    before = _peak_rss()
+    if streamed:
+        transport.download(url, destination)
+    else:
+        with open(destination, 'wb') as f:
+            f.write(requests.get(url).content)
+    return _peak_rss() - before
+
+def _peak_rss() -> int:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024 # Linux reports kilobytes
+
+BENCHMARKS = {
+    "connections": bench_connections,
+    "download": bench_download,
+}
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the shared HTTP transport against a local stub server")
+    parser.add_argument('benchmark', choices=list(BENCHMARKS), help="connections: connections opened per request with and without the shared session, and retries of a 503. download: peak memory of streamed and whole-response downloads, and resuming an interrupted download")
+    parser.add_argument('--requests', type=int, default=20, help="the number of requests to send with each client")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[16, 64, 256], help="the sizes of the files to download, in MB")
+    args = parser.parse_args()
+    BENCHMARKS[args.benchmark](args)
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,11 @@
 from dotenv import load_dotenv
 load_dotenv()
 
-from .script import write_script, script_from_file
-from .speech import add_voices, generate_voices
-from .image import add_images, generate_images
-from .video import render_video
-from .music import add_music, generate_music
-from .auto import create_sitcom
\ No newline at end of file
+from .script import write_script, awrite_script, script_from_file
+from .speech import add_voices, generate_voices, aadd_voices, agenerate_voices
+from .image import add_images, generate_images, aadd_images, agenerate_images
+from .video import render_video, arender_video
+from .music import add_music, generate_music, aadd_music, agenerate_music
+from .pipeline import add_assets, aadd_assets
+from .auto import create_sitcom, acreate_sitcom
+from .batch import render_batch, render_batch_dir
\ No newline at end of file
@@ -0,0 +1,19 @@
+import asyncio
+from typing import Awaitable
+
+async def gather(*awaitables: Awaitable) -> list:
+    """
+    Runs the awaitables concurrently and returns their results in order.
+
+    Unlike asyncio.gather, the first failure cancels the others and waits for them to stop before it is raised,
+    so a failed job doesn't leave the rest running in the background. Unlike asyncio.TaskGroup,
+    the failure is raised as-is rather than in an ExceptionGroup, like the synchronous API raises it.
+    """
+    tasks = [asyncio.ensure_future(awaitable) for awaitable in awaitables]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
@@ -0,0 +1,209 @@
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Callable
+from .cache import DiskCache, DEFAULT_MAX_BYTES, hash_file
+
+SCRATCH_MAX_AGE_SECONDS = 24 * 60 * 60 # scratch files this old were left behind by a crashed run
+
+class ArtifactStore(ABC):
+    """
+    Where generated files (voices, images, rendered clips, ...) live while they are in use.
+
+    Generators write each file to a scratch_path and hand the finished file to add,
+    which stores it and returns its permanent path with one hold on it.
+    Held files are never deleted. Once every hold is released, the store may delete the file to stay within its quota.
+    Hold files for as long as they are needed with a Lease. A file adopted without one is not held at all.
+
+    Subclass it and implement every method to keep artifacts somewhere else, and install the subclass with configure.
+    """
+    @abstractmethod
+    def scratch_path(self, suffix:str='') -> str:
+        """
+        Returns a fresh path for writing a file that will be passed to add.
+
+        :param suffix: The file extension, e.g. '.wav'
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def add(self, path: str, suffix: str | None = None) -> str:
+        """
+        Moves a finished file into the store and returns its path in the store, with one hold on it.
+
+        :param path: The path of the file, usually from scratch_path
+        :param suffix: The file extension. Defaults to the extension of path
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def hold(self, path: str):
+        """
+        Adds a hold on a stored file, so it can't be deleted until it is released.
+
+        :param path: The path returned by add
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def release(self, path: str):
+        """
+        Releases one hold on a stored file.
+
+        :param path: The path returned by add
+        """
+        raise NotImplementedError
+
+class LocalArtifactStore(DiskCache, ArtifactStore):
+    """
+    The default artifact store: a content-addressed directory under the sitcom simulator cache directory.
+
+    Identical files (e.g. the same image downloaded twice) are stored once. When the store grows past max_bytes,
+    the least recently used files without a hold are deleted. Holds only last as long as the process,
+    and scratch files left behind by crashed runs are deleted the next time the store is opened.
+
+    :param max_bytes: The disk quota of the store
+    :param root: The directory that holds the store's directory. Defaults to CACHE_ROOT
+    """
+    def __init__(self, max_bytes:int=DEFAULT_MAX_BYTES, root: str | None = None):
+        super().__init__("artifacts", max_bytes=max_bytes, root=root)
+        self._remove_stale_scratch_files()
+
+    def scratch_path(self, suffix:str='') -> str:
+        return self.temp_path(suffix=suffix)
+
+    def add(self, path: str, suffix: str | None = None) -> str:
+        suffix = os.path.splitext(path)[1] if suffix is None else suffix
+        key = hash_file(path)
+        existing = self.get(key, suffix=suffix, hold=True)
+        if existing:
+            os.remove(path)
+            return existing
+        return self.put(key, path, suffix=suffix, move=True, hold=True)
+
+    def _remove_stale_scratch_files(self):
+        cutoff = time.time() - SCRATCH_MAX_AGE_SECONDS
+        for dirpath, _, filenames in os.walk(self.directory):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                try:
+                    if filename.startswith('.') and os.path.getmtime(path) < cutoff:
+                        os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+class Lease:
+    """
+    A set of holds on artifacts with an explicit lifetime, e.g. one render.
+    Every file added or tracked through the lease is held until the lease ends, and then released at once.
+    Use it as a context manager, or call release when done.
+
+    :param store: The artifact store. Defaults to the process-wide store from get_store
+    """
+    def __init__(self, store: ArtifactStore | None = None):
+        self.store = store or get_store()
+        self._releases: list[Callable[[], None]] = []
+        self._lock = threading.Lock()
+
+    def add(self, path: str, suffix: str | None = None) -> str:
+        """
+        Moves a finished file into the store, holds it for the lifetime of the lease and returns its path in the store.
+
+        :param path: The path of the file, usually from the store's scratch_path
+        :param suffix: The file extension. Defaults to the extension of path
+        """
+        return self.track(self.store, self.store.add(path, suffix=suffix))
+
+    def track(self, holder: ArtifactStore | DiskCache, path: str) -> str:
+        """
+        Takes over a hold that was already taken on a file, e.g. by DiskCache.get or put with hold=True,
+        so it is released when the lease ends. Returns the path.
+
+        :param holder: The cache or store that holds the file
+        :param path: The path of the held file
+        """
+        self.on_release(lambda: holder.release(path))
+        return path
+
+    def on_release(self, callback: Callable[[], None]):
+        """
+        Calls the callback when the lease ends, e.g. to release something other than a file hold.
+
+        :param callback: The function to call, with no arguments
+        """
+        with self._lock:
+            self._releases.append(callback)
+
+    def release(self):
+        """
+        Releases every hold taken through the lease.
+        """
+        with self._lock:
+            releases, self._releases = self._releases, []
+        for release in releases:
+            release()
+
+    def __enter__(self) -> 'Lease':
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+_store: ArtifactStore | None = None
+_lock = threading.Lock()
+
+def get_store() -> ArtifactStore:
+    """
+    Returns the process-wide artifact store, creating a LocalArtifactStore on first use.
+    """
+    global _store
+    with _lock:
+        if _store is None:
+            _store = LocalArtifactStore()
+        return _store
+
+def configure(store: ArtifactStore):
+    """
+    Replaces the process-wide artifact store, e.g. with one that has a different quota or keeps files elsewhere.
+
+    :param store: The new store
+    """
+    global _store
+    with _lock:
+        _store = store
+
+def scratch_path(suffix:str='') -> str:
+    """
+    Returns a fresh path in the process-wide store for writing a file that will be passed to adopt.
+
+    :param suffix: The file extension, e.g. '.png'
+    """
+    return get_store().scratch_path(suffix=suffix)
+
+def adopt(path: str, lease: Lease | None = None, suffix: str | None = None) -> str:
+    """
+    Moves a finished file into the process-wide store and returns its path in the store.
+
+    :param path: The path of the file, usually from scratch_path
+    :param lease: The lease to hold the file for. Without a lease, the file is not held, and the store may delete it once it needs the space
+    :param suffix: The file extension. Defaults to the extension of path
+    """
+    if lease:
+        return lease.add(path, suffix=suffix)
+    store = get_store()
+    return hand_over(store, store.add(path, suffix=suffix), None)
+
+def hand_over(holder: ArtifactStore | DiskCache, path: str, lease: Lease | None) -> str:
+    """
+    Hands a hold that was just taken on a file (e.g. by DiskCache.get or put with hold=True) to the lease,
+    or releases it right away if there is no lease, so that files used without a lease never stay held. Returns the path.
+
+    :param holder: The cache or store that holds the file
+    :param path: The path of the held file
+    :param lease: The lease to hold the file for, if any
+    """
+    if lease:
+        return lease.track(holder, path)
+    holder.release(path)
+    return path
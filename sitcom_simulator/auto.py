@@ -1,4 +1,5 @@
 from typing import Literal
+from .models import Script
 
 def create_sitcom(
         prompt:str | None = None,
@@ -13,15 +14,30 @@ def create_sitcom(
         upload_to_yt=False,
         audio_job_delay:int=30,
         audio_poll_delay:int=10,
+        audio_max_jobs:int=3,
+        image_max_jobs:int=4,
+        image_seed:int | None = None,
         caption_bg_style:Literal['box_shadow', 'text_shadow', 'none']='text_shadow',
         save_script:bool=False,
         speed:float=1,
         pan_and_zoom:bool=True,
+        pan_and_zoom_engine:Literal['zoompan', 'pillow']='zoompan',
+        caption_engine:Literal['drawtext', 'pillow']='drawtext',
         orientation:Literal["landscape", "portrait", "square"]="portrait",
         resolution:int=1080,
+        frame_rate:int=24,
+        encoder_profile:Literal['draft', 'standard', 'final']='final',
+        draft:bool=False,
         narrator_dropout:bool=False,
         music_url:str|None=None,
         audio_codec:Literal['mp3', 'aac']='mp3',
+        render_workers:int=1,
+        render_engine:Literal['clips', 'single_pass', 'stream_copy']='clips',
+        cache:bool=False,
+        stream_render:bool=False,
+        incremental:bool=False,
+        script:Script | None = None,
+        output_path:str | None = None,
 ): 
     """
     Generates a sitcom video based on a prompt or a script file.
@@ -38,32 +54,62 @@ def create_sitcom(
     :param upload_to_yt: If True, the video will be uploaded to YouTube after it is generated. NOTE: currently does not work.
     :param audio_job_delay: The number of seconds to wait between starting audio generation jobs. Lower values render faster but are more likely to get rate limited. (FakeYou only)
     :param audio_poll_delay: The number of seconds to wait between polling for audio generation job completion. (FakeYou only)
+    :param audio_max_jobs: The maximum number of audio generation jobs to run at once. (FakeYou only)
+    :param image_max_jobs: The maximum number of images to generate at the same time.
+    :param image_seed: A seed for image generation, so the same prompt always produces the same image. (Stability only)
     :param caption_bg_style: The style of the background behind the captions.
     :param save_script: If True, the generated script will be saved to a file.
     :param speed: The speed of the final video. 1.0 is normal speed.
     :param pan_and_zoom: If True, the pan and zoom effect on images will be enabled.
+    :param pan_and_zoom_engine: How the pan and zoom effect is rendered. "zoompan" uses ffmpeg's zoompan filter, "pillow" warps the images with Pillow at the output size, which is much faster. The "single_pass" render engine always uses zoompan.
+    :param caption_engine: How captions are drawn. "drawtext" uses ffmpeg's drawtext filter on every frame, "pillow" rasterizes each caption once with Pillow and overlays it, which is faster.
     :param orientation: The orientation of the video. "landscape", "portrait", or "square".
     :param resolution: The width of the video to render assuming portrait mode. This takes into account the orientation parameter.
+    :param frame_rate: The frame rate of the video.
+    :param encoder_profile: The encoder quality tier. "draft" encodes as fast as possible, "standard" balances speed and size, and "final" encodes slowly for the best quality per byte.
+    :param draft: If True, renders a quick preview to check timing: the draft encoder profile at a low resolution and frame rate, without pan and zoom.
     :param narrator_dropout: If True, the narrator will be forcibly removed from the script (ChatGPT often goes heavy on the narrators).
     :param music_url: A URL to a music track to use for the video.
     :param audio_codec: The audio codec to use for the video. mp3 seems to be more compatible with more video players, but aac is higher quality and is necessary for viewing videos in an iPhone browser.
+    :param render_workers: The maximum number of intermediate video clips to render in parallel.
+    :param render_engine: "clips" renders each clip separately and then concatenates them. "single_pass" renders the whole video in one ffmpeg pass without intermediate files. "stream_copy" renders clips at final quality and joins them without re-encoding the video.
+    :param cache: If True, generated assets are kept in a persistent on-disk cache and reused by later runs.
+    :param stream_render: If True, each clip starts rendering as soon as its voice and image are ready instead of after every asset is generated. Not supported by the "single_pass" render engine.
+    :param incremental: If True, the generated voices, images and clips are kept next to the output video with a manifest of their input fingerprints, so rendering an edited script to the same output path only regenerates the clips that changed. Joining the clips is only free with the "stream_copy" render engine; the others encode the final video again.
+    :param script: A script to use for the video instead of generating one or loading it from a file.
+    :param output_path: The path to save the video to. Defaults to the script's title in the current directory.
     """
-    from .models import VideoResult
     from .script import write_script
     from .speech import add_voices
     from .image import add_images
     from .music import add_music
-    from .video import render_video
+    from .video import render_video, create_renderer
+    from .video.video_generator import DRAFT_RESOLUTION, DRAFT_FRAME_RATE
+    from .pipeline import add_assets, ClipAssembler
     from .script import script_from_file
     from .social.yt_uploader import upload_to_yt
+    from .manifest import RenderManifest
+    from .artifacts import Lease
     
-    if(prompt == None and script_path == None):
+    if(prompt == None and script_path == None and script == None):
         prompt = input("Enter a prompt to generate the video script: ")
 
-    assert prompt or script_path, "You must provide a prompt or a script path"
+    assert prompt or script_path or script, "You must provide a prompt, a script path or a script"
     assert orientation in ["landscape", "portrait", "square"], "Orientation must be 'landscape', 'portrait', or 'square'"
+    stream_engine = _stream_render_engine(render_engine) if stream_render else None
+
+    if sum(source is not None for source in [prompt, script_path, script]) > 1:
+        raise ValueError("You must provide only one of a prompt, a script path or a script")
+
+    if draft:
+        encoder_profile = 'draft'
+        pan_and_zoom = False
+        resolution = min(resolution, DRAFT_RESOLUTION)
+        frame_rate = min(frame_rate, DRAFT_FRAME_RATE)
 
-    if prompt and not script_path:
+    if script:
+        initial_script = script
+    elif prompt:
         initial_script = write_script(
             prompt=prompt,
             manual_character_selection=manual_select_characters,
@@ -72,50 +118,309 @@ def create_sitcom(
             fakeyou_characters=not debug_audio,
             narrator_dropout=narrator_dropout,
         )
-    elif script_path and not prompt:
+    elif script_path:
         initial_script = script_from_file(script_path)
-    else:
-        raise ValueError("You must provide a prompt or a script path, not both")
     
     if art_style:
         initial_script = initial_script.replace(metadata=initial_script.metadata.replace(art_style=art_style))
 
-    script_with_voices = add_voices(
-        initial_script,
-        engine="fakeyou" if not debug_audio else "gtts",
-        fakeyou_job_delay=audio_job_delay,
-        fakeyou_poll_delay=audio_poll_delay,
-    )
+    filename = initial_script.metadata.title[:50].strip() or 'render' if initial_script.metadata.title else 'render'
+    output_path = output_path or f"./{filename}.mp4"
+    manifest = RenderManifest(output_path) if incremental else None
 
-    # image gen could theoretically be done in parallel with the audio
-    script_with_images = add_images(
-        script_with_voices,
-        engine="stability" if not debug_images else "pillow",
-        orientation=orientation,
-    )
-    
-    script_with_music = add_music(
-        script=script_with_images,
-        music_url=music_url,
-    )
+    # the generated files are held in the artifact store until the video is rendered
+    with Lease() as lease:
+        renderer = None
+        assembler = None
+        if stream_engine:
+            renderer = create_renderer(
+                font=font,
+                caption_bg_style=caption_bg_style,
+                resolution=resolution,
+                orientation=orientation,
+                speed=speed,
+                pan_and_zoom=pan_and_zoom,
+                pan_and_zoom_engine=pan_and_zoom_engine,
+                caption_engine=caption_engine,
+                frame_rate=frame_rate,
+                audio_codec=audio_codec,
+                max_workers=render_workers,
+                engine=stream_engine,
+                cache_clips=cache,
+                encoder_profile=encoder_profile,
+                clip_cache=manifest,
+                lease=lease,
+            )
+            # clips render in the background while the remaining voices and images are generated
+            assembler = ClipAssembler(initial_script, on_clip_ready=renderer.submit)
 
-    final_script = script_with_music
-
-    filename = final_script.metadata.title[:50].strip() or 'render' if final_script.metadata.title else 'render'
-    output_path = f"./{filename}.mp4"
-
-    final_video_path = render_video(
-        script=final_script,
-        font=font,
-        output_path=output_path,
-        caption_bg_style=caption_bg_style,
-        resolution=resolution,
-        orientation=orientation,
-        speed=speed,
-        pan_and_zoom=pan_and_zoom,
-        audio_codec=audio_codec,
-    )
+        # voices, images and music only depend on the script, so they are generated concurrently
+        try:
+            final_script = add_assets(
+                initial_script,
+                stages={
+                    "voices": lambda script: add_voices(
+                        script,
+                        engine="fakeyou" if not debug_audio else "gtts",
+                        fakeyou_job_delay=audio_job_delay,
+                        fakeyou_poll_delay=audio_poll_delay,
+                        fakeyou_max_jobs=audio_max_jobs,
+                        on_voice_downloaded=assembler.on_voice_downloaded if assembler else None,
+                        cache_voices=cache,
+                        voice_cache=manifest,
+                        lease=lease,
+                    ),
+                    "images": lambda script: add_images(
+                        script,
+                        engine="stability" if not debug_images else "pillow",
+                        orientation=orientation,
+                        max_concurrent_images=image_max_jobs,
+                        cache_images=cache,
+                        seed=image_seed,
+                        image_cache=manifest,
+                        lease=lease,
+                        on_image_generated=assembler.on_image_generated if assembler else None,
+                    ),
+                    "music": lambda script: add_music(
+                        script=script,
+                        # a re-render keeps the song of the previous render
+                        music_url=music_url or (manifest.bgm_url if manifest else None),
+                    ),
+                },
+            )
+        except BaseException:
+            # the clips that already started would otherwise keep rendering, and stay held, after the failure
+            if renderer:
+                renderer.close()
+            raise
+
+        if renderer:
+            final_video_path = renderer.finish(final_script, output_path)
+        else:
+            final_video_path = render_video(
+                script=final_script,
+                font=font,
+                output_path=output_path,
+                caption_bg_style=caption_bg_style,
+                resolution=resolution,
+                orientation=orientation,
+                speed=speed,
+                pan_and_zoom=pan_and_zoom,
+                pan_and_zoom_engine=pan_and_zoom_engine,
+                caption_engine=caption_engine,
+                frame_rate=frame_rate,
+                audio_codec=audio_codec,
+                max_workers=render_workers,
+                engine=render_engine,
+                cache_clips=cache,
+                encoder_profile=encoder_profile,
+                clip_cache=manifest,
+                lease=lease,
+            )
+        if manifest:
+            manifest.save(bgm_url=final_script.metadata.bgm_url)
+
+    result = _video_result(final_script, final_video_path, filename=filename, prompt=prompt, save_script=save_script)
+
+    # if upload_to_yt:
+    #     title = prompt
+    #     keywords = [word for word in prompt.split(' ') if len(word) > 3] if prompt else ["sitcom", "funny", "comedy", "ai", "deepfake"]
+    #     upload_to_yt(result.path, result.title, result.description, keywords, "24", "public")
+
+    return result
+
+async def acreate_sitcom(
+        prompt:str | None = None,
+        art_style:str | None = None,
+        script_path:str | None = None,
+        debug_images:bool=False,
+        debug_audio:bool=False,
+        font:str = 'Arial',
+        max_tokens:int=2048,
+        audio_job_delay:int=30,
+        audio_poll_delay:int=10,
+        audio_max_jobs:int=3,
+        image_max_jobs:int=4,
+        image_seed:int | None = None,
+        caption_bg_style:Literal['box_shadow', 'text_shadow', 'none']='text_shadow',
+        save_script:bool=False,
+        speed:float=1,
+        pan_and_zoom:bool=True,
+        pan_and_zoom_engine:Literal['zoompan', 'pillow']='zoompan',
+        caption_engine:Literal['drawtext', 'pillow']='drawtext',
+        orientation:Literal["landscape", "portrait", "square"]="portrait",
+        resolution:int=1080,
+        frame_rate:int=24,
+        encoder_profile:Literal['draft', 'standard', 'final']='final',
+        draft:bool=False,
+        narrator_dropout:bool=False,
+        music_url:str|None=None,
+        audio_codec:Literal['mp3', 'aac']='mp3',
+        render_workers:int=1,
+        render_engine:Literal['clips', 'single_pass', 'stream_copy']='clips',
+        cache:bool=False,
+        stream_render:bool=False,
+        incremental:bool=False,
+        script:Script | None = None,
+        output_path:str | None = None,
+):
+    """
+    The async version of create_sitcom. Every wait on FakeYou, Stability, OpenAI, downloads and ffmpeg is awaited instead of blocking a thread,
+    so one event loop can make many videos at once, e.g. with asyncio.gather.
+
+    It never asks for input, since that would block the event loop: the characters are picked by the language model and the script isn't submitted for approval.
+    FakeYou's rate limit and the on-disk caches are shared by every video in the process, like in render_batch.
+    The Stability engine and downloads require httpx (pip install sitcom-simulator[async]).
+    See create_sitcom for the parameters.
+    """
+    from .script import awrite_script, script_from_file
+    from .speech import aadd_voices
+    from .image import aadd_images
+    from .music import aadd_music
+    from .video import arender_video, acreate_renderer
+    from .video.video_generator import DRAFT_RESOLUTION, DRAFT_FRAME_RATE
+    from .pipeline import aadd_assets, ClipAssembler
+    from .manifest import RenderManifest
+    from .artifacts import Lease
+
+    assert prompt or script_path or script, "You must provide a prompt, a script path or a script"
+    assert orientation in ["landscape", "portrait", "square"], "Orientation must be 'landscape', 'portrait', or 'square'"
+    stream_engine = _stream_render_engine(render_engine) if stream_render else None
+
+    if sum(source is not None for source in [prompt, script_path, script]) > 1:
+        raise ValueError("You must provide only one of a prompt, a script path or a script")
+
+    if draft:
+        encoder_profile = 'draft'
+        pan_and_zoom = False
+        resolution = min(resolution, DRAFT_RESOLUTION)
+        frame_rate = min(frame_rate, DRAFT_FRAME_RATE)
+
+    if script:
+        initial_script = script
+    elif prompt:
+        initial_script = await awrite_script(
+            prompt=prompt,
+            max_tokens=max_tokens,
+            narrator_dropout=narrator_dropout,
+        )
+    elif script_path:
+        initial_script = script_from_file(script_path)
+
+    if art_style:
+        initial_script = initial_script.replace(metadata=initial_script.metadata.replace(art_style=art_style))
 
+    filename = initial_script.metadata.title[:50].strip() or 'render' if initial_script.metadata.title else 'render'
+    output_path = output_path or f"./{filename}.mp4"
+    manifest = RenderManifest(output_path) if incremental else None
+
+    # the generated files are held in the artifact store until the video is rendered
+    with Lease() as lease:
+        renderer = None
+        assembler = None
+        if stream_engine:
+            renderer = await acreate_renderer(
+                font=font,
+                caption_bg_style=caption_bg_style,
+                resolution=resolution,
+                orientation=orientation,
+                speed=speed,
+                pan_and_zoom=pan_and_zoom,
+                pan_and_zoom_engine=pan_and_zoom_engine,
+                caption_engine=caption_engine,
+                frame_rate=frame_rate,
+                audio_codec=audio_codec,
+                max_workers=render_workers,
+                engine=stream_engine,
+                cache_clips=cache,
+                encoder_profile=encoder_profile,
+                clip_cache=manifest,
+                lease=lease,
+            )
+            # clips render in the background while the remaining voices and images are generated
+            assembler = ClipAssembler(initial_script, on_clip_ready=renderer.submit)
+
+        # voices, images and music only depend on the script, so they are generated concurrently
+        try:
+            final_script = await aadd_assets(
+                initial_script,
+                stages={
+                    "voices": lambda script: aadd_voices(
+                        script,
+                        engine="fakeyou" if not debug_audio else "gtts",
+                        fakeyou_job_delay=audio_job_delay,
+                        fakeyou_poll_delay=audio_poll_delay,
+                        fakeyou_max_jobs=audio_max_jobs,
+                        on_voice_downloaded=assembler.on_voice_downloaded if assembler else None,
+                        cache_voices=cache,
+                        voice_cache=manifest,
+                        lease=lease,
+                    ),
+                    "images": lambda script: aadd_images(
+                        script,
+                        engine="stability" if not debug_images else "pillow",
+                        orientation=orientation,
+                        max_concurrent_images=image_max_jobs,
+                        cache_images=cache,
+                        seed=image_seed,
+                        image_cache=manifest,
+                        lease=lease,
+                        on_image_generated=assembler.on_image_generated if assembler else None,
+                    ),
+                    "music": lambda script: aadd_music(
+                        script=script,
+                        # a re-render keeps the song of the previous render
+                        music_url=music_url or (manifest.bgm_url if manifest else None),
+                    ),
+                },
+            )
+        except BaseException:
+            # the clips that already started would otherwise keep rendering, and stay held, after the failure
+            if renderer:
+                await renderer.close()
+            raise
+
+        if renderer:
+            final_video_path = await renderer.finish(final_script, output_path)
+        else:
+            final_video_path = await arender_video(
+                script=final_script,
+                font=font,
+                output_path=output_path,
+                caption_bg_style=caption_bg_style,
+                resolution=resolution,
+                orientation=orientation,
+                speed=speed,
+                pan_and_zoom=pan_and_zoom,
+                pan_and_zoom_engine=pan_and_zoom_engine,
+                caption_engine=caption_engine,
+                frame_rate=frame_rate,
+                audio_codec=audio_codec,
+                max_workers=render_workers,
+                engine=render_engine,
+                cache_clips=cache,
+                encoder_profile=encoder_profile,
+                clip_cache=manifest,
+                lease=lease,
+            )
+        if manifest:
+            manifest.save(bgm_url=final_script.metadata.bgm_url)
+
+    return _video_result(final_script, final_video_path, filename=filename, prompt=prompt, save_script=save_script)
+
+def _stream_render_engine(render_engine: Literal['clips', 'single_pass', 'stream_copy']) -> Literal['clips', 'stream_copy']:
+    """
+    Returns the render engine to stream clips to, or raises a ValueError if the engine can't render clips as they arrive.
+    """
+    if render_engine == "single_pass":
+        raise ValueError("The single_pass render engine can't be used with stream_render")
+    return render_engine
+
+def _video_result(final_script: Script, final_video_path: str, filename: str, prompt: str | None, save_script: bool):
+    """
+    Reports the rendered video, saves the script if asked to, and returns the VideoResult.
+    """
+    from .models import VideoResult
     result = VideoResult(
         path=final_video_path,
         title=final_script.metadata.title if final_script.metadata.title else filename,
@@ -130,10 +435,4 @@ def create_sitcom(
         with open(f"./{filename}.toml", 'w') as f:
             f.write(toml.dumps(asdict(final_script)))
         print(f"Script saved at ./{filename}.toml")
-
-    # if upload_to_yt:
-    #     title = prompt
-    #     keywords = [word for word in prompt.split(' ') if len(word) > 3] if prompt else ["sitcom", "funny", "comedy", "ai", "deepfake"]
-    #     upload_to_yt(result.path, result.title, result.description, keywords, "24", "public")
-
-    return result
\ No newline at end of file
+    return result
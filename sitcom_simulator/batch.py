@@ -0,0 +1,117 @@
+from typing import Iterable, Callable, Optional
+from dataclasses import dataclass, asdict
+from .models import Script
+import os
+import time
+import json
+import logging
+import threading
+
+@dataclass
+class BatchResult:
+    """
+    The outcome of rendering one script in a batch.
+
+    :param source: The TOML path of the script, or its position in the batch for Script objects
+    :param status: "ok" if the video was rendered, "failed" otherwise
+    :param output_path: The path to the rendered video, if it was rendered
+    :param title: The title of the video, if it was rendered
+    :param error: The error that stopped the script from rendering, if any
+    :param seconds: How long the script took to render
+    """
+    source: str
+    status: str
+    output_path: str | None = None
+    title: str | None = None
+    error: str | None = None
+    seconds: float = 0
+
+def render_batch(
+        scripts: Iterable[Script | str],
+        output_dir:str="renders",
+        max_parallel_scripts:int=2,
+        manifest_path:str | None = None,
+        on_script_finished: Optional[Callable[[BatchResult], None]] = None,
+        **create_sitcom_kwargs,
+    ) -> list[BatchResult]:
+    """
+    Renders many scripts in one process and returns the outcome of each, in the order they were given.
+
+    Up to max_parallel_scripts scripts run at the same time, each on its own thread, so one script's slow stages (e.g., waiting on FakeYou) overlap with another's rendering.
+    Each script still creates its own voice, image and clip worker pools (sized by audio_max_jobs, image_max_jobs and render_workers),
+    so up to max_parallel_scripts times as many jobs of each kind can be in flight.
+    Resources that are expensive to set up are shared across the batch: the FakeYou session is signed in once,
+    FakeYou's rate limit is shared by all scripts, the voice catalog is loaded once, and the on-disk caches are reused.
+    A script that fails is recorded in the manifest and does not stop the rest of the batch.
+
+    :param scripts: The scripts to render, as Script objects or paths to TOML script files
+    :param output_dir: The directory to save the videos (and the manifest) to
+    :param max_parallel_scripts: The maximum number of scripts to work on at the same time
+    :param manifest_path: The path of the JSON manifest of results, which is rewritten as each script finishes. Defaults to batch_manifest.json in output_dir
+    :param on_script_finished: A callback to call after each script finishes (or fails) which takes its BatchResult
+    :param create_sitcom_kwargs: Options passed to create_sitcom for every script, e.g. debug_images or render_engine
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from .auto import create_sitcom
+    from .script import script_from_file
+
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = manifest_path or os.path.join(output_dir, "batch_manifest.json")
+    scripts = list(scripts)
+    results: list[BatchResult | None] = [None] * len(scripts)
+    lock = threading.Lock()
+
+    def render(i: int, script: Script | str) -> BatchResult:
+        source = script if isinstance(script, str) else f"script {i}"
+        # videos are named after their script file, or numbered for Script objects
+        name = os.path.splitext(os.path.basename(script))[0] if isinstance(script, str) else f"{i:04d}"
+        start = time.perf_counter()
+        try:
+            if isinstance(script, str):
+                script = script_from_file(script)
+            video = create_sitcom(
+                script=script,
+                output_path=os.path.join(output_dir, f"{name}.mp4"),
+                **create_sitcom_kwargs,
+            )
+            result = BatchResult(source=source, status="ok", output_path=video.path, title=video.title)
+        except Exception as e:
+            logging.exception(f"Failed to render {source}")
+            result = BatchResult(source=source, status="failed", error=f"{type(e).__name__}: {e}")
+        result.seconds = time.perf_counter() - start
+        with lock:
+            results[i] = result
+            _write_manifest(manifest_path, [r for r in results if r is not None])
+        if on_script_finished:
+            on_script_finished(result)
+        return result
+
+    with ThreadPoolExecutor(max_workers=max(1, max_parallel_scripts)) as executor:
+        futures = [executor.submit(render, i, script) for i, script in enumerate(scripts)]
+        finished = [future.result() for future in futures]
+
+    failures = sum(result.status == "failed" for result in finished)
+    print(f"Rendered {len(finished) - failures}/{len(finished)} scripts. Manifest saved at {manifest_path}")
+    return finished
+
+def render_batch_dir(directory: str, output_dir:str | None = None, **kwargs) -> list[BatchResult]:
+    """
+    Renders every TOML script in a directory. See render_batch for the options.
+
+    :param directory: The directory containing the TOML script files
+    :param output_dir: The directory to save the videos to. Defaults to a "renders" directory inside the script directory
+    """
+    script_paths = sorted(
+        os.path.join(directory, filename)
+        for filename in os.listdir(directory)
+        if filename.endswith('.toml')
+    )
+    if not script_paths:
+        raise ValueError(f"No TOML scripts found in {directory}")
+    return render_batch(script_paths, output_dir=output_dir or os.path.join(directory, "renders"), **kwargs)
+
+def _write_manifest(path: str, results: list[BatchResult]):
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w') as f:
+        json.dump([asdict(result) for result in results], f, indent=2)
+    os.replace(temp_path, path)
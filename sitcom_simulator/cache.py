@@ -0,0 +1,231 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+from collections import Counter, OrderedDict
+
+CACHE_ROOT = os.environ.get('SITCOM_SIMULATOR_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'sitcom-simulator'))
+DEFAULT_MAX_BYTES = 2 * 1024**3 # 2 GiB
+
+def hash_file(path: str, chunk_size:int=1024 * 1024) -> str:
+    """
+    Returns the SHA-256 hex digest of the file's contents.
+
+    :param path: The path to the file to hash
+    :param chunk_size: How many bytes to read at a time
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def hash_key(*parts) -> str:
+    """
+    Returns a stable SHA-256 hex digest for the given JSON-serializable parts.
+    Dictionaries are hashed independently of key order.
+    """
+    serialized = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(serialized.encode('utf-8')).hexdigest()
+
+class DiskCache:
+    """
+    A persistent, size-capped cache of files addressed by a key (usually a content hash).
+
+    Entries live in a directory under CACHE_ROOT, which can be changed with the SITCOM_SIMULATOR_CACHE_DIR environment variable.
+    Reading an entry marks it as recently used, and the least recently used entries are evicted once the cache grows past max_bytes.
+    The directory is scanned once, and the sizes and order of use are tracked in memory from then on, so storing a file doesn't scan it again.
+    Entries that are held (see get and put) are never evicted until they are released, so files in use by a render can't disappear.
+    Holds only protect an entry from the instance that took them, so everything in the process should share one instance per cache (see get_cache).
+    The cache is safe to use from multiple threads.
+
+    :param name: The name of the cache, used as its directory name
+    :param max_bytes: The maximum total size of the cached files
+    :param root: The directory that holds the cache directories. Defaults to CACHE_ROOT
+    """
+    def __init__(self, name: str, max_bytes:int=DEFAULT_MAX_BYTES, root: str | None = None):
+        self.name = name
+        self.max_bytes = max_bytes
+        self.directory = os.path.join(root or CACHE_ROOT, name)
+        os.makedirs(self.directory, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._index: OrderedDict[str, int] | None = None # path -> size, least recently used first
+        self._size = 0 # the total size of the entries in the index
+        self._held: Counter[str] = Counter()
+
+    def path_for(self, key: str, suffix:str='') -> str:
+        """
+        Returns the path where the entry for the given key is (or would be) stored.
+
+        :param key: The cache key
+        :param suffix: The file extension of the entry, e.g. '.mp4'
+        """
+        return os.path.join(self.directory, key[:2], f"{key}{suffix}")
+
+    def get(self, key: str, suffix:str='', hold:bool=False) -> str | None:
+        """
+        Returns the path to the cached file for the given key, or None if it is not cached.
+
+        :param key: The cache key
+        :param suffix: The file extension of the entry
+        :param hold: If True, the entry is protected from eviction until it is released
+        """
+        path = self.path_for(key, suffix)
+        with self._lock:
+            if os.path.exists(path):
+                os.utime(path) # mark as recently used
+                self._touch(path)
+                self.hits += 1
+                if hold:
+                    self._held[path] += 1
+                return path
+            self.misses += 1
+            return None
+
+    def put(self, key: str, source_path: str, suffix:str='', move:bool=False, hold:bool=False) -> str:
+        """
+        Stores a file in the cache and returns the path to the cached copy.
+
+        :param key: The cache key
+        :param source_path: The path to the file to store
+        :param suffix: The file extension of the entry
+        :param move: If True, the source file is moved into the cache instead of copied
+        :param hold: If True, the entry is protected from eviction until it is released
+        """
+        import tempfile
+        path = self.path_for(key, suffix)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # a unique name, so concurrent puts of the same key (from any thread or process) never write to the same file
+        handle, temp_path = tempfile.mkstemp(prefix='.', suffix=suffix, dir=os.path.dirname(path))
+        os.close(handle)
+        try:
+            if move:
+                shutil.move(source_path, temp_path)
+            else:
+                shutil.copyfile(source_path, temp_path)
+            with self._lock:
+                index = self._load_index()
+                self._size -= index.pop(path, 0)
+                os.replace(temp_path, path) # atomic, so readers never see a partial file
+                index[path] = os.path.getsize(path)
+                self._size += index[path]
+                if hold:
+                    self._held[path] += 1
+                self._evict()
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return path
+
+    def hold(self, path: str):
+        """
+        Protects a cached file from eviction until it is released, e.g. when another user of the file comes along.
+
+        :param path: The path returned by get or put
+        """
+        with self._lock:
+            self._held[path] += 1
+
+    def release(self, path: str):
+        """
+        Releases one hold on a cached file so it can be evicted again.
+
+        :param path: The path returned by get or put
+        """
+        with self._lock:
+            self._held[path] -= 1
+            if self._held[path] <= 0:
+                del self._held[path]
+            self._evict()
+
+    def temp_path(self, suffix:str='') -> str:
+        """
+        Returns a fresh path inside the cache directory for writing a file that will be moved into the cache with put.
+        Writing there keeps the move on the same filesystem.
+
+        :param suffix: The file extension of the temporary file
+        """
+        import tempfile
+        handle, path = tempfile.mkstemp(prefix='.', suffix=suffix, dir=self.directory)
+        os.close(handle)
+        return path
+
+    @property
+    def hit_rate(self) -> float:
+        """
+        Returns the fraction of lookups that were hits, or 0 if there were no lookups.
+        """
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0
+
+    def summary(self) -> str:
+        """
+        Returns a one-line, human-readable summary of the cache statistics.
+        """
+        return f"{self.name} cache: {self.hits} hits, {self.misses} misses ({self.hit_rate:.0%} hit rate)"
+
+    def _entries(self):
+        for dirpath, _, filenames in os.walk(self.directory):
+            for filename in filenames:
+                if filename.startswith('.'): # files that are still being written
+                    continue
+                path = os.path.join(dirpath, filename)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield path, stat
+
+    def _load_index(self) -> OrderedDict[str, int]:
+        """
+        Returns the size of every entry, least recently used first, scanning the directory only the first time. Must be called with the lock held.
+        """
+        if self._index is None:
+            entries = sorted(self._entries(), key=lambda entry: entry[1].st_mtime)
+            self._index = OrderedDict((path, stat.st_size) for path, stat in entries)
+            self._size = sum(self._index.values())
+        return self._index
+
+    def _touch(self, path: str):
+        """
+        Marks an entry as the most recently used, adding it if another process stored it. Must be called with the lock held.
+        """
+        index = self._load_index()
+        if path not in index:
+            index[path] = os.path.getsize(path)
+            self._size += index[path]
+        index.move_to_end(path)
+
+    def _evict(self):
+        """
+        Deletes the least recently used entries until the cache fits in max_bytes, skipping held ones. Must be called with the lock held.
+        """
+        index = self._load_index()
+        if self._size <= self.max_bytes:
+            return
+        for path in [path for path in index if path not in self._held]:
+            if self._size <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self._size -= index.pop(path)
+
+_caches: dict[str, DiskCache] = {}
+_caches_lock = threading.Lock()
+
+def get_cache(name: str) -> DiskCache:
+    """
+    Returns the process-wide cache with the given name, creating it on first use.
+
+    :param name: The name of the cache, e.g. "images"
+    """
+    with _caches_lock:
+        if name not in _caches:
+            _caches[name] = DiskCache(name)
+        return _caches[name]
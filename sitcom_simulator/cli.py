@@ -1,11 +1,77 @@
 from .auto import create_sitcom
 import argparse
+import sys
+
+def _render_args_parser():
+    """
+    Returns a parser of the options shared by single videos and batches, to pass to other parsers as a parent.
+    """
+    parser = argparse.ArgumentParser(add_help=False)
+
+    parser.add_argument('-d', '--debug', action='store_true', help="skip expensive API calls, generating robotic TTS and blank images instead.")
+    parser.add_argument('--debug-images', action='store_true', help="skip expensive image generation API calls, generating blank images instead.")
+    parser.add_argument('--debug-audio', action='store_true', help="skip slow voice generation API calls, generating robotic TTS instead.")
+    parser.add_argument('--font', type=str, help="the font to use for the video", default='Arial')
+    parser.add_argument('--audio-job-delay', type=int, default=30, help="the number of seconds to wait between starting audio generation jobs. Lower values render faster but are more likely to get rate limited")
+    parser.add_argument('--audio-poll-delay', type=int, default=10, help="the number of seconds to wait between polling for audio generation job completion")
+    parser.add_argument('--audio-max-jobs', type=int, default=3, help="the maximum number of audio generation jobs to run at once")
+    parser.add_argument('--image-max-jobs', type=int, default=4, help="the maximum number of images to generate at once")
+    parser.add_argument('--image-seed', metavar='N', type=int, help="a seed for image generation, so the same prompt always produces the same image")
+    parser.add_argument('--box-shadow', action='store_true', help="use box background for captions instead of text shadow")
+    parser.add_argument('--speed', type=float, default=1, help="speed up the final video by this factor (1.0 is normal speed)")
+    parser.add_argument('--no-pan-and-zoom', action='store_true', help="disable pan and zoom effect on images")
+    parser.add_argument('--pan-and-zoom-engine', type=str, default='zoompan', choices=['zoompan', 'pillow'], help="zoompan: ffmpeg's zoompan filter on an upscaled image. pillow: warp images with Pillow at the output size, which is much faster")
+    parser.add_argument('--caption-engine', type=str, default='drawtext', choices=['drawtext', 'pillow'], help="drawtext: ffmpeg's drawtext filter on every frame. pillow: rasterize each caption once with Pillow and overlay it, which is faster")
+    parser.add_argument('--resolution', type=int, default=1080, help="the resolution of the video (passing in 1080 means 1080p)")
+    parser.add_argument('--orientation', type=str, default='portrait', help="the orientation of the video (landscape, portrait, or square)")
+    parser.add_argument('--frame-rate', metavar='FPS', type=int, default=24, help="the frame rate of the video")
+    parser.add_argument('--encoder-profile', type=str, default='final', choices=['draft', 'standard', 'final'], help="draft: encode as fast as possible. standard: balance speed and size. final: encode slowly for the best quality per byte")
+    parser.add_argument('--draft', action='store_true', help="render a quick preview to check timing: low resolution and frame rate, no pan and zoom, and the draft encoder profile")
+    parser.add_argument('--audio-codec', type=str, help="the audio codec to use for the video: mp3 or aac", default='mp3')
+    parser.add_argument('--render-workers', metavar='N', type=int, default=1, help="the number of video clips to render in parallel. Higher values are faster on machines with many cores but use more memory")
+    parser.add_argument('--render-engine', type=str, default='clips', choices=['clips', 'single_pass', 'stream_copy'], help="clips: render each clip to its own file, then concatenate. single_pass: render the whole video with one ffmpeg graph and a single encode. stream_copy: render clips at final quality and join them without re-encoding")
+    parser.add_argument('--stream-render', action='store_true', help="start rendering each clip as soon as its voice and image are ready, overlapping rendering with asset generation. Not compatible with --render-engine single_pass")
+    parser.add_argument('--cache', action='store_true', help="keep generated assets in a persistent cache (~/.cache/sitcom-simulator) so re-renders reuse them")
+    parser.add_argument('--incremental', action='store_true', help="keep the generated voices, images and clips next to the video with a manifest, so re-rendering an edited script only regenerates the clips that changed")
+    return parser
+
+def _render_options(args) -> dict:
+    """
+    Returns the create_sitcom options of the arguments parsed with _render_args_parser.
+    """
+    return dict(
+        debug_images=args.debug_images or args.debug,
+        debug_audio=args.debug_audio or args.debug,
+        font=args.font,
+        audio_job_delay=args.audio_job_delay,
+        audio_poll_delay=args.audio_poll_delay,
+        audio_max_jobs=args.audio_max_jobs,
+        image_max_jobs=args.image_max_jobs,
+        image_seed=args.image_seed,
+        caption_bg_style="box_shadow" if args.box_shadow else "text_shadow",
+        speed=args.speed,
+        pan_and_zoom=not args.no_pan_and_zoom,
+        pan_and_zoom_engine=args.pan_and_zoom_engine,
+        caption_engine=args.caption_engine,
+        orientation=args.orientation,
+        resolution=args.resolution,
+        frame_rate=args.frame_rate,
+        encoder_profile=args.encoder_profile,
+        draft=args.draft,
+        audio_codec=args.audio_codec,
+        render_workers=args.render_workers,
+        render_engine=args.render_engine,
+        cache=args.cache,
+        stream_render=args.stream_render,
+        incremental=args.incremental,
+    )
 
 def _parse_args():
     parser = argparse.ArgumentParser(
         prog = "Sitcom Simulator",
         description = "A tool that creates bad sitcoms using AI tools",
-        epilog = "Hit up the developer if you're having trouble 😘"
+        epilog = "Hit up the developer if you're having trouble 😘",
+        parents = [_render_args_parser()],
     )
 
     parser.add_argument('-t', '--max-tokens', metavar='N', type=int, default=2048, help="max number of tokens in generated script")
@@ -15,29 +81,46 @@ def _parse_args():
     parser.add_argument('-f', '--script-path', metavar='PATH', type=str, help="use a custom TOML script file instead of generating one (see example script)")
     parser.add_argument('-u', '--upload', action="store_true", help="upload the generated video to YouTube")
     parser.add_argument('-m', '--manual-select-characters', action="store_true", help="manually select characters instead of using the AI to select them")
-    parser.add_argument('-d', '--debug', action='store_true', help="skip expensive API calls, generating robotic TTS and blank images instead.")
-    parser.add_argument('--debug-images', action='store_true', help="skip expensive image generation API calls, generating blank images instead.")
-    parser.add_argument('--debug-audio', action='store_true', help="skip slow voice generation API calls, generating robotic TTS instead.")
-    parser.add_argument('--font', type=str, help="the font to use for the video", default='Arial')
-    parser.add_argument('--audio-job-delay', type=int, default=30, help="the number of seconds to wait between starting audio generation jobs. Lower values render faster but are more likely to get rate limited")
-    parser.add_argument('--audio-poll-delay', type=int, default=10, help="the number of seconds to wait between polling for audio generation job completion")
-    parser.add_argument('--box-shadow', action='store_true', help="use box background for captions instead of text shadow")
     parser.add_argument('--save-script', action='store_true', help="save the generated script to a file")
-    parser.add_argument('--speed', type=float, default=1, help="speed up the final video by this factor (1.0 is normal speed)")
-    parser.add_argument('--no-pan-and-zoom', action='store_true', help="disable pan and zoom effect on images")
-    parser.add_argument('--resolution', type=int, default=1080, help="the resolution of the video (passing in 1080 means 1080p)")
-    parser.add_argument('--orientation', type=str, default='portrait', help="the orientation of the video (landscape, portrait, or square)")
     parser.add_argument('--no-narrators', action='store_true', help="disable narrator characters")
     parser.add_argument('--music-url', type=str, help="a URL to a music track to use for the video")
-    parser.add_argument('--audio-codec', type=str, help="the audio codec to use for the video: mp3 or aac", default='mp3')
     args = parser.parse_args()
     return args
 
+def _parse_batch_args(argv: list[str]):
+    parser = argparse.ArgumentParser(
+        prog = "Sitcom Simulator batch",
+        description = "Render every TOML script in a directory, sharing sessions and caches across them. The options apply to every script, and the audio job delay is shared by the whole batch",
+        parents = [_render_args_parser()],
+    )
+
+    parser.add_argument('directory', type=str, help="the directory containing the TOML script files")
+    parser.add_argument('-o', '--output-dir', metavar='PATH', type=str, help="the directory to save the videos and the results manifest to (default: a 'renders' directory inside the script directory)")
+    parser.add_argument('-j', '--jobs', metavar='N', type=int, default=2, help="the number of scripts to work on at the same time")
+    return parser.parse_args(argv)
+
+def batch_main(argv: list[str]):
+    """
+    The entry point for the batch subcommand, which renders every script in a directory.
+    """
+    from .batch import render_batch_dir
+    args = _parse_batch_args(argv)
+    results = render_batch_dir(
+        args.directory,
+        output_dir=args.output_dir,
+        max_parallel_scripts=args.jobs,
+        **_render_options(args),
+    )
+    if any(result.status == "failed" for result in results):
+        sys.exit(1)
+
 def main():
     """
     The main entry point for the CLI, invoked when the module is run as a script.
     """
     print("\nSitcom Simulator\nBy Josh Moody\n")
+    if len(sys.argv) > 1 and sys.argv[1] == "batch":
+        return batch_main(sys.argv[2:])
     args = _parse_args()
     
     # do the magic
@@ -45,22 +128,12 @@ def main():
         prompt=args.prompt,
         art_style=args.style,
         script_path=args.script_path,
-        debug_images=args.debug_images or args.debug,
-        debug_audio=args.debug_audio or args.debug,
-        font=args.font,
         manual_select_characters=args.manual_select_characters,
         max_tokens=args.max_tokens,
         approve_script=args.approve_script,
         upload_to_yt=args.upload,
-        audio_job_delay=args.audio_job_delay,
-        audio_poll_delay=args.audio_poll_delay,
-        caption_bg_style="box_shadow" if args.box_shadow else "text_shadow",
         save_script=args.save_script,
-        speed=args.speed,
-        pan_and_zoom=not args.no_pan_and_zoom,
-        orientation=args.orientation,
-        resolution=args.resolution,
         narrator_dropout=args.no_narrators,
         music_url=args.music_url,
-        audio_codec=args.audio_codec,
+        **_render_options(args),
     )
\ No newline at end of file
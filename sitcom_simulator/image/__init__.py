@@ -1 +1 @@
-from .image_generator import generate_images, add_images
\ No newline at end of file
+from .image_generator import generate_images, add_images, agenerate_images, aadd_images
\ No newline at end of file
@@ -1,53 +1,127 @@
 from tqdm import tqdm
 from typing import List, Optional, Callable, Literal
 from sitcom_simulator.models import Script
-import os
-import atexit
+from ..cache import DiskCache, get_cache, hash_key
+from ..artifacts import Lease, adopt, hand_over
 
 Engine = Literal["stability", "pillow"]
 Orientation = Literal["landscape", "portrait", "square"]
 
+# the sizes SDXL was trained on that are closest to each orientation
+IMAGE_SIZES: dict[str, tuple[int, int]] = {
+    "landscape": (1344, 768),
+    "portrait": (768, 1344),
+    "square": (1024, 1024),
+}
+
+def image_cache_key(engine: Engine, full_prompt: str, width: int, height: int, seed: int | None) -> str:
+    """
+    Returns the cache key for an image.
+
+    :param engine: The engine that generates the image
+    :param full_prompt: The prompt of the image, including the art style
+    :param width: The width of the image
+    :param height: The height of the image
+    :param seed: The seed of the image, if any
+    """
+    return hash_key("image", engine, full_prompt, width, height, seed)
+
+def _clips_by_prompt(script: Script) -> tuple[List[str | None], dict[str, List[int]]]:
+    """
+    Returns the image paths the script already has (None for the others), and the clips that need an image grouped by their full prompt.
+    Clips that share a prompt (e.g. the same character talking over several lines) share one image.
+    """
+    image_paths: List[str | None] = [None] * len(script.clips)
+    clips_by_prompt: dict[str, List[int]] = {}
+    for i, clip in enumerate(script.clips):
+        if not clip.image_prompt:
+            continue
+        if clip.image_path:
+            image_paths[i] = clip.image_path
+            continue
+        full_prompt = f'{clip.image_prompt}{", " + script.metadata.art_style if script.metadata.art_style else ""}'
+        clips_by_prompt.setdefault(full_prompt, []).append(i)
+    return image_paths, clips_by_prompt
+
+def _leased(image_cache: DiskCache, path: str, lease: Lease | None) -> str:
+    """
+    Hands the cache's hold on an image to the lease, or releases it if there is no lease, and returns the path.
+    """
+    return hand_over(image_cache, path, lease)
+
 def generate_images(
         script: Script,
         orientation:Orientation="portrait",
         on_image_generated: Optional[Callable[[int, str], None]] = None,
         engine:Engine="stability",
+        max_concurrent_images:int=4,
+        requests_per_second:float=2,
+        stability_client=None,
+        image_cache: DiskCache | None = None,
+        seed:int | None = None,
+        lease: Lease | None = None,
     ):
     """
     Generates and returns a list of image paths for the given script.
 
+    Images are generated concurrently (up to max_concurrent_images at a time), so a script takes roughly as long as its slowest image.
+    New requests are started through a token bucket to stay under the provider's rate limit.
+    Clips with the same prompt share a single image, so each distinct prompt is only generated once.
+    If an image cache is given, images are looked up by their prompt (including the art style), size, engine and seed before being generated,
+    so re-rendering a script or reusing a prompt in another script costs nothing.
+
     More procedural in nature than add_images.
     
     :param script: The script to generate images for
     :param orientation: The orientation of the images to generate
-    :param on_image_generated: A callback to call after each image is generated which takes the clip index and path to the generated image
+    :param on_image_generated: A callback to call after each image is generated which takes the clip index and path to the generated image. It may be called from several threads and out of order
     :param engine: The engine to use for generating images
+    :param max_concurrent_images: The maximum number of images to generate at the same time
+    :param requests_per_second: The average number of image generation requests to start per second
+    :param stability_client: The client to generate Stability images with. Defaults to a client shared by the whole process (see stability.get_client)
+    :param image_cache: The cache to read generated images from and store them in. Cached images are held by the lease, so they can't be evicted mid-render
+    :param seed: The seed for image generation, which makes images reproducible. Defaults to a random seed (Stability only)
+    :param lease: The lease that holds the images, in the cache or the artifact store. Without one, they are not held, and may be deleted once the cache or store needs the space
     """
-    width, height = {
-        "landscape": (1344, 768),
-        "portrait": (768, 1344),
-        "square": (1024, 1024),
-    }[orientation]
+    width, height = IMAGE_SIZES[orientation]
     from .integrations import stability, pillow
-    image_paths: List[str | None] = []
-    for i, clip in tqdm(enumerate(script.clips), desc="Generating images", total=len(script.clips)):
-        image_prompt = clip.image_prompt
-        if not image_prompt:
-            image_paths.append(None)
-            continue
-        if clip.image_path:
-            image_paths.append(clip.image_path)
-            continue
+    from ..rate_limit import TokenBucket
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+
+    rate_limit = TokenBucket(rate=requests_per_second, capacity=max_concurrent_images) if engine == "stability" else None
+
+    def generate(full_prompt: str) -> str:
+        cache_key = image_cache_key(engine, full_prompt, width, height, seed)
+        if image_cache:
+            cached_image = image_cache.get(cache_key, suffix='.png', hold=True)
+            if cached_image:
+                return _leased(image_cache, cached_image, lease)
         if engine == "stability":
-            full_prompt = f'{image_prompt}{", " + script.metadata.art_style if script.metadata.art_style else ""}' 
-            image_path = stability.generate_image(prompt=full_prompt, width=width, height=height)
+            if rate_limit:
+                rate_limit.acquire()
+            image_path = stability.generate_image(prompt=full_prompt, width=width, height=height, client=stability_client, seed=seed)
         else: # debug engine
             image_path = pillow.generate_image(width, height)
-        atexit.register(os.remove, image_path)
-        image_paths.append(image_path)
-        if on_image_generated:
-            on_image_generated(i, image_path)
+        if image_cache:
+            return _leased(image_cache, image_cache.put(cache_key, image_path, suffix='.png', move=True, hold=True), lease)
+        return adopt(image_path, lease=lease)
+
+    image_paths, clips_by_prompt = _clips_by_prompt(script)
+
+    with ThreadPoolExecutor(max_workers=max(1, max_concurrent_images)) as executor:
+        futures = {executor.submit(generate, full_prompt): indices for full_prompt, indices in clips_by_prompt.items()}
+        for future in tqdm(as_completed(futures), desc="Generating images", total=len(futures)):
+            image_path = future.result()
+            for i in futures[future]:
+                image_paths[i] = image_path
+                if on_image_generated:
+                    on_image_generated(i, image_path)
 
+    duplicates = sum(len(indices) - 1 for indices in clips_by_prompt.values())
+    if duplicates:
+        print(f"{duplicates} clips share an image with an earlier clip that has the same prompt")
+    if image_cache:
+        print(image_cache.summary())
     return image_paths
 
 def add_images(
@@ -55,6 +129,11 @@ def add_images(
         orientation:Orientation="portrait",
         on_image_generated: Optional[Callable[[int, str], None]] = None,
         engine:Engine="stability",
+        max_concurrent_images:int=4,
+        cache_images:bool=False,
+        seed:int | None = None,
+        image_cache:DiskCache | None = None,
+        lease:Lease | None = None,
     ) -> Script:
     """
     Given a script, returns the same script but with the image paths filled in.
@@ -65,13 +144,112 @@ def add_images(
     :param orientation: The orientation of the images to generate
     :param on_image_generated: A callback to call after each image is generated which takes the clip index and path to the generated image
     :param engine: The engine to use for generating images
+    :param max_concurrent_images: The maximum number of images to generate at the same time
+    :param cache_images: If True, generated images are kept in a persistent on-disk cache and reused by later runs with the same prompt, size and seed
+    :param seed: The seed for image generation, which makes images reproducible (Stability only)
+    :param image_cache: The cache to use instead of the persistent one, e.g. a RenderManifest. Takes precedence over cache_images
+    :param lease: The lease that holds the images, in the cache or the artifact store. Without one, they are not held, and may be deleted once the cache or store needs the space
     """
     image_paths = generate_images(
         script=script,
         orientation=orientation,
         on_image_generated=on_image_generated,
-        engine=engine)
+        engine=engine,
+        max_concurrent_images=max_concurrent_images,
+        image_cache=image_cache or (get_cache("images") if cache_images else None),
+        seed=seed,
+        lease=lease)
+    return script.replace(
+        clips=[clip.replace(image_path=image_path) for clip, image_path in zip(script.clips, image_paths)],
+        metadata=script.metadata.replace(orientation=orientation)
+        )
+
+async def agenerate_images(
+        script: Script,
+        orientation:Orientation="portrait",
+        on_image_generated: Optional[Callable[[int, str], None]] = None,
+        engine:Engine="stability",
+        max_concurrent_images:int=4,
+        requests_per_second:float=2,
+        image_cache: DiskCache | None = None,
+        seed:int | None = None,
+        lease: Lease | None = None,
+    ):
+    """
+    The async version of generate_images, which waits on Stability's REST API without blocking the event loop.
+    The Stability engine requires httpx (pip install sitcom-simulator[async]).
+    See generate_images for the parameters.
+    """
+    import asyncio
+    from .integrations import stability, pillow
+    from ..rate_limit import TokenBucket
+    from ..aio import gather
+
+    width, height = IMAGE_SIZES[orientation]
+    rate_limit = TokenBucket(rate=requests_per_second, capacity=max_concurrent_images) if engine == "stability" else None
+    image_slots = asyncio.Semaphore(max(1, max_concurrent_images))
+    image_paths, clips_by_prompt = _clips_by_prompt(script)
+    progress = tqdm(desc="Generating images", total=len(clips_by_prompt))
+
+    async def generate(full_prompt: str, indices: List[int]):
+        cache_key = image_cache_key(engine, full_prompt, width, height, seed)
+        image_path = image_cache.get(cache_key, suffix='.png', hold=True) if image_cache else None
+        if image_cache and image_path:
+            _leased(image_cache, image_path, lease)
+        if not image_path:
+            async with image_slots:
+                if engine == "stability":
+                    if rate_limit:
+                        await rate_limit.aacquire()
+                    image_path = await stability.agenerate_image(prompt=full_prompt, width=width, height=height, seed=seed)
+                else: # debug engine
+                    image_path = pillow.generate_image(width, height)
+            if image_cache:
+                image_path = _leased(image_cache, image_cache.put(cache_key, image_path, suffix='.png', move=True, hold=True), lease)
+            else:
+                image_path = adopt(image_path, lease=lease)
+        progress.update()
+        for i in indices:
+            image_paths[i] = image_path
+            if on_image_generated:
+                on_image_generated(i, image_path)
+
+    try:
+        await gather(*(generate(full_prompt, indices) for full_prompt, indices in clips_by_prompt.items()))
+    finally:
+        progress.close()
+
+    duplicates = sum(len(indices) - 1 for indices in clips_by_prompt.values())
+    if duplicates:
+        print(f"{duplicates} clips share an image with an earlier clip that has the same prompt")
+    if image_cache:
+        print(image_cache.summary())
+    return image_paths
+
+async def aadd_images(
+        script: Script,
+        orientation:Orientation="portrait",
+        on_image_generated: Optional[Callable[[int, str], None]] = None,
+        engine:Engine="stability",
+        max_concurrent_images:int=4,
+        cache_images:bool=False,
+        seed:int | None = None,
+        image_cache:DiskCache | None = None,
+        lease:Lease | None = None,
+    ) -> Script:
+    """
+    The async version of add_images. See add_images for the parameters.
+    """
+    image_paths = await agenerate_images(
+        script=script,
+        orientation=orientation,
+        on_image_generated=on_image_generated,
+        engine=engine,
+        max_concurrent_images=max_concurrent_images,
+        image_cache=image_cache or (get_cache("images") if cache_images else None),
+        seed=seed,
+        lease=lease)
     return script.replace(
         clips=[clip.replace(image_path=image_path) for clip, image_path in zip(script.clips, image_paths)],
         metadata=script.metadata.replace(orientation=orientation)
-        )
\ No newline at end of file
+        )
@@ -1,22 +1,22 @@
 import random
-import tempfile
 
 def generate_image(width:int=720, height:int=1280):
     """
     Generates a random solid-color image and returns the path to the image file.
     Intended for use in debugging and testing.
+    The image is a scratch file of the artifact store, which the caller is responsible for adopting (see artifacts.adopt).
 
     :param width: The width of the image to generate
     :param height: The height of the image to generate
     """
     from PIL import Image
+    from ... import artifacts
     # Generate a random color
     color = (random.randint(0, 255), random.randint(0, 255), random.randint(0, 255))
     
     # Create a blank image with the random color
     img = Image.new('RGB', (width, height), color=color)
     
-    # Create a temporary file
-    with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as temp:
-        img.save(temp.name)
-        return temp.name
\ No newline at end of file
+    image_path = artifacts.scratch_path(suffix=".png")
+    img.save(image_path)
+    return image_path
\ No newline at end of file
@@ -1,53 +1,116 @@
-import tempfile
 import mimetypes
 import os
 import logging
+import threading
 
 STABILITY_HOST = "grpc.stability.ai:443"
+# the async API talks to the REST API instead, since the gRPC client blocks. The engine matches the SDXL sizes the image generator asks for
+STABILITY_REST_URL = "https://api.stability.ai/v1/generation/stable-diffusion-xl-1024-v1-0/text-to-image"
 
-def generate_image(prompt:str, width:int=1024, height:int=1024):
-    """
-    Generates an image for each prompt using stable diffusion,
-    returning a list of file paths for those images
+_client = None
+_client_lock = threading.Lock()
 
-    :param prompt: The prompt to generate the image for
-    :param width: The width of the image to generate
-    :param height: The height of the image to generate
+def create_client():
+    """
+    Creates a Stability client, which opens a gRPC channel to the Stability API.
+    The channel is reused for every request made with the client and can serve several requests at once.
     """
     # lazy load because this is a heavy dependency
-    import stability_sdk.interfaces.gooseai.generation.generation_pb2 as generation
-    from stability_sdk.client import StabilityInference, process_artifacts_from_answers
+    from stability_sdk.client import StabilityInference
 
     # customize engine here if desired (default is newest)
     # e.g., engine='stable-diffusion-v1-5'
-    stability_api = StabilityInference(
+    return StabilityInference(
         STABILITY_HOST,
         key=os.getenv('STABILITY_API_KEY'),
         verbose=False,
         )
-        
-    answers = stability_api.generate(
+
+def get_client():
+    """
+    Returns the Stability client shared by the whole process, creating it on first use,
+    so the gRPC channel and TLS handshake are set up once per run instead of once per image.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = create_client()
+        return _client
+
+def generate_image(prompt:str, width:int=1024, height:int=1024, client=None, seed:int|None=None):
+    """
+    Generates an image for the prompt using stable diffusion and returns the path to the image file.
+    The image is a scratch file of the artifact store, which the caller is responsible for adopting (see artifacts.adopt).
+
+    :param prompt: The prompt to generate the image for
+    :param width: The width of the image to generate
+    :param height: The height of the image to generate
+    :param client: The client to generate the image with. Defaults to the shared client from get_client. Anything with the same generate method works, e.g. a fake for testing
+    :param seed: The seed for the diffusion sampler, which makes the image reproducible. Defaults to a random seed
+    """
+    import stability_sdk.interfaces.gooseai.generation.generation_pb2 as generation
+    from ... import artifacts
+
+    client = client or get_client()
+    options = {'seed': seed} if seed is not None else {}
+    answers = client.generate(
         prompt=prompt,
         width=width,
         height=height,
+        **options,
         )
-        
-    artifacts = process_artifacts_from_answers(
-        prefix="", prompt=prompt, answers=answers, write=False, verbose=False,
-    )
-    
+
     img_path = None
-    
-    for file_path, artifact in artifacts:
-        if artifact.type == generation.ARTIFACT_IMAGE:
+
+    for answer in answers:
+        for artifact in answer.artifacts:
+            if artifact.type != generation.ARTIFACT_IMAGE:
+                continue
             ext = mimetypes.guess_extension(artifact.mime)
-            contents = artifact.binary
-            logging.debug("writing", file_path, "to temporary file")
-            with tempfile.NamedTemporaryFile(suffix=ext, delete=False, mode='wb') as tmp_img:
-                tmp_img.write(contents)
-                img_path = tmp_img.name
+            img_path = artifacts.scratch_path(suffix=ext or '')
+            with open(img_path, 'wb') as tmp_img:
+                tmp_img.write(artifact.binary)
+            break
+        if img_path:
             break
     if not img_path:
         raise Exception("Image not found in artifacts")
     logging.debug("Generated image:", img_path)
-    return img_path
\ No newline at end of file
+    return img_path
+
+async def agenerate_image(prompt:str, width:int=1024, height:int=1024, seed:int|None=None):
+    """
+    The async version of generate_image, which waits on Stability's REST API without blocking the event loop.
+    Requires httpx (pip install sitcom-simulator[async]).
+
+    :param prompt: The prompt to generate the image for
+    :param width: The width of the image to generate
+    :param height: The height of the image to generate
+    :param seed: The seed for the diffusion sampler, which makes the image reproducible. Defaults to a random seed
+    """
+    from ... import transport, artifacts
+
+    payload = {
+        'text_prompts': [{'text': prompt}],
+        'width': width,
+        'height': height,
+        'samples': 1,
+    }
+    if seed is not None:
+        payload['seed'] = seed
+    response = await transport.apost(
+        STABILITY_REST_URL,
+        headers={
+            'Authorization': f"Bearer {os.getenv('STABILITY_API_KEY')}",
+            'Accept': 'image/png',
+        },
+        json=payload,
+        )
+    if response.status_code != 200:
+        raise Exception(f"Stability API error {response.status_code}: {response.text}")
+
+    img_path = artifacts.scratch_path(suffix='.png')
+    with open(img_path, 'wb') as tmp_img:
+        tmp_img.write(response.content)
+    logging.debug("Generated image:", img_path)
+    return img_path
@@ -0,0 +1,85 @@
+import json
+import logging
+import os
+import sys
+from .cache import DiskCache
+
+MANIFEST_VERSION = 1 # bump whenever the layout of the manifest changes
+
+class RenderManifest(DiskCache):
+    """
+    The files generated for one output video, stored next to it and addressed by the fingerprint of their inputs,
+    so re-rendering an edited script only regenerates the voices, images and clips whose inputs changed.
+
+    For an output video.mp4, the files live in video.assets/ and video.manifest.json maps each fingerprint to its file.
+    The fingerprints are the same keys the voice, image and clip caches use, so a RenderManifest can be passed anywhere a DiskCache is accepted.
+    It never evicts files while rendering. Instead, save records the files the latest render used and deletes the rest,
+    so the directory only ever holds one render's worth of files.
+
+    :param output_path: The path of the output video
+    """
+    def __init__(self, output_path: str):
+        stem = os.path.splitext(os.path.abspath(output_path))[0]
+        super().__init__(os.path.basename(stem) + '.assets', max_bytes=sys.maxsize, root=os.path.dirname(stem))
+        self.path = stem + '.manifest.json'
+        self.previous = self._read()
+        self._used: dict[str, str] = {} # fingerprint -> path relative to the assets directory
+
+    @property
+    def bgm_url(self) -> str | None:
+        """
+        Returns the URL of the background music of the previous render, if any, so a re-render keeps the same song.
+        """
+        return self.previous.get('bgm_url')
+
+    def get(self, key: str, suffix:str='', hold:bool=False) -> str | None:
+        path = super().get(key, suffix=suffix, hold=hold)
+        if path:
+            self._record(key, path)
+        return path
+
+    def put(self, key: str, source_path: str, suffix:str='', move:bool=False, hold:bool=False) -> str:
+        path = super().put(key, source_path, suffix=suffix, move=move, hold=hold)
+        self._record(key, path)
+        return path
+
+    def save(self, bgm_url: str | None = None):
+        """
+        Writes the manifest of the files used by this render and deletes the files left over from earlier renders.
+        Call it once the output video is rendered.
+
+        :param bgm_url: The URL of the background music, if any
+        """
+        with self._lock:
+            used = dict(self._used)
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump({'version': MANIFEST_VERSION, 'files': used, 'bgm_url': bgm_url}, f, indent=2)
+        os.replace(temp_path, self.path) # atomic, so an interrupted save keeps the previous manifest
+        kept = {os.path.join(self.directory, path) for path in used.values()}
+        with self._lock:
+            for path, _ in list(self._entries()):
+                if path not in kept:
+                    os.remove(path)
+                    if not os.listdir(os.path.dirname(path)):
+                        os.rmdir(os.path.dirname(path))
+            self._index = None
+        reused = sum(1 for key in used if key in self.previous.get('files', {}))
+        print(f"Render manifest saved at {self.path} ({reused} of {len(used)} files reused from the previous render)")
+
+    def _record(self, key: str, path: str):
+        with self._lock:
+            self._used[key] = os.path.relpath(path, self.directory)
+
+    def _read(self) -> dict:
+        try:
+            with open(self.path, 'r') as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring unreadable render manifest at {self.path}: {e}")
+            return {}
+        if manifest.get('version') != MANIFEST_VERSION:
+            return {}
+        return manifest
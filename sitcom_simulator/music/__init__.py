@@ -1 +1 @@
-from .music_generator import add_music, generate_music
\ No newline at end of file
+from .music_generator import add_music, generate_music, aadd_music, agenerate_music
\ No newline at end of file
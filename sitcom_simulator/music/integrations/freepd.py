@@ -1,8 +1,7 @@
 import random
 import os
 from enum import Enum
-import atexit
-import tempfile
+import logging
 
 class MusicCategory(Enum):
     """
@@ -25,58 +24,129 @@ class MusicCategory(Enum):
         """
         return [str(member.value) for name, member in cls.__members__.items()]
 
-def download_random_music(category: MusicCategory) -> tuple[str | None, str]:
+def download_random_music(category: MusicCategory, offline:bool=False) -> tuple[str | None, str]:
     """
     Given a category, downloads a random song from FreePD in that category and returns the path to the downloaded file.
+
+    The song is picked from the local library index (see freepd_library), which is only refreshed from FreePD once a week,
+    and songs that were downloaded before are reused from the music cache, so a render usually needs no network access at all.
     
     :param category: The category of music to download
+    :param offline: If True, only pick from songs that are already downloaded and never contact FreePD
 
     :return: The path to the downloaded file
     """
-    from bs4 import BeautifulSoup
-    import requests
+    url = _random_track_url(category, offline=offline)
+    return download_file(url), url
 
-    # Send a GET request to the website
-    url = f"https://freepd.com/{category.value}.php"
-    response = requests.get(url)
+async def adownload_random_music(category: MusicCategory, offline:bool=False) -> tuple[str | None, str]:
+    """
+    The async version of download_random_music. The song is downloaded without blocking the event loop.
+
+    :param category: The category of music to download
+    :param offline: If True, only pick from songs that are already downloaded and never contact FreePD
+    """
+    import asyncio
+    # the library index is almost always read from disk, so it isn't worth an async version
+    url = await asyncio.to_thread(_random_track_url, category, offline)
+    return await adownload_file(url), url
 
-    # Parse the HTML content with BeautifulSoup
-    soup = BeautifulSoup(response.content, "html.parser")
+def _random_track_url(category: MusicCategory, offline:bool=False) -> str:
+    """
+    Returns the URL of a random song in the category from the local library index.
+    """
+    from .freepd_library import load_category, track_cache, track_cache_key
 
-    # Find all the song rows in the table
-    song_rows = soup.find_all("tr")[1:]
+    tracks = load_category(category.value, offline=offline).tracks
+    if offline:
+        cache = track_cache()
+        tracks = [track for track in tracks if os.path.exists(cache.path_for(track_cache_key(track.url), _extension(track.url)))]
+        if not tracks:
+            raise FileNotFoundError(f"No downloaded FreePD songs in the {category.value} category")
 
     # Randomly select a song
-    selected_song = random.choice(song_rows)
+    selected_song = random.choice(tracks)
+    return selected_song.url
 
-    # Extract song information
-    song_name = selected_song.find("b").text
-    download_link = "https://freepd.com" + selected_song.find("a", class_="downloadButton")["href"]
-
-    return download_file(download_link), download_link
+def _extension(url: str) -> str:
+    return '.' + url.split('.')[-1]
 
 def download_file(url: str):
     """
     Given a URL, downloads the file and returns the path to the downloaded file.
+    Files are kept in the music cache under a hash of their URL, so each song is only downloaded once.
 
     :param url: The URL of the file to download
 
     :return: The path to the downloaded file
     """
+    from ... import transport
+    from .freepd_library import track_cache, track_cache_key
     import requests
-    response = requests.get(url)
-    if response.status_code == 200:
-        # Get the file name from the URL
-        file_extension = url.split('.')[-1]
-        music_title = url.split('/')[-1].split('.')[0]
-        # Create a temporary file
-        temp_file = tempfile.NamedTemporaryFile(suffix=f'.{file_extension}', delete=False)
-        with open(temp_file.name, "wb") as file:
-            file.write(response.content)
-        print(f"Downloaded {music_title} successfully.")
-        # Register the cleanup function to delete the file at exit
-        atexit.register(os.remove, temp_file.name)
-        return temp_file.name
-    else:
+    music_title = url.split('/')[-1].split('.')[0]
+    cache = track_cache()
+    key = track_cache_key(url)
+    suffix = _extension(url)
+    # held so the song can't be evicted while a render is using it
+    cached_path = cache.get(key, suffix=suffix, hold=True)
+    if cached_path:
+        print(f"Using cached {music_title}.")
+        return cached_path
+    temp_path = cache.temp_path(suffix=suffix)
+    try:
+        # streamed to disk, so long tracks don't have to fit in memory
+        transport.download(url, temp_path)
+    except requests.HTTPError:
+        os.remove(temp_path)
+        print("Failed to download the file.")
+        return None
+    return _store_download(url, temp_path)
+
+async def adownload_file(url: str):
+    """
+    The async version of download_file. The file is downloaded without blocking the event loop.
+
+    :param url: The URL of the file to download
+
+    :return: The path to the downloaded file
+    """
+    import asyncio
+    import httpx
+    from ... import transport
+    from .freepd_library import track_cache, track_cache_key
+    music_title = url.split('/')[-1].split('.')[0]
+    cache = track_cache()
+    key = track_cache_key(url)
+    suffix = _extension(url)
+    # held so the song can't be evicted while a render is using it
+    cached_path = cache.get(key, suffix=suffix, hold=True)
+    if cached_path:
+        print(f"Using cached {music_title}.")
+        return cached_path
+    temp_path = cache.temp_path(suffix=suffix)
+    try:
+        await transport.adownload(url, temp_path)
+    except httpx.HTTPStatusError:
+        os.remove(temp_path)
         print("Failed to download the file.")
-        return None
\ No newline at end of file
+        return None
+    # measuring runs ffmpeg over the whole song once, so it gets a worker thread
+    return await asyncio.to_thread(_store_download, url, temp_path)
+
+def _store_download(url: str, temp_path: str) -> str:
+    """
+    Moves a downloaded song into the music cache, measures it, and returns its path in the cache.
+    """
+    from ...video.probe import media_duration
+    from ..loudness import track_loudness
+    from .freepd_library import track_cache, track_cache_key, record_measurements
+    music_title = url.split('/')[-1].split('.')[0]
+    path = track_cache().put(track_cache_key(url), temp_path, suffix=_extension(url), move=True, hold=True)
+    try:
+        # measured once here, so rendering only has to look the values up
+        loudness = track_loudness(path)
+        record_measurements(url, duration=media_duration(path), loudness=loudness.integrated if loudness else None)
+    except Exception as e:
+        logging.debug(f"Couldn't measure {music_title}: {e}")
+    print(f"Downloaded {music_title} successfully.")
+    return path
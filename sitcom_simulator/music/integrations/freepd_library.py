@@ -0,0 +1,187 @@
+from dataclasses import dataclass, field, asdict
+from typing import List
+import json
+import logging
+import os
+import threading
+import time
+
+FREEPD_URL = 'https://freepd.com'
+INDEX_TTL_SECONDS = 7 * 24 * 60 * 60 # FreePD adds songs rarely, so a week-old listing is good enough
+INDEX_VERSION = 1 # bump whenever the layout of the library index changes
+
+@dataclass
+class Track:
+    """
+    A song on FreePD.
+
+    :param name: The name of the song
+    :param url: The URL of the song's MP3 file
+    :param duration: The length of the song in seconds, once it has been downloaded and measured
+    :param loudness: The integrated loudness of the song in LUFS, once it has been downloaded and measured
+    """
+    name: str
+    url: str
+    duration: float | None = None
+    loudness: float | None = None
+
+@dataclass
+class CategoryIndex:
+    """
+    The songs FreePD lists for one category.
+
+    :param tracks: The songs in the order FreePD lists them
+    :param fetched_at: The UNIX time the listing was last fetched
+    """
+    tracks: List[Track] = field(default_factory=list)
+    fetched_at: float = 0
+
+    @staticmethod
+    def from_dict(data: dict) -> 'CategoryIndex':
+        return CategoryIndex(tracks=[Track(**track) for track in data['tracks']], fetched_at=data['fetched_at'])
+
+def parse_category_page(html: str | bytes) -> List[Track]:
+    """
+    Returns the songs listed on a FreePD category page (e.g. https://freepd.com/comedy.php).
+    Parsing is kept separate from fetching so it can run against saved HTML.
+
+    :param html: The HTML of the category page
+    """
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, "html.parser")
+    tracks = []
+    for row in soup.find_all("tr")[1:]: # the first row is the table header
+        name = row.find("b")
+        download_button = row.find("a", class_="downloadButton")
+        href = download_button.get("href") if download_button is not None else None
+        if name is None or not isinstance(href, str) or not href:
+            continue
+        tracks.append(Track(name=name.text.strip(), url=FREEPD_URL + href))
+    return tracks
+
+def default_index_path() -> str:
+    """
+    Returns the path of the library index inside the sitcom simulator cache directory.
+    """
+    from sitcom_simulator.cache import CACHE_ROOT
+    return os.path.join(CACHE_ROOT, 'freepd', 'library.json')
+
+_indices: dict[str, dict[str, CategoryIndex]] = {} # index path -> category -> index
+_lock = threading.Lock()
+
+def load_category(
+        category: str,
+        max_age:float=INDEX_TTL_SECONDS,
+        path: str | None = None,
+        offline:bool=False,
+    ) -> CategoryIndex:
+    """
+    Returns the songs in a FreePD category, fetching the category page only when the indexed listing is missing or older than max_age.
+    If FreePD can't be reached, a stale listing is used rather than failing.
+    The index is also kept in memory, so repeated calls in the same process are free.
+
+    :param category: The category, e.g. "comedy"
+    :param max_age: How many seconds an indexed listing is used before fetching it again
+    :param path: The path of the library index. Defaults to the sitcom simulator cache directory
+    :param offline: If True, never contact FreePD and use whatever listing is indexed, however old
+    """
+    path = path or default_index_path()
+    with _lock:
+        indices = _load_indices(path)
+        index = indices.get(category)
+        is_fresh = index is not None and time.time() - index.fetched_at < max_age
+        if not is_fresh and not offline:
+            try:
+                index = _fetch_category(category, index)
+                indices[category] = index
+                _write_indices(path, indices)
+            except Exception as e:
+                if index is None:
+                    raise
+                logging.warning(f"Failed to refresh FreePD {category} listing, using the indexed copy: {e}")
+        if index is None:
+            raise FileNotFoundError(f"No indexed FreePD listing for {category} at {path}")
+        return index
+
+def record_measurements(url: str, path: str | None = None, **measurements):
+    """
+    Stores measurements of a song (its duration and loudness) in the library index, if the song is indexed.
+
+    :param url: The URL of the song
+    :param path: The path of the library index. Defaults to the sitcom simulator cache directory
+    :param measurements: The Track fields to store, e.g. duration=95.2
+    """
+    path = path or default_index_path()
+    with _lock:
+        indices = _load_indices(path)
+        changed = False
+        for index in indices.values():
+            for track in index.tracks:
+                if track.url != url:
+                    continue
+                for name, value in measurements.items():
+                    if getattr(track, name) != value:
+                        setattr(track, name, value)
+                        changed = True
+        if changed:
+            _write_indices(path, indices)
+
+def track_cache_key(url: str) -> str:
+    """
+    Returns the key a song is stored under in the music cache.
+
+    :param url: The URL of the song
+    """
+    from sitcom_simulator.cache import hash_key
+    return hash_key("freepd", url)
+
+def track_cache():
+    """
+    Returns the on-disk cache of downloaded songs, which stores each song under a hash of its URL.
+    """
+    from sitcom_simulator.cache import get_cache
+    return get_cache("music")
+
+def _fetch_category(category: str, index: CategoryIndex | None) -> CategoryIndex:
+    from sitcom_simulator import transport
+    logging.info(f"Fetching FreePD {category} listing")
+    response = transport.get(f"{FREEPD_URL}/{category}.php")
+    response.raise_for_status()
+    tracks = parse_category_page(response.content)
+    if not tracks:
+        raise ValueError(f"No songs found on the FreePD {category} page")
+    # keep the measurements of songs that were measured before
+    measured = {track.url: track for track in index.tracks} if index else {}
+    for track in tracks:
+        if track.url in measured:
+            track.duration = measured[track.url].duration
+            track.loudness = measured[track.url].loudness
+    return CategoryIndex(tracks=tracks, fetched_at=time.time())
+
+def _load_indices(path: str) -> dict[str, CategoryIndex]:
+    """
+    Returns the category indices from memory, or from disk the first time. Must be called with the lock held.
+    """
+    if path not in _indices:
+        _indices[path] = _read_indices(path)
+    return _indices[path]
+
+def _read_indices(path: str) -> dict[str, CategoryIndex]:
+    try:
+        with open(path, 'r') as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logging.warning(f"Ignoring unreadable FreePD library index at {path}: {e}")
+        return {}
+    if data.get('version') != INDEX_VERSION:
+        return {}
+    return {category: CategoryIndex.from_dict(index) for category, index in data['categories'].items()}
+
+def _write_indices(path: str, indices: dict[str, CategoryIndex]):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'w') as f:
+        json.dump({'version': INDEX_VERSION, 'categories': {category: asdict(index) for category, index in indices.items()}}, f)
+    os.replace(temp_path, path) # atomic, so a concurrent run never reads a partial index
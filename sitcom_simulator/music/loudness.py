@@ -0,0 +1,113 @@
+from dataclasses import dataclass, asdict
+import json
+import logging
+import os
+import re
+import threading
+
+MAX_TRUE_PEAK = -1.0 # dBTP, the highest peak a gain is allowed to push the music to
+
+@dataclass
+class Loudness:
+    """
+    The EBU R128 loudness of an audio file.
+
+    :param integrated: The integrated loudness in LUFS
+    :param true_peak: The true peak in dBTP
+    """
+    integrated: float
+    true_peak: float
+
+    def gain_to(self, target: float) -> float:
+        """
+        Returns the gain in dB that brings the file to the target loudness, lowered if needed so the peaks don't clip.
+
+        :param target: The target integrated loudness in LUFS
+        """
+        return min(target - self.integrated, MAX_TRUE_PEAK - self.true_peak)
+
+def measure_loudness(path: str) -> Loudness | None:
+    """
+    Measures the loudness of an audio file with one ffmpeg ebur128 analysis pass, or returns None if it can't be measured (e.g., silence).
+
+    :param path: The path to the audio file
+    """
+    import ffmpeg
+    try:
+        _, stderr = (
+            ffmpeg
+            .input(path)
+            .audio
+            .filter('ebur128', peak='true')
+            .output('-', format='null')
+            .run(capture_stdout=True, capture_stderr=True)
+        )
+    except ffmpeg.Error as e:
+        logging.warning(f"Couldn't measure the loudness of {path}: {e.stderr.decode() if e.stderr else e}")
+        return None
+    # the totals are printed in a summary after the per-frame measurements
+    summary = stderr.decode(errors='replace').rpartition('Summary:')[2]
+    integrated = re.search(r'I:\s+(-?[\d.]+|-inf) LUFS', summary)
+    true_peak = re.search(r'Peak:\s+(-?[\d.]+|-inf) dBFS', summary)
+    if not integrated or not true_peak or integrated.group(1) == '-inf' or float(integrated.group(1)) <= -70: # silent
+        return None
+    return Loudness(integrated=float(integrated.group(1)), true_peak=float(true_peak.group(1)))
+
+_measurements: dict[str, dict[str, dict]] = {} # store path -> content hash -> loudness
+_lock = threading.Lock()
+
+def default_store_path() -> str:
+    """
+    Returns the path of the loudness measurements inside the sitcom simulator cache directory.
+    """
+    from sitcom_simulator.cache import CACHE_ROOT
+    return os.path.join(CACHE_ROOT, 'music_loudness.json')
+
+def track_loudness(path: str, store_path: str | None = None) -> Loudness | None:
+    """
+    Returns the loudness of a music file, measuring it only the first time the file is seen.
+
+    Measurements are stored by a hash of the file's contents, so they survive across runs
+    and apply to the same song wherever it is stored.
+    Downloaded songs are measured as soon as they are downloaded, so rendering only has to look the value up.
+
+    :param path: The path to the music file
+    :param store_path: The path of the stored measurements. Defaults to the sitcom simulator cache directory
+    """
+    from sitcom_simulator.cache import hash_file
+    store_path = store_path or default_store_path()
+    key = hash_file(path)
+    with _lock:
+        measurements = _load_measurements(store_path)
+        if key in measurements:
+            return Loudness(**measurements[key])
+    loudness = measure_loudness(path)
+    if loudness is None:
+        return None
+    with _lock:
+        measurements = _load_measurements(store_path)
+        measurements[key] = asdict(loudness)
+        _write_measurements(store_path, measurements)
+    return loudness
+
+def _load_measurements(path: str) -> dict[str, dict]:
+    """
+    Returns the stored measurements from memory, or from disk the first time. Must be called with the lock held.
+    """
+    if path not in _measurements:
+        try:
+            with open(path, 'r') as f:
+                _measurements[path] = json.load(f)
+        except FileNotFoundError:
+            _measurements[path] = {}
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring unreadable loudness measurements at {path}: {e}")
+            _measurements[path] = {}
+    return _measurements[path]
+
+def _write_measurements(path: str, measurements: dict[str, dict]):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'w') as f:
+        json.dump(measurements, f)
+    os.replace(temp_path, path) # atomic, so a concurrent run never reads a partial file
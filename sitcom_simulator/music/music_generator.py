@@ -9,7 +9,8 @@ def generate_music(
         category: str | None,
         engine:Engine="freepd",
         music_url: str | None = None,
-        ) -> tuple[str, str]:
+        offline:bool=False,
+        ) -> tuple[str | None, str]:
     """
     Generates and returns a path to a music file using the given engine.
 
@@ -18,30 +19,58 @@ def generate_music(
     :param category: The category of music to generate
     :param engine: The engine to use for generating music
     :param music_url: The URL of the music to use. If provided, category is ignored.
+    :param offline: If True, only use music that was downloaded by an earlier run
 
-    :return: The path to the generated music file and the url of the music to use
+    :return: The path to the generated music file (None if it couldn't be downloaded) and the url of the music to use
     """
     from .integrations import freepd
     if engine == "freepd":
         if music_url:
             logging.debug(f"Using music from URL: {music_url}")
             return freepd.download_file(music_url), music_url
-        logging.debug(f"Generating music: {category}")
-        try:
-            freepd_category = freepd.MusicCategory(category)
-        except ValueError:
-            freepd_category = None
-        if freepd_category is None:
-            freepd_category = random.choice(list(freepd.MusicCategory))
-        return freepd.download_random_music(freepd_category)
+        return freepd.download_random_music(_freepd_category(category), offline=offline)
     else:
         raise ValueError(f"Invalid engine: {engine}")
 
+async def agenerate_music(
+        category: str | None,
+        engine:Engine="freepd",
+        music_url: str | None = None,
+        offline:bool=False,
+        ) -> tuple[str | None, str]:
+    """
+    The async version of generate_music, which downloads the music without blocking the event loop.
+    See generate_music for the parameters.
+    """
+    from .integrations import freepd
+    if engine == "freepd":
+        if music_url:
+            logging.debug(f"Using music from URL: {music_url}")
+            return await freepd.adownload_file(music_url), music_url
+        return await freepd.adownload_random_music(_freepd_category(category), offline=offline)
+    else:
+        raise ValueError(f"Invalid engine: {engine}")
+
+def _freepd_category(category: str | None):
+    """
+    Returns the FreePD category with the given name, or a random one if there is no such category.
+    """
+    from .integrations import freepd
+    logging.debug(f"Generating music: {category}")
+    try:
+        freepd_category = freepd.MusicCategory(category)
+    except ValueError:
+        freepd_category = None
+    if freepd_category is None:
+        freepd_category = random.choice(list(freepd.MusicCategory))
+    return freepd_category
+
 def add_music(
         script: Script,
         engine:Engine="freepd",
         music_url: str | None = None,
         on_music_generated: Optional[Callable[[str], None]] = None,
+        offline:bool=False,
         ):
     """
     Given a script, returns the same script but with the music path filled in.
@@ -52,8 +81,24 @@ def add_music(
     :param engine: The engine to use for generating music
     :param music_url: The URL of the music to use. If provided, category is ignored.
     :param on_music_generated: A callback to call after the music is generated which takes the path to the generated music
+    :param offline: If True, only use music that was downloaded by an earlier run
+    """
+    music_path, music_url = generate_music(category=script.metadata.bgm_style, music_url=music_url, engine=engine, offline=offline)
+    if on_music_generated and music_path:
+        on_music_generated(music_path)
+    return script.replace(metadata=script.metadata.replace(bgm_path=music_path, bgm_url=music_url))
+
+async def aadd_music(
+        script: Script,
+        engine:Engine="freepd",
+        music_url: str | None = None,
+        on_music_generated: Optional[Callable[[str], None]] = None,
+        offline:bool=False,
+        ):
+    """
+    The async version of add_music. See add_music for the parameters.
     """
-    music_path, music_url = generate_music(category=script.metadata.bgm_style, music_url=music_url, engine=engine)
-    if on_music_generated:
+    music_path, music_url = await agenerate_music(category=script.metadata.bgm_style, music_url=music_url, engine=engine, offline=offline)
+    if on_music_generated and music_path:
         on_music_generated(music_path)
     return script.replace(metadata=script.metadata.replace(bgm_path=music_path, bgm_url=music_url))
\ No newline at end of file
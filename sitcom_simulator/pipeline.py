@@ -0,0 +1,153 @@
+from typing import Awaitable, Callable, Optional
+from dataclasses import fields
+from .models import Script, Clip, ScriptMetadata
+import time
+import logging
+import threading
+
+Stage = Callable[[Script], Script]
+AsyncStage = Callable[[Script], Awaitable[Script]]
+
+def merge_scripts(original: Script, results: list[Script]) -> Script:
+    """
+    Combines several scripts derived from the same original into one.
+
+    Every clip and metadata field that a result changed relative to the original is copied into the merged script.
+    If more than one result changed the same field, the later result wins.
+
+    :param original: The script every result was derived from
+    :param results: The scripts returned by each stage
+    """
+    clips = list(original.clips)
+    metadata = original.metadata
+    for result in results:
+        if len(result.clips) != len(original.clips):
+            raise ValueError("Stages must not add or remove clips")
+        for i, (original_clip, result_clip) in enumerate(zip(original.clips, result.clips)):
+            changes = {f.name: getattr(result_clip, f.name) for f in fields(Clip) if getattr(result_clip, f.name) != getattr(original_clip, f.name)}
+            if changes:
+                clips[i] = clips[i].replace(**changes)
+        metadata_changes = {f.name: getattr(result.metadata, f.name) for f in fields(ScriptMetadata) if getattr(result.metadata, f.name) != getattr(original.metadata, f.name)}
+        if metadata_changes:
+            metadata = metadata.replace(**metadata_changes)
+    return original.replace(clips=clips, metadata=metadata)
+
+def add_assets(
+        script: Script,
+        stages: dict[str, Stage],
+        parallel:bool=True,
+        on_stage_finished: Optional[Callable[[str, float], None]] = None,
+    ) -> Script:
+    """
+    Runs independent asset generation stages (e.g., add_voices, add_images and add_music) on the same script and merges their results.
+
+    The stages only depend on the script, not on each other, so by default they run concurrently
+    and the total time is roughly that of the slowest stage rather than the sum of all of them.
+
+    :param script: The script to add assets to
+    :param stages: A dictionary of stage names to functions that take the script and return it with their assets filled in
+    :param parallel: If True, the stages run concurrently in a thread pool. Otherwise they run in order
+    :param on_stage_finished: A callback to call after each stage finishes which takes the stage name and its wall time in seconds
+    """
+    timings: dict[str, float] = {}
+
+    def run(name: str, stage: Stage) -> Script:
+        start = time.perf_counter()
+        result = stage(script)
+        timings[name] = time.perf_counter() - start
+        logging.info(f"Stage {name} finished in {timings[name]:.1f}s")
+        if on_stage_finished:
+            on_stage_finished(name, timings[name])
+        return result
+
+    start = time.perf_counter()
+    if parallel and len(stages) > 1:
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=len(stages)) as executor:
+            futures = [executor.submit(run, name, stage) for name, stage in stages.items()]
+            results = [future.result() for future in futures]
+    else:
+        results = [run(name, stage) for name, stage in stages.items()]
+    total = time.perf_counter() - start
+
+    stage_times = ", ".join(f"{name}: {timings[name]:.1f}s" for name in stages)
+    print(f"Generated assets in {total:.1f}s ({stage_times})")
+    return merge_scripts(script, results)
+
+async def aadd_assets(
+        script: Script,
+        stages: dict[str, AsyncStage],
+        on_stage_finished: Optional[Callable[[str, float], None]] = None,
+    ) -> Script:
+    """
+    The async version of add_assets, which runs coroutine stages (e.g., aadd_voices, aadd_images and aadd_music) concurrently on the event loop.
+    If a stage fails, the others are cancelled.
+
+    :param script: The script to add assets to
+    :param stages: A dictionary of stage names to coroutine functions that take the script and return it with their assets filled in
+    :param on_stage_finished: A callback to call after each stage finishes which takes the stage name and its wall time in seconds
+    """
+    from .aio import gather
+    timings: dict[str, float] = {}
+
+    async def run(name: str, stage: AsyncStage) -> Script:
+        start = time.perf_counter()
+        result = await stage(script)
+        timings[name] = time.perf_counter() - start
+        logging.info(f"Stage {name} finished in {timings[name]:.1f}s")
+        if on_stage_finished:
+            on_stage_finished(name, timings[name])
+        return result
+
+    start = time.perf_counter()
+    results = await gather(*(run(name, stage) for name, stage in stages.items()))
+    total = time.perf_counter() - start
+
+    stage_times = ", ".join(f"{name}: {timings[name]:.1f}s" for name in stages)
+    print(f"Generated assets in {total:.1f}s ({stage_times})")
+    return merge_scripts(script, results)
+
+class ClipAssembler:
+    """
+    Tracks which assets each clip is still waiting for while the asset stages run,
+    and hands every clip to a callback the moment its audio and image are both available.
+
+    Pass on_voice_downloaded and on_image_generated as the callbacks of add_voices and add_images.
+    Clips that need no voice or image (or already have one) don't wait for it,
+    and clips that are ready from the start are handed off immediately.
+
+    :param script: The script whose assets are being generated
+    :param on_clip_ready: A callback which takes the clip index and the clip with its available asset paths filled in
+    """
+    def __init__(self, script: Script, on_clip_ready: Callable[[int, Clip], None]):
+        self.on_clip_ready = on_clip_ready
+        self._clips = list(script.clips)
+        self._waiting_for: list[set[str]] = []
+        self._lock = threading.Lock()
+        for clip in self._clips:
+            waiting_for = set()
+            if clip.speech and not clip.audio_path:
+                waiting_for.add("audio")
+            if clip.image_prompt and not clip.image_path:
+                waiting_for.add("image")
+            self._waiting_for.append(waiting_for)
+        for i, clip in enumerate(self._clips):
+            if not self._waiting_for[i]:
+                on_clip_ready(i, clip)
+
+    def on_voice_downloaded(self, index: int, audio_path: str):
+        self._add_asset(index, "audio", audio_path=audio_path)
+
+    def on_image_generated(self, index: int, image_path: str):
+        self._add_asset(index, "image", image_path=image_path)
+
+    def _add_asset(self, index: int, asset: str, **paths):
+        with self._lock:
+            if asset not in self._waiting_for[index]:
+                return
+            self._waiting_for[index].discard(asset)
+            self._clips[index] = self._clips[index].replace(**paths)
+            ready = not self._waiting_for[index]
+            clip = self._clips[index]
+        if ready:
+            self.on_clip_ready(index, clip)
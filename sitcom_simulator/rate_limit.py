@@ -0,0 +1,58 @@
+import asyncio
+import threading
+import time
+
+class TokenBucket:
+    """
+    A thread-safe token bucket rate limiter.
+
+    Tokens refill continuously at a fixed rate up to the bucket's capacity, and each request spends one token.
+    Unlike sleeping a fixed amount between requests, idle time is banked (up to the capacity),
+    so the limit is an average rate rather than a minimum gap.
+
+    :param rate: How many tokens are added per second
+    :param capacity: The maximum number of tokens the bucket can hold, i.e., the largest allowed burst
+    """
+    def __init__(self, rate: float, capacity:float=1):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def try_acquire(self) -> float:
+        """
+        Takes a token if one is available and returns 0.
+        Otherwise, returns how many seconds until the next token is available without taking one.
+        """
+        with self._lock:
+            self._refill()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self):
+        """
+        Blocks until a token is available, then takes it.
+        """
+        while True:
+            wait = self.try_acquire()
+            if wait == 0:
+                return
+            time.sleep(wait)
+
+    async def aacquire(self):
+        """
+        Waits without blocking the event loop until a token is available, then takes it.
+        """
+        while True:
+            wait = self.try_acquire()
+            if wait == 0:
+                return
+            await asyncio.sleep(wait)
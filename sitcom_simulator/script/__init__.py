@@ -1 +1 @@
-from .script_generator import write_script, script_from_file
\ No newline at end of file
+from .script_generator import write_script, awrite_script, script_from_file
\ No newline at end of file
@@ -34,6 +34,24 @@ def generate_character_list(prompt: str, custom_instructions: str | None=None) -
     :param prompt: The user-submitted prompt
     :param custom_instructions: A string containing custom instructions for the language model. Must contain the placeholder '{prompt}'.
     """
+    from sitcom_simulator.script.llm import chat
+    raw_response = chat(_extraction_instructions(prompt, custom_instructions))
+    return _characters_from_response(raw_response)
+
+async def agenerate_character_list(prompt: str, custom_instructions: str | None=None) -> List[Character]:
+    """
+    The async version of generate_character_list, which waits on the language model without blocking the event loop.
+
+    :param prompt: The user-submitted prompt
+    :param custom_instructions: A string containing custom instructions for the language model. Must contain the placeholder '{prompt}'.
+    """
+    import asyncio
+    from sitcom_simulator.script.llm import achat
+    raw_response = await achat(_extraction_instructions(prompt, custom_instructions))
+    # loading the voice catalog can mean downloading it, which is done with the blocking client
+    return await asyncio.to_thread(_characters_from_response, raw_response)
+
+def _extraction_instructions(prompt: str, custom_instructions: str | None=None) -> str:
     if custom_instructions:
         instructions = custom_instructions
     else:
@@ -46,35 +64,33 @@ def generate_character_list(prompt: str, custom_instructions: str | None=None) -
 
     if "{prompt}" not in instructions:
         raise ValueError("Custom instructions file must contain the placeholder '{prompt}'")
-    instructions = instructions.format(prompt=prompt)
+    return instructions.format(prompt=prompt)
+
+def _characters_from_response(raw_response: str) -> List[Character]:
+    """
+    Matches the character names proposed by the language model to FakeYou voices.
+    """
+    from .voice_catalog import load_voice_catalog
 
-    from sitcom_simulator.script.llm import chat
-    import requests
-    
-    raw_response = chat(instructions)
     logging.debug("Raw character extractor response from LLM:", raw_response)
     character_names = json.loads(raw_response)
     logging.debug("Characters proposed:", ", ".join(character_names), "\n")
     
-    # TODO: cache data from fakeyou to avoid lots of hits?
-    res = requests.get('https://api.fakeyou.com/tts/list')
-    fakeyou_character_list = res.json()['models']
-    name_to_model = pure_name_to_model(fakeyou_character_list)
+    # the catalog and its name index are cached on disk, so this is usually free
+    catalog = load_voice_catalog()
     
-    curated_characters = load_curated_voices()
     chosen_characters = []
     for name in character_names:
         # TODO (big maybe) if tts doesn't exist but vtv does, render tts in someone else's voice and then use vtv
-        from thefuzz import process
         SIMILARITY_CUTOFF = 75 # out of 100
-        extraction = process.extractOne(normalize_string(name), list(name_to_model.keys()), score_cutoff=SIMILARITY_CUTOFF)
+        extraction = catalog.matcher.best_match(normalize_string(name), score_cutoff=SIMILARITY_CUTOFF)
         if extraction:
             match, score = extraction
             logging.debug(f"Matched {name} to {match} with score {score}")
-            voices = name_to_model[match.lower()]
             # find the highest-rated match
-            highest_rated_voice = max(voices, key=lambda model: calculate_star_rating(model, curated_characters))
-            chosen_characters.append(Character(name=name, voice_token=highest_rated_voice['model_token']))
+            highest_rated_voice = catalog.highest_rated_model(match)
+            if highest_rated_voice:
+                chosen_characters.append(Character(name=name, voice_token=highest_rated_voice['model_token']))
     logging.info("Selected voices:", ", ".join([c.name for c in chosen_characters]))
     
     # guarantee at least one voice (narrator)
@@ -0,0 +1,223 @@
+from dataclasses import dataclass, field
+from functools import cached_property
+from typing import List
+import json
+import logging
+import os
+import threading
+import time
+
+CATALOG_URL = 'https://api.fakeyou.com/tts/list'
+CATALOG_TTL_SECONDS = 24 * 60 * 60 # the catalog changes slowly, so a day-old copy is good enough
+INDEX_VERSION = 1 # bump whenever the layout of the precomputed index changes
+
+@dataclass
+class VoiceCatalog:
+    """
+    The FakeYou voice catalog together with a precomputed index for resolving character names to voices.
+
+    Everything is computed once when the catalog is built and serialized with it,
+    so looking up characters needs neither a network call nor re-parsing the model titles.
+
+    :param models: The raw models from the FakeYou TTS list, in the order FakeYou returned them
+    :param pure_names: A dictionary mapping each lowercase pure name (see pure_character_name) to the indices of its models
+    :param character_names: For each model, the name of the character, i.e. the title up to the first parenthesis
+    :param keywords: For each model, the keywords of its character name (see string_to_keywords)
+    :param ratings: For each model, its star rating including the curated ratings (see calculate_star_rating)
+    :param fetched_at: The UNIX time the catalog was last fetched or confirmed unchanged
+    :param etag: The ETag FakeYou sent with the catalog, used to refresh it conditionally
+    :param last_modified: The Last-Modified header FakeYou sent with the catalog, used to refresh it conditionally
+    :param curated_hash: A hash of the curated ratings the ratings were computed with
+    """
+    models: List[dict]
+    pure_names: dict[str, List[int]] = field(default_factory=dict)
+    character_names: List[str] = field(default_factory=list)
+    keywords: List[List[str]] = field(default_factory=list)
+    ratings: List[float] = field(default_factory=list)
+    fetched_at: float = 0
+    etag: str | None = None
+    last_modified: str | None = None
+    curated_hash: str | None = None
+
+    @staticmethod
+    def build(models: List[dict], curated_voices: dict[str, float] | None = None, **kwargs) -> 'VoiceCatalog':
+        """
+        Builds the catalog and its index from a list of FakeYou models.
+        This is the slow step that load_voice_catalog avoids repeating on every run.
+
+        :param models: The models from the FakeYou TTS list (or a fixture with the same shape)
+        :param curated_voices: The curated ratings by model title. Defaults to curated_voices.csv
+        :param kwargs: The remaining fields of the catalog, e.g. fetched_at and etag
+        """
+        from .character_extractor import pure_character_name, calculate_star_rating, load_curated_voices
+        from sitcom_simulator.speech.integrations.fakeyou import string_to_keywords, alphanumeric_to_first_paren
+        if curated_voices is None:
+            curated_voices = load_curated_voices()
+
+        pure_names: dict[str, List[int]] = {}
+        for i, model in enumerate(models):
+            pure_name = pure_character_name(model['title'])
+            if not pure_name:
+                continue
+            pure_names.setdefault(pure_name.lower(), []).append(i)
+
+        return VoiceCatalog(
+            models=models,
+            pure_names=pure_names,
+            character_names=[alphanumeric_to_first_paren(model['title']) for model in models],
+            keywords=[sorted(string_to_keywords(model['title'], True)) for model in models],
+            ratings=[calculate_star_rating(model, curated_voices) for model in models],
+            **kwargs,
+        )
+
+    @cached_property
+    def matcher(self):
+        """
+        Returns the VoiceMatcher for this catalog, built the first time it is needed.
+        """
+        from .voice_matcher import VoiceMatcher
+        return VoiceMatcher(self.pure_names.keys(), self.keywords)
+
+    def models_for_pure_name(self, pure_name: str) -> List[dict]:
+        """
+        Returns the models whose pure name matches the given one, in catalog order.
+
+        :param pure_name: A pure name as returned by pure_character_name
+        """
+        return [self.models[i] for i in self.pure_names.get(pure_name.lower(), [])]
+
+    def highest_rated_model(self, pure_name: str) -> dict | None:
+        """
+        Returns the highest-rated model for the given pure name, or None if there is none.
+        Ties go to the model that comes first in the catalog.
+
+        :param pure_name: A pure name as returned by pure_character_name
+        """
+        indices = self.pure_names.get(pure_name.lower())
+        if not indices:
+            return None
+        return self.models[max(indices, key=lambda i: self.ratings[i])]
+
+    def to_dict(self) -> dict:
+        return {
+            'version': INDEX_VERSION,
+            'models': self.models,
+            'pure_names': self.pure_names,
+            'character_names': self.character_names,
+            'keywords': self.keywords,
+            'ratings': self.ratings,
+            'fetched_at': self.fetched_at,
+            'etag': self.etag,
+            'last_modified': self.last_modified,
+            'curated_hash': self.curated_hash,
+        }
+
+    @staticmethod
+    def from_dict(data: dict) -> 'VoiceCatalog':
+        return VoiceCatalog(**{key: value for key, value in data.items() if key != 'version'})
+
+def default_catalog_path() -> str:
+    """
+    Returns the path of the cached catalog inside the sitcom simulator cache directory.
+    """
+    from sitcom_simulator.cache import CACHE_ROOT
+    return os.path.join(CACHE_ROOT, 'fakeyou', 'voice_catalog.json')
+
+def curated_voices_hash() -> str:
+    """
+    Returns a hash of the curated ratings, so cached ratings are recomputed when curated_voices.csv changes.
+    """
+    from sitcom_simulator.cache import hash_file
+    return hash_file(os.path.join(os.path.dirname(os.path.realpath(__file__)), 'curated_voices.csv'))
+
+_loaded: dict[str, VoiceCatalog] = {}
+_lock = threading.Lock()
+
+def load_voice_catalog(
+        max_age:float=CATALOG_TTL_SECONDS,
+        path: str | None = None,
+        offline:bool=False,
+    ) -> VoiceCatalog:
+    """
+    Returns the FakeYou voice catalog, downloading it only when the cached copy is missing or older than max_age.
+
+    A stale catalog is refreshed with a conditional request, so an unchanged catalog isn't downloaded again.
+    If FakeYou can't be reached, a stale catalog is used rather than failing.
+    The catalog is also kept in memory, so repeated calls in the same process are free.
+
+    :param max_age: How many seconds a cached catalog is used before checking FakeYou for a newer one
+    :param path: The path of the cached catalog. Defaults to the sitcom simulator cache directory
+    :param offline: If True, never contact FakeYou and use whatever catalog is cached, however old
+    """
+    path = path or default_catalog_path()
+    with _lock:
+        catalog = _loaded.get(path) or _read_catalog(path)
+        curated_hash = curated_voices_hash()
+        if catalog and catalog.curated_hash != curated_hash:
+            # the curated ratings changed, but the catalog itself didn't
+            logging.info("Curated voices changed, rebuilding voice catalog index")
+            catalog = VoiceCatalog.build(catalog.models, fetched_at=catalog.fetched_at, etag=catalog.etag, last_modified=catalog.last_modified, curated_hash=curated_hash)
+            _write_catalog(path, catalog)
+
+        is_fresh = catalog is not None and time.time() - catalog.fetched_at < max_age
+        if not is_fresh and not offline:
+            try:
+                catalog = _refresh_catalog(catalog, curated_hash)
+                _write_catalog(path, catalog)
+            except Exception as e:
+                if catalog is None:
+                    raise
+                logging.warning(f"Failed to refresh FakeYou voice catalog, using the cached copy: {e}")
+
+        if catalog is None:
+            raise FileNotFoundError(f"No cached FakeYou voice catalog at {path}")
+        _loaded[path] = catalog
+        return catalog
+
+def _refresh_catalog(catalog: VoiceCatalog | None, curated_hash: str) -> VoiceCatalog:
+    """
+    Downloads the catalog unless FakeYou reports that the cached copy is still current.
+    """
+    from sitcom_simulator import transport
+    headers = {}
+    if catalog and catalog.etag:
+        headers['If-None-Match'] = catalog.etag
+    if catalog and catalog.last_modified:
+        headers['If-Modified-Since'] = catalog.last_modified
+    logging.info("Fetching voice list from fakeyou")
+    response = transport.get(CATALOG_URL, headers=headers)
+    if response.status_code == 304 and catalog:
+        logging.info("FakeYou voice catalog is unchanged")
+        catalog.fetched_at = time.time()
+        return catalog
+    response.raise_for_status()
+    json_data = response.json()
+    if json_data.get('success') != True:
+        raise Exception("Error fetching voice list from fakeyou")
+    return VoiceCatalog.build(
+        json_data['models'],
+        fetched_at=time.time(),
+        etag=response.headers.get('ETag'),
+        last_modified=response.headers.get('Last-Modified'),
+        curated_hash=curated_hash,
+    )
+
+def _read_catalog(path: str) -> VoiceCatalog | None:
+    try:
+        with open(path, 'r') as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logging.warning(f"Ignoring unreadable voice catalog at {path}: {e}")
+        return None
+    if data.get('version') != INDEX_VERSION:
+        return None
+    return VoiceCatalog.from_dict(data)
+
+def _write_catalog(path: str, catalog: VoiceCatalog):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'w') as f:
+        json.dump(catalog.to_dict(), f)
+    os.replace(temp_path, path) # atomic, so a concurrent run never reads a partial catalog
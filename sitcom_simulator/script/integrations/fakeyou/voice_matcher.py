@@ -0,0 +1,141 @@
+from typing import List, Set, Tuple, Iterable
+from collections import defaultdict
+import math
+
+PARTIAL_LENGTH_RATIO = 1.5 # WRatio only uses the partial ratio when one string is at least this much longer
+PARTIAL_SCALE = 0.9 # and scales it down by (at least) this much
+
+def tagged_bigrams(string: str) -> List[str]:
+    """
+    Returns the bigrams of the string padded with a marker on each side, each tagged with how many times it occurred before,
+    e.g. "aaa" -> ["^a0", "aa0", "aa1", "a$0"]. Tagging turns the multiset of bigrams into a set,
+    so the number of tagged bigrams two strings share is the size of their bigram multiset intersection.
+
+    :param string: The string to split into bigrams
+    """
+    padded = f"^{string}$"
+    seen: dict[str, int] = defaultdict(int)
+    bigrams = []
+    for i in range(len(padded) - 1):
+        bigram = padded[i:i+2]
+        bigrams.append(f"{bigram}{seen[bigram]}")
+        seen[bigram] += 1
+    return bigrams
+
+def min_shared_bigrams(query_length: int, name_length: int, score_cutoff: float) -> float:
+    """
+    Returns a lower bound on the number of tagged bigrams a name must share with the query to reach score_cutoff with WRatio,
+    or infinity if the name can't reach it at all. Only valid for single words (no spaces after processing).
+
+    Both strings contain their longest common subsequence, and every character outside it breaks at most one of its bigrams,
+    so two strings with a common subsequence of length L share at least 3L + 1 - (len(a) + len(b)) padded bigrams.
+    The cutoff bounds L from below: the plain ratio is 2L / (len(a) + len(b)),
+    and the partial ratio is the same ratio between the shorter string and a window of the longer one.
+    """
+    short, long = sorted((query_length, name_length))
+    if short == 0:
+        return math.inf
+    bound = math.inf
+    ratio = score_cutoff / 100
+    if 2 * short / (short + long) >= ratio: # the plain ratio can reach the cutoff
+        bound = min(bound, (1.5 * ratio - 1) * (short + long) + 1)
+    if long >= short * PARTIAL_LENGTH_RATIO:
+        partial = min(1, ratio / PARTIAL_SCALE)
+        # a window scoring `partial` is at least this long, and the bigrams at the window's edges aren't padded
+        min_window = partial * short / (2 - partial)
+        bound = min(bound, (1.5 * partial - 1) * (short + min_window) - 2)
+    return bound - 1e-9 # guard against rounding
+
+class VoiceMatcher:
+    """
+    Indexes the FakeYou voice catalog for fast character lookups.
+
+    Fuzzy name matching uses an inverted index of padded bigrams to count how many bigrams each name shares with the query,
+    skips every name that shares too few to reach the similarity cutoff (see min_shared_bigrams),
+    and scores only the remaining candidates with WRatio, exactly as thefuzz's process.extractOne would.
+    So the results (including ties, which go to the name that comes first) are the same as a full scan.
+
+    Keyword matching uses an inverted index from each keyword to the voices whose name contains it,
+    so only voices that share a keyword with the prompt are considered.
+
+    :param names: The pure names to match against, in catalog order
+    :param keywords: For each voice, the keywords of its character name
+    """
+    def __init__(self, names: Iterable[str], keywords: Iterable[Iterable[str]] = ()):
+        from thefuzz.utils import full_process
+        self.names = list(names)
+        # the same preprocessing thefuzz applies to the choices for WRatio
+        self._processed = [full_process(name, force_ascii=True) for name in self.names]
+        self._bigram_index: dict[str, List[int]] = defaultdict(list)
+        self._names_by_length: dict[int, List[int]] = defaultdict(list)
+        self._lengths = [len(processed) for processed in self._processed]
+        self._unindexed_names: List[int] = [] # multi-word names, which the bigram bound doesn't cover
+        for i, processed in enumerate(self._processed):
+            if ' ' in processed:
+                self._unindexed_names.append(i)
+                continue
+            for bigram in tagged_bigrams(processed):
+                self._bigram_index[bigram].append(i)
+            self._names_by_length[len(processed)].append(i)
+
+        self.keywords = [set(voice_keywords) for voice_keywords in keywords]
+        self._keyword_index: dict[str, List[int]] = defaultdict(list)
+        for i, voice_keywords in enumerate(self.keywords):
+            for keyword in voice_keywords:
+                self._keyword_index[keyword].append(i)
+
+    def _candidates(self, processed_query: str, score_cutoff: float) -> List[int]:
+        shared: dict[int, int] = defaultdict(int)
+        for bigram in tagged_bigrams(processed_query):
+            for i in self._bigram_index.get(bigram, []):
+                shared[i] += 1
+        required = {length: min_shared_bigrams(len(processed_query), length, score_cutoff) for length in self._names_by_length}
+        candidates: Set[int] = set(self._unindexed_names)
+        candidates.update(i for i, count in shared.items() if count >= required[self._lengths[i]])
+        # names too short to share any bigram can still reach the cutoff through the partial ratio
+        for length, indices in self._names_by_length.items():
+            if required[length] <= 0:
+                candidates.update(indices)
+        return sorted(candidates)
+
+    def best_match(self, query: str, score_cutoff:float=75) -> Tuple[str, int] | None:
+        """
+        Returns the name that best matches the query and its score, or None if no name scores at least score_cutoff.
+        Equivalent to thefuzz's process.extractOne(query, names, score_cutoff=score_cutoff).
+
+        :param query: The name to look up
+        :param score_cutoff: The minimum similarity score out of 100
+        """
+        from thefuzz import process
+        from thefuzz.utils import full_process
+        from rapidfuzz import process as rapidfuzz_process, fuzz
+        processed_query = full_process(full_process(query), force_ascii=True)
+        if not processed_query or ' ' in processed_query:
+            return process.extractOne(query, self.names, score_cutoff=score_cutoff)
+        candidates = self._candidates(processed_query, score_cutoff)
+        if not candidates:
+            return None
+        result = rapidfuzz_process.extractOne(
+            processed_query,
+            [self._processed[i] for i in candidates],
+            scorer=fuzz.WRatio,
+            processor=None,
+            score_cutoff=score_cutoff,
+        )
+        if result is None:
+            return None
+        _, score, candidate_index = result
+        return self.names[candidates[candidate_index]], int(round(score))
+
+    def keyword_matches(self, prompt_keywords: Set[str], threshold:float=0.45) -> List[int]:
+        """
+        Returns the indices (in catalog order) of the voices for which at least the given fraction of their keywords appear in the prompt.
+
+        :param prompt_keywords: The keywords of the prompt
+        :param threshold: The minimum fraction of a voice's keywords that must appear in the prompt
+        """
+        overlap: dict[int, int] = defaultdict(int)
+        for keyword in prompt_keywords:
+            for i in self._keyword_index.get(keyword, []):
+                overlap[i] += 1
+        return sorted(i for i, count in overlap.items() if count / len(self.keywords[i]) >= threshold)
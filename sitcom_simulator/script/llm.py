@@ -1,3 +1,7 @@
 def chat(prompt: str, max_tokens:int=2048, temperature:float=1):
     from .integrations.chatgpt import chatgpt
-    return chatgpt.chat(prompt, max_tokens, temperature)
\ No newline at end of file
+    return chatgpt.chat(prompt, max_tokens, temperature)
+
+async def achat(prompt: str, max_tokens:int=2048, temperature:float=1):
+    from .integrations.chatgpt import chatgpt
+    return await chatgpt.achat(prompt, max_tokens, temperature)
\ No newline at end of file
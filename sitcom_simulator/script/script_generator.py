@@ -1,5 +1,5 @@
-from typing import Callable
-from ..models import Script
+from typing import Callable, List
+from ..models import Script, Character
 import toml
 from dataclasses import asdict
 import logging
@@ -36,7 +36,6 @@ def write_script(
     from ..speech.integrations.fakeyou import get_possible_characters_from_prompt
     from .integrations.chatgpt import chatgpt
     from .integrations.fakeyou.character_extractor import generate_character_list
-    from ..music.integrations.freepd import MusicCategory
 
     if manual_character_selection:
         from .integrations.fakeyou.character_selector import select_characters as fakeyou_select_characters
@@ -47,6 +46,58 @@ def write_script(
     else:
         characters = generate_character_list(prompt, custom_instructions=custom_character_instructions)
 
+    full_prompt = _script_prompt(prompt, characters, max_tokens=max_tokens, custom_script_instructions=custom_script_instructions)
+    approved = False
+    while not approved:
+        raw_script= chatgpt.chat(full_prompt, temperature=temperature, max_tokens=max_tokens, model=model)
+        script = _parse_script(raw_script, characters, narrator_dropout=narrator_dropout)
+        if(require_approval):
+            validated = None
+            while validated not in ["y", "n", "q"]:
+                validated = input("Do you approve this script? (y/n/q): ").lower()
+                if validated == "y": approved = True
+                elif validated == "n": approved = False
+                elif validated == "q": exit()
+                else: print("Unrecognized input. Try again.")
+        else:
+            approved = True
+    return script
+
+async def awrite_script(
+        prompt: str,
+        characters: List[Character] | None = None,
+        max_tokens:int=2048,
+        temperature:float=0.5,
+        model:str="gpt-4o-mini",
+        custom_script_instructions: str | None=None,
+        custom_character_instructions: str | None=None,
+        narrator_dropout:bool=False,
+        ) -> Script:
+    """
+    The async version of write_script, which waits on the language model without blocking the event loop.
+
+    It never asks the user anything, since that would block the event loop:
+    the characters are the ones given, or extracted by the language model, and the script is not submitted for approval.
+    See write_script for the other parameters.
+
+    :param prompt: The prompt for the script
+    :param characters: The characters to write the script for. If not provided, an LLM will extract characters from the prompt.
+    """
+    from .integrations.chatgpt import chatgpt
+    from .integrations.fakeyou.character_extractor import agenerate_character_list
+
+    if characters is None:
+        characters = await agenerate_character_list(prompt, custom_instructions=custom_character_instructions)
+    full_prompt = _script_prompt(prompt, characters, max_tokens=max_tokens, custom_script_instructions=custom_script_instructions)
+    raw_script = await chatgpt.achat(full_prompt, temperature=temperature, max_tokens=max_tokens, model=model)
+    return _parse_script(raw_script, characters, narrator_dropout=narrator_dropout)
+
+def _script_prompt(prompt: str, characters: List[Character], max_tokens:int, custom_script_instructions: str | None=None) -> str:
+    """
+    Returns the full prompt that asks the language model for a script.
+    """
+    from ..music.integrations.freepd import MusicCategory
+
     characters_str = ", ".join([c.name for c in characters])
     music_categories_str = ", ".join(MusicCategory.values())
 
@@ -64,30 +115,22 @@ def write_script(
     if "{prompt}" not in instructions or "{music_categories}" not in instructions or "{characters}" not in instructions:
         raise ValueError("Custom instructions file must contain the placeholders '{prompt}', '{music_categories}', and '{characters}'")
 
-    full_prompt = instructions.format(prompt=prompt, characters=characters_str, max_tokens=max_tokens, music_categories=music_categories_str)
-    approved = False
-    while not approved:
-        raw_script= chatgpt.chat(full_prompt, temperature=temperature, max_tokens=max_tokens, model=model)
-        logging.debug("Raw script", raw_script)
-        toml_script = toml.loads(raw_script)
-        toml_script["characters"] = [asdict(c) for c in characters] # from characters to dict back to character. Refactor at some point.
-        script = Script.from_dict(toml_script)
-        if narrator_dropout:
-            script = script.replace(clips=[c for c in script.clips if c.speaker.lower().strip() != "narrator"])
-            if len(script.clips) == 0:
-                raise ValueError("Narrator dropout resulted in an empty script. Please try again.")
-        logging.debug("TOML script", script)
-        print(formatted_script(script), "\n")
-        if(require_approval):
-            validated = None
-            while validated not in ["y", "n", "q"]:
-                validated = input("Do you approve this script? (y/n/q): ").lower()
-                if validated == "y": approved = True
-                elif validated == "n": approved = False
-                elif validated == "q": exit()
-                else: print("Unrecognized input. Try again.")
-        else:
-            approved = True
+    return instructions.format(prompt=prompt, characters=characters_str, max_tokens=max_tokens, music_categories=music_categories_str)
+
+def _parse_script(raw_script: str, characters: List[Character], narrator_dropout:bool=False) -> Script:
+    """
+    Parses the language model's TOML response into a script for the given characters and prints it.
+    """
+    logging.debug("Raw script", raw_script)
+    toml_script = toml.loads(raw_script)
+    toml_script["characters"] = [asdict(c) for c in characters] # from characters to dict back to character. Refactor at some point.
+    script = Script.from_dict(toml_script)
+    if narrator_dropout:
+        script = script.replace(clips=[c for c in script.clips if c.speaker.lower().strip() != "narrator"])
+        if len(script.clips) == 0:
+            raise ValueError("Narrator dropout resulted in an empty script. Please try again.")
+    logging.debug("TOML script", script)
+    print(formatted_script(script), "\n")
     return script
 
 def script_from_file(path: str) -> Script:
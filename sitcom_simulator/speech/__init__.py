@@ -1 +1 @@
-from sitcom_simulator.speech.speech_generator import generate_voices, add_voices
\ No newline at end of file
+from sitcom_simulator.speech.speech_generator import generate_voices, add_voices, agenerate_voices, aadd_voices
\ No newline at end of file
@@ -6,64 +6,78 @@ import time
 import uuid
 from pathlib import Path
 from ...models import Script
+from ...rate_limit import TokenBucket
 import logging
 import random
 from sitcom_simulator.script.integrations.fakeyou.narrators import BACKUP_NARRATORS
-import urllib
-import tempfile
-import atexit
+import threading
 
 JOB_RANDOMNESS = 3 # +- this value, might help bypass rate limiting
 POLL_RANDOMNESS = 1
 
+# shared by every generate_voices call in the process, so concurrent scripts (e.g. in a batch) respect the rate limit together
+_job_buckets: dict[float, TokenBucket] = {}
+_job_buckets_lock = threading.Lock()
+
+# a browser-like User-Agent, otherwise 403 on FakeYou's new CDN
+DOWNLOAD_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/133.0.0.0 Safari/537.36",
+    "Accept": "*/*",
+    "Referer": "https://fakeyou.com/",  # FakeYou might check this
+}
+
 def download_voice(url: str):
     """
-    Downloads audio from a given URL and saves it to a temporary file.
+    Downloads audio from a given URL to a scratch file of the artifact store and returns its path.
+    The caller is responsible for adopting the file into the store (see artifacts.adopt).
 
     :param url: The URL of the audio to download
     """
     logging.info(f"Downloading audio from: {url}")
-    temp_audio_file = tempfile.NamedTemporaryFile(suffix='.wav', delete=False)
-    atexit.register(os.remove, temp_audio_file.name)
+    from ... import transport, artifacts
+    import requests
+    audio_path = artifacts.scratch_path(suffix='.wav')
+    try:
+        transport.download(url, audio_path, headers=DOWNLOAD_HEADERS)
+    except requests.HTTPError as e:
+        os.remove(audio_path)
+        status_code = e.response.status_code if e.response is not None else None
+        raise Exception(f"Failed to download audio from URL: {url}. Status code: {status_code}")
+
+    logging.info(f"Audio downloaded to: {audio_path}")
+    return audio_path
+
+async def adownload_voice(url: str):
+    """
+    The async version of download_voice.
 
+    :param url: The URL of the audio to download
+    """
+    logging.info(f"Downloading audio from: {url}")
+    from ... import transport, artifacts
+    import httpx
+    audio_path = artifacts.scratch_path(suffix='.wav')
     try:
-        # uses urllib because AWS lambda doesn't have requests (not that that matters anymore)
-        # Create a request with a browser-like User-Agent (otherwise 403 on FakeYou's new CDN)
-        req = urllib.request.Request(
-            url,
-            headers={
-                "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/133.0.0.0 Safari/537.36",
-                "Accept": "*/*",
-                "Connection": "keep-alive",
-                "Referer": "https://fakeyou.com/",  # FakeYou might check this
-            }
-        )
-
-        # Open the URL and write the content to a file
-        with urllib.request.urlopen(req) as response, open(temp_audio_file.name, 'wb') as out_file:
-            data = response.read()
-            out_file.write(data)
-
-        logging.info(f"Audio downloaded to: {temp_audio_file.name}")
-        return temp_audio_file.name
-
-    except urllib.error.HTTPError as e:
-        raise Exception(f"Failed to download audio from URL: {url}. Status code: {e.code}")
-    except urllib.error.URLError as e:
-        raise Exception(f"Failed to download audio from URL: {url}. Error: {e.reason}")
+        await transport.adownload(url, audio_path, headers=DOWNLOAD_HEADERS)
+    except httpx.HTTPStatusError as e:
+        os.remove(audio_path)
+        raise Exception(f"Failed to download audio from URL: {url}. Status code: {e.response.status_code}")
+
+    logging.info(f"Audio downloaded to: {audio_path}")
+    return audio_path
 
 def fetch_voicelist():
     """
-    Fetches the list of available voices from the FakeYou API.
+    Returns the list of available voices from the FakeYou API.
+    The list is cached on disk and only downloaded again once it's a day old.
     """
-    import requests
-    response = requests.get('https://api.fakeyou.com/tts/list')
-    logging.info("Fetching voice list from fakeyou")
-    json = response.json()
-    if(json['success'] != True):
+    from sitcom_simulator.script.integrations.fakeyou.voice_catalog import load_voice_catalog
+    try:
+        return load_voice_catalog().models
+    except Exception as e:
+        logging.error(e)
         print("Error fetching voice list from fakeyou. Exiting.")
         exit()
-    return json['models']
 
 def string_to_keywords(string: str, stop_at_first_paren=False) -> Set[str]:
     # don't match anything after the first parenthesis
@@ -93,24 +107,25 @@ def get_possible_characters_from_prompt(prompt: str) -> dict:
 
     :param prompt: The prompt for the script
     """
+    from sitcom_simulator.script.integrations.fakeyou.voice_catalog import load_voice_catalog
     possible_characters: Dict[str, List[str]] = dict()
-    voices = fetch_voicelist()
+    try:
+        catalog = load_voice_catalog()
+    except Exception as e:
+        logging.error(e)
+        print("Error fetching voice list from fakeyou. Exiting.")
+        exit()
     prompt_keywords = string_to_keywords(prompt, False)
-    for voice in tqdm(voices, desc="Searching for characters in prompt:"):
-        title = voice['title']
-        character_name = alphanumeric_to_first_paren(title)
-        voice_keywords = string_to_keywords(title, True)
-
-        if len(voice_keywords) == 0:
-            continue
-
-        # at least this fraction of the keywords in the character name have to be found in the prompt
-        MATCH_THRESHOLD = 0.45
-        if(len(voice_keywords.intersection(prompt_keywords)) / len(voice_keywords) >= MATCH_THRESHOLD):   
-            if(character_name in possible_characters):
-                possible_characters[character_name].append(voice)
-            else:
-                possible_characters[character_name] = [voice]
+    # at least this fraction of the keywords in the character name have to be found in the prompt
+    MATCH_THRESHOLD = 0.45
+    # only voices sharing a keyword with the prompt are checked, via the catalog's keyword index
+    for i in catalog.matcher.keyword_matches(prompt_keywords, MATCH_THRESHOLD):
+        voice = catalog.models[i]
+        character_name = catalog.character_names[i]
+        if(character_name in possible_characters):
+            possible_characters[character_name].append(voice)
+        else:
+            possible_characters[character_name] = [voice]
 
     return possible_characters
 
@@ -118,10 +133,26 @@ def sign_in(username_or_email: str, password: str) -> str:
     """
     Signs in to the FakeYou API and returns the session cookie.
     """
-    import requests
-    response = requests.post('https://api.fakeyou.com/v1/login',
+    from ... import transport
+    response = transport.post('https://api.fakeyou.com/v1/login',
+        json={"username_or_email": username_or_email, "password": password}
+    )
+    return _session_cookie(response)
+
+async def asign_in(username_or_email: str, password: str) -> str:
+    """
+    The async version of sign_in.
+    """
+    from ... import transport
+    response = await transport.apost('https://api.fakeyou.com/v1/login',
         json={"username_or_email": username_or_email, "password": password}
     )
+    return _session_cookie(response)
+
+def _session_cookie(response) -> str:
+    """
+    Returns the session cookie from a login response (of requests or httpx, which share this part of their API).
+    """
     auth_data = response.json()
     if not auth_data['success']:
         logging.exception("Failed to log in to FakeYou API")
@@ -132,99 +163,251 @@ def sign_in(username_or_email: str, password: str) -> str:
     cookie = re.search(r'\w+.=([^;]+)', cookie).group(1)
     return cookie
 
+def _voice_token(script: Script, speaker: str) -> str:
+    try:
+        character = next((character for character in script.characters if character.name == speaker))
+    except: # probably because character not in characters list
+        character = random.choice(BACKUP_NARRATORS)
+    return character.voice_token
+
+def _job_request(voice_token: str, text: str, cookie: str | None = None) -> tuple[dict, dict]:
+    """
+    Returns the headers and payload that start a FakeYou TTS job.
+    """
+    headers = {
+        'Accept': 'application/json',
+        'Content-Type': 'application/json',
+    }
+    if cookie:
+        headers['cookie'] = f"session={cookie}"
+        headers["credentials"] = "include"
+
+    payload = {
+        "uuid_idempotency_token": str(uuid.uuid4()),
+        "tts_model_token": voice_token,
+        "inference_text": text,
+    }
+    return headers, payload
+
+def _job_token(response, payload: dict) -> str:
+    """
+    Returns the job token from the response to a job submission (of requests or httpx, which share this part of their API).
+    """
+    try:
+        json = response.json()
+    except:
+        print(response.text)
+        raise Exception("Failed to parse JSON from FakeYou API: " + response.text + " " + str(payload))
+    if not json['success']:
+        raise Exception("Some sort of FakeYou API error occured", json)
+    return json['inference_job_token']
+
+def _submit_job(voice_token: str, text: str, cookie: str | None = None) -> str:
+    """
+    Starts a FakeYou TTS job and returns its job token.
+    """
+    from ... import transport
+    headers, payload = _job_request(voice_token, text, cookie=cookie)
+    response = transport.post('https://api.fakeyou.com/tts/inference', headers=headers, json=payload)
+    return _job_token(response, payload)
+
+async def _asubmit_job(voice_token: str, text: str, cookie: str | None = None) -> str:
+    """
+    The async version of _submit_job.
+    """
+    from ... import transport
+    headers, payload = _job_request(voice_token, text, cookie=cookie)
+    response = await transport.apost('https://api.fakeyou.com/tts/inference', headers=headers, json=payload)
+    return _job_token(response, payload)
+
+def _job_bucket(job_delay: float) -> TokenBucket | None:
+    """
+    Returns the process-wide token bucket for starting jobs every job_delay seconds, or None if there is no delay.
+    """
+    if job_delay <= 0:
+        return None
+    with _job_buckets_lock:
+        if job_delay not in _job_buckets:
+            _job_buckets[job_delay] = TokenBucket(rate=1 / job_delay)
+        return _job_buckets[job_delay]
+
+def _poll_job(job_token: str) -> dict:
+    """
+    Returns the current state of a FakeYou TTS job.
+    """
+    from ... import transport
+    response = transport.get(f'https://api.fakeyou.com/tts/job/{job_token}', headers={'Accept': 'application/json'})
+    return response.json()
+
+async def _apoll_job(job_token: str) -> dict:
+    """
+    The async version of _poll_job.
+    """
+    from ... import transport
+    response = await transport.aget(f'https://api.fakeyou.com/tts/job/{job_token}', headers={'Accept': 'application/json'})
+    return response.json()
+
+def _poll_delay(poll_delay: float) -> float:
+    return random.uniform(max(0, poll_delay-POLL_RANDOMNESS), poll_delay+POLL_RANDOMNESS)
+
+def _job_jitter() -> float:
+    """
+    Returns how long to hold a job back after the token bucket lets it start.
+    The bucket spaces jobs exactly job_delay apart, and the jitter makes that job_delay +- JOB_RANDOMNESS, so the jobs don't arrive like clockwork.
+    """
+    return random.uniform(0, JOB_RANDOMNESS)
+
+def _audio_url(json: dict) -> str:
+    """
+    Returns the URL of the audio of a successfully completed job.
+    """
+    audio_path = json["state"]["maybe_public_bucket_wav_audio_path"]
+    return f'https://cdn-2.fakeyou.com{audio_path}'
+
+def _clips_needing_voices(script: Script) -> tuple[List[str | None], List[tuple[int, str, str]]]:
+    """
+    Returns the audio URLs the script already has (None for the others), and the index, speaker and line of each clip that still needs a voice.
+    """
+    audio_urls: List[str | None] = [None] * len(script.clips)
+    pending: List[tuple[int, str, str]] = []
+    for i, clip in enumerate(script.clips):
+        # skip if doesn't need audio, or if audio already exists (audio should never already exist, but just in case)
+        if not clip.speaker or not clip.speech:
+            continue
+        if clip.audio_url:
+            audio_urls[i] = clip.audio_url
+            continue
+        pending.append((i, clip.speaker, clip.speech))
+    return audio_urls, pending
+
 def generate_voices(
         script: Script,
         on_voice_url_generated: Optional[Callable[[int, str], None]] = None,
         job_delay:float=30,
         poll_delay:float=10,
         cookie:str|None=None,
+        max_jobs_in_flight:int=3,
     ) -> List[str | None]:
     """
-    Sequentially generates voices for each line in the script using the FakeYou API.
-    It is intentionally slow to avoid getting rate limited.
+    Generates voices for each line in the script using the FakeYou API and returns their URLs in clip order.
+
+    Up to max_jobs_in_flight jobs run at once. New jobs are started through a token bucket that allows one job per job_delay seconds on average,
+    and every outstanding job is polled in the same loop, so slow jobs don't hold up the ones behind them.
+    Generation is still intentionally slow to avoid getting rate limited, and each job start is jittered by up to JOB_RANDOMNESS seconds.
     It can be sped up by having FAKEYOU_USERNAME and FAKEYOU_PASSWORD set as environment variables.
 
     :param script: The script to generate voices for
-    :param on_voice_generated: A callback function to call when a voice is generated which takes the clip index and the URL of the generated audio
-    :param job_delay: The number of seconds to wait between starting audio generation jobs. Lower values render faster but are more likely to get rate limited
+    :param on_voice_url_generated: A callback function to call as soon as each voice is generated which takes the clip index and the URL of the generated audio
+    :param job_delay: The average number of seconds between starting audio generation jobs. Lower values render faster but are more likely to get rate limited
     :param poll_delay: The number of seconds to wait between polling for audio generation job completion
     :param cookie: The session cookie to use for the FakeYou API (acquired from sign_in)
+    :param max_jobs_in_flight: The maximum number of jobs that can be queued or running on FakeYou at the same time
     """
-    import requests
-    audio_urls: List[str | None] = []
-    for i, clip in tqdm(enumerate(script.clips), desc="Generating voices", total=len(script.clips)):
-        # skip if doesn't need audio, or if audio already exists (audio should never already exist, but just in case)
-        if not clip.speaker:
-            audio_urls.append(None)
-            continue
-        if clip.audio_url:
-            audio_urls.append(clip.audio_url)
+    from collections import deque
+
+    audio_urls, clips_to_generate = _clips_needing_voices(script)
+    pending: deque[tuple[int, str, str]] = deque(clips_to_generate)
+
+    job_bucket = _job_bucket(job_delay)
+    in_flight: Dict[str, int] = {} # job token -> clip index
+    progress = tqdm(desc="Generating voices", total=len(pending))
+    while pending or in_flight:
+        # start as many jobs as the rate limit and the in-flight cap allow
+        next_job_wait = 0.0
+        while pending and len(in_flight) < max_jobs_in_flight:
+            next_job_wait = job_bucket.try_acquire() if job_bucket else 0
+            if next_job_wait > 0:
+                break
+            i, speaker, speech = pending.popleft()
+            if job_bucket:
+                # short next to the poll delay, so the outstanding jobs are barely polled later
+                time.sleep(_job_jitter())
+            logging.debug(f'Starting voice job {i} ({speaker}: {speech})')
+            job_token = _submit_job(_voice_token(script, speaker), speech, cookie=cookie)
+            in_flight[job_token] = i
+
+        # wake up for the next poll, or sooner if another job may be started before then
+        rand_delay = _poll_delay(poll_delay)
+        if pending and len(in_flight) < max_jobs_in_flight:
+            rand_delay = min(rand_delay, next_job_wait)
+        time.sleep(rand_delay)
+        if not in_flight:
             continue
-        logging.debug(f'Starting voice job {i} ({clip.speaker}: {clip.speaker})')
-        try:
-            character = next((character for character in script.characters if character.name == clip.speaker))
-        except: # probably because character not in characters list
-            character = random.choice(BACKUP_NARRATORS)
-        entropy = str(uuid.uuid4())
-        voice_token = character.voice_token
-        headers = {
-            'Accept': 'application/json',
-            'Content-Type': 'application/json',
-        }
-        if cookie:
-            headers['cookie'] = f"session={cookie}"
-            headers["credentials"] = "include"
-
-        payload = {
-            "uuid_idempotency_token": entropy,
-            "tts_model_token": voice_token,
-            "inference_text": clip.speech,
-        }
-        response = requests.post('https://api.fakeyou.com/tts/inference', headers=headers, json=payload)
-        try:
-            json = response.json()
-        except:
-            print(response.text)
-            raise Exception("Failed to parse JSON from FakeYou API: " + response.text + " " + str(payload))
-        success = json['success']
-        if not success:
-            raise Exception("Some sort of FakeYou API error occured", json)
-            break
-        job_token = json['inference_job_token']
-        rand_job_delay = random.randrange(job_delay-JOB_RANDOMNESS, job_delay+JOB_RANDOMNESS)
-    
-        # poll the job until complete
-        logging.debug(f'Polling voice job {i}')
-        polling_start_time = time.time()
-        total_poll_time = 0.0
-        completed = False
-        headers={
-            'Accept': 'application/json'
-        }
-        while not completed:
-            rand_delay = random.randrange(poll_delay-POLL_RANDOMNESS, poll_delay+POLL_RANDOMNESS)
-            time.sleep(rand_delay)
-            response = requests.get(f'https://api.fakeyou.com/tts/job/{job_token}', headers=headers)
-            json = response.json()
+
+        logging.debug(f'Polling voice jobs {sorted(in_flight.values())}')
+        for job_token, i in list(in_flight.items()):
+            json = _poll_job(job_token)
             if(not json["success"]):
                 print("Some sort of polling error occurred", json)
-                break
+                del in_flight[job_token]
+                progress.update()
+                continue
             status = json["state"]["status"]
             if(status == "pending" or status == "started"):
                 continue
             elif(status == "complete_success"):
-                completed = True
-                total_poll_time = time.time() - polling_start_time
-                audio_path = json["state"]["maybe_public_bucket_wav_audio_path"]
-                audio_url = f'https://cdn-2.fakeyou.com{audio_path}'
-                audio_urls.append(audio_url)
+                del in_flight[job_token]
+                progress.update()
+                audio_url = _audio_url(json)
+                audio_urls[i] = audio_url
                 if(on_voice_url_generated):
                     on_voice_url_generated(i, audio_url)
             else:
                 raise Exception("job failed, aborting", json)
-                break
+    progress.close()
+    return audio_urls
+
 
-        # sleep the remaining time before next job
-        remaining_delay = max(0, rand_job_delay - total_poll_time)
-        time.sleep(remaining_delay)
+async def agenerate_voices(
+        script: Script,
+        on_voice_url_generated: Optional[Callable[[int, str], None]] = None,
+        job_delay:float=30,
+        poll_delay:float=10,
+        cookie:str|None=None,
+        max_jobs_in_flight:int=3,
+    ) -> List[str | None]:
+    """
+    The async version of generate_voices. Each job is a task that waits on FakeYou with asyncio.sleep,
+    so many scripts can generate voices on one event loop without tying up a thread per script.
+    Jobs share the same process-wide rate limit as generate_voices. See generate_voices for the parameters.
+    """
+    import asyncio
+    from ...aio import gather
+
+    audio_urls, pending = _clips_needing_voices(script)
+    job_bucket = _job_bucket(job_delay)
+    job_slots = asyncio.Semaphore(max(1, max_jobs_in_flight))
+    progress = tqdm(desc="Generating voices", total=len(pending))
+
+    async def generate(i: int, speaker: str, speech: str):
+        async with job_slots:
+            if job_bucket:
+                await job_bucket.aacquire()
+                await asyncio.sleep(_job_jitter())
+            logging.debug(f'Starting voice job {i} ({speaker}: {speech})')
+            job_token = await _asubmit_job(_voice_token(script, speaker), speech, cookie=cookie)
+            while True:
+                await asyncio.sleep(_poll_delay(poll_delay))
+                json = await _apoll_job(job_token)
+                if(not json["success"]):
+                    print("Some sort of polling error occurred", json)
+                    progress.update()
+                    return
+                status = json["state"]["status"]
+                if(status == "pending" or status == "started"):
+                    continue
+                elif(status == "complete_success"):
+                    progress.update()
+                    audio_url = _audio_url(json)
+                    audio_urls[i] = audio_url
+                    if(on_voice_url_generated):
+                        on_voice_url_generated(i, audio_url)
+                    return
+                else:
+                    raise Exception("job failed, aborting", json)
+
+    try:
+        await gather(*(generate(i, speaker, speech) for i, speaker, speech in pending))
+    finally:
+        progress.close()
     return audio_urls
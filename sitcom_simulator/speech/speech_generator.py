@@ -1,10 +1,79 @@
 from typing import List, Literal
-from sitcom_simulator.models import Script
+from sitcom_simulator.models import Script, Character
+from ..cache import DiskCache, get_cache, hash_key
+from ..artifacts import Lease, adopt, hand_over
 from typing import Optional, Callable
 import os
+import threading
+import time
 
 Engine = Literal["fakeyou", "gtts"]
 
+FAKEYOU_SESSION_TTL = 60 * 60 # seconds a FakeYou session cookie is reused before signing in again, so a long-running process never keeps an expired one
+
+_fakeyou_sessions: dict[tuple[str, str], tuple[str, float]] = {} # credentials -> session cookie, time.monotonic() of the sign in
+_fakeyou_sessions_lock = threading.Lock()
+
+def _fakeyou_credentials() -> tuple[str, str] | None:
+    """
+    Returns the FAKEYOU_USERNAME and FAKEYOU_PASSWORD environment variables, or None if they aren't set.
+    """
+    username_or_email = os.environ.get('FAKEYOU_USERNAME')
+    password = os.environ.get('FAKEYOU_PASSWORD')
+    if not (username_or_email and password):
+        return None
+    return username_or_email, password
+
+def _fresh_fakeyou_session(credentials: tuple[str, str]) -> str | None:
+    """
+    Returns the session cookie of the given credentials if they signed in less than FAKEYOU_SESSION_TTL seconds ago.
+    """
+    if credentials in _fakeyou_sessions:
+        cookie, signed_in_at = _fakeyou_sessions[credentials]
+        if time.monotonic() - signed_in_at < FAKEYOU_SESSION_TTL:
+            return cookie
+    return None
+
+def _fakeyou_cookie() -> str | None:
+    """
+    Returns a FakeYou session cookie for the FAKEYOU_USERNAME and FAKEYOU_PASSWORD environment variables, or None if they aren't set.
+    Signs in again only once the session is FAKEYOU_SESSION_TTL seconds old, so generating voices for many scripts reuses the same session.
+    """
+    from .integrations import fakeyou
+    credentials = _fakeyou_credentials()
+    if credentials is None:
+        return None
+    with _fakeyou_sessions_lock: # so threads that need a session at the same time sign in once
+        cookie = _fresh_fakeyou_session(credentials)
+        if cookie is None:
+            cookie = fakeyou.sign_in(*credentials)
+            _fakeyou_sessions[credentials] = (cookie, time.monotonic())
+    return cookie
+
+async def _afakeyou_cookie() -> str | None:
+    """
+    The async version of _fakeyou_cookie.
+    """
+    from .integrations import fakeyou
+    credentials = _fakeyou_credentials()
+    if credentials is None:
+        return None
+    cookie = _fresh_fakeyou_session(credentials)
+    if cookie is None:
+        cookie = await fakeyou.asign_in(*credentials)
+        _fakeyou_sessions[credentials] = (cookie, time.monotonic())
+    return cookie
+
+def voice_cache_key(engine: Engine, voice: str, text: str) -> str:
+    """
+    Returns the cache key for a line of speech, which is the same for lines that only differ in whitespace.
+
+    :param engine: The engine that generates the audio
+    :param voice: The voice that speaks the line, e.g. a FakeYou voice token
+    :param text: The text of the line
+    """
+    return hash_key("voice", engine, voice, " ".join(text.split()))
+
 def generate_voices(
         script: Script,
         engine:Engine="fakeyou",
@@ -12,9 +81,17 @@ def generate_voices(
         fakeyou_on_voice_url_generated: Optional[Callable[[int, str], None]] = None,
         fakeyou_job_delay:int=30,
         fakeyou_poll_delay:int=10,
+        fakeyou_max_jobs:int=3,
+        voice_cache: DiskCache | None = None,
+        lease: Lease | None = None,
         ):
     """
     Generates and returns a list of voice clip paths for the given script using the given engine.
+    The list is in clip order, with None for clips that have no voice.
+
+    Lines spoken by the same voice with the same text (e.g. catchphrases) are only generated once per script.
+    If a voice cache is given, each line is looked up by engine, voice and text before any job is started,
+    so re-rendering a script (or another script that shares lines with it) skips FakeYou's queue entirely.
     
     More procedural in nature than add_voices.
     This function is typically not used directly, since add_voices is more pleasant to work with.
@@ -25,31 +102,184 @@ def generate_voices(
     :param fakeyou_on_voice_url_generated: A callback to call after each FakeYou voice clip is generated which takes the clip index and url of the generated audio
     :param fakeyou_job_delay: The number of seconds to wait between starting audio generation jobs. Lower values render faster but are more likely to get rate limited
     :param fakeyou_poll_delay: The number of seconds to wait between polling for audio generation job completion
+    :param fakeyou_max_jobs: The maximum number of FakeYou jobs to have in flight at once. Each voice is downloaded as soon as its job completes
+    :param voice_cache: The cache to read generated voices from and store them in. Cached voices are held by the lease, so they can't be evicted mid-render
+    :param lease: The lease that holds the voices, in the cache or the artifact store. Without one, they are not held, and may be deleted once the cache or store needs the space
+    """
+    plan = _VoicePlan(
+        script,
+        engine=engine,
+        on_voice_downloaded=on_voice_downloaded,
+        fakeyou_on_voice_url_generated=fakeyou_on_voice_url_generated,
+        voice_cache=voice_cache,
+        lease=lease,
+    )
+    generated_paths = _generate_voices(
+        plan.script,
+        engine=engine,
+        on_voice_downloaded=plan.on_generated_voice_downloaded,
+        fakeyou_on_voice_url_generated=plan.on_voice_url_generated,
+        fakeyou_job_delay=fakeyou_job_delay,
+        fakeyou_poll_delay=fakeyou_poll_delay,
+        fakeyou_max_jobs=fakeyou_max_jobs,
+    )
+    return plan.finish(generated_paths)
+
+class _VoicePlan:
+    """
+    The bookkeeping shared by generate_voices and agenerate_voices:
+    which lines are already cached, which still have to be generated, and which clips share each line.
+
+    The engine is only given script, in which the first clip of each line that still has to be generated is kept and the others are blanked out.
+    Pass on_generated_voice_downloaded and on_voice_url_generated to the engine as its callbacks, then pass its result to finish.
+    """
+    def __init__(
+            self,
+            script: Script,
+            engine: Engine,
+            on_voice_downloaded: Optional[Callable[[int, str], None]],
+            fakeyou_on_voice_url_generated: Optional[Callable[[int, str], None]],
+            voice_cache: DiskCache | None,
+            lease: Lease | None,
+            ):
+        from .integrations import fakeyou
+
+        self.on_voice_downloaded = on_voice_downloaded
+        self.fakeyou_on_voice_url_generated = fakeyou_on_voice_url_generated
+        self.voice_cache = voice_cache
+        self.lease = lease
+
+        characters = list(script.characters)
+        voices = {character.name: character.voice_token for character in characters}
+        self.clips_by_key: dict[str, List[int]] = {}
+        for i, clip in enumerate(script.clips):
+            if not clip.speech or clip.audio_url:
+                continue
+            if engine == "fakeyou":
+                if not clip.speaker:
+                    continue # FakeYou only voices lines with a speaker, see fakeyou.generate_voices
+                if clip.speaker not in voices:
+                    # pin the backup narrator, so the key matches the voice that is actually generated
+                    voices[clip.speaker] = fakeyou._voice_token(script, clip.speaker)
+                    characters.append(Character(name=clip.speaker, voice_token=voices[clip.speaker]))
+                voice = voices[clip.speaker]
+            else:
+                voice = "en"
+            self.clips_by_key.setdefault(voice_cache_key(engine, voice, clip.speech), []).append(i)
+
+        self.suffix = '.wav' if engine == "fakeyou" else '.mp3'
+        self.audio_paths: List[str | None] = [None] * len(script.clips)
+
+        self.keys_to_generate: dict[int, str] = {} # the first clip of each line that isn't cached -> its key
+        for key, indices in self.clips_by_key.items():
+            cached_audio = voice_cache.get(key, suffix=self.suffix, hold=True) if voice_cache else None
+            if cached_audio:
+                self._deliver(key, self._leased(cached_audio))
+            else:
+                self.keys_to_generate[indices[0]] = key
+
+        # the engine only sees the first clip of each line that still has to be generated. The others are blanked out,
+        # which keeps the clip indices the same as the full script's
+        skipped = {i for indices in self.clips_by_key.values() for i in indices} - self.keys_to_generate.keys()
+        self.script = script.replace(
+            characters=characters,
+            clips=[clip.replace(speaker=None, speech=None) if i in skipped else clip for i, clip in enumerate(script.clips)],
+        )
+
+    def _leased(self, audio_path: str) -> str:
+        """
+        Hands the voice cache's hold on a voice to the lease, or releases it if there is no lease, and returns the path.
+        """
+        return hand_over(self.voice_cache, audio_path, self.lease) if self.voice_cache else audio_path
+
+    def _deliver(self, key: str, audio_path: str):
+        for i in self.clips_by_key[key]:
+            self.audio_paths[i] = audio_path
+            if self.on_voice_downloaded:
+                self.on_voice_downloaded(i, audio_path)
+
+    def on_generated_voice_downloaded(self, i: int, audio_path: str):
+        key = self.keys_to_generate.get(i)
+        if self.voice_cache and key:
+            audio_path = self._leased(self.voice_cache.put(key, audio_path, suffix=self.suffix, move=True, hold=True))
+        else:
+            audio_path = adopt(audio_path, lease=self.lease)
+        if key is None: # e.g. a clip that already had an audio URL
+            self.audio_paths[i] = audio_path
+            if self.on_voice_downloaded:
+                self.on_voice_downloaded(i, audio_path)
+            return
+        self._deliver(key, audio_path)
+
+    def on_voice_url_generated(self, i: int, audio_url: str):
+        if self.fakeyou_on_voice_url_generated:
+            for j in self.clips_by_key[self.keys_to_generate[i]] if i in self.keys_to_generate else [i]:
+                self.fakeyou_on_voice_url_generated(j, audio_url)
+
+    def finish(self, generated_paths: List[str | None]) -> List[str | None]:
+        """
+        Returns the audio path of every clip, given the paths the engine returned.
+        """
+        for i, audio_path in enumerate(generated_paths):
+            if self.audio_paths[i] is None:
+                self.audio_paths[i] = audio_path
+
+        duplicates = sum(len(indices) - 1 for indices in self.clips_by_key.values())
+        if duplicates:
+            print(f"{duplicates} clips share a voice clip with an earlier clip that has the same line")
+        if self.voice_cache:
+            print(self.voice_cache.summary())
+        return self.audio_paths
+
+def _generate_voices(
+        script: Script,
+        engine:Engine="fakeyou",
+        on_voice_downloaded: Optional[Callable[[int, str], None]] = None,
+        fakeyou_on_voice_url_generated: Optional[Callable[[int, str], None]] = None,
+        fakeyou_job_delay:int=30,
+        fakeyou_poll_delay:int=10,
+        fakeyou_max_jobs:int=3,
+        ):
+    """
+    Generates voices for every clip of the script that needs one with the given engine, without consulting the cache.
+    See generate_voices for the parameters.
     """
     from .integrations import fakeyou as fakeyou
     from .integrations import gtts as gtts
     # generating voice clips can take a LONG time if args.high_quality_audio == True
     # because of long delays to avoid API timeouts on FakeYou.com
     if engine == "fakeyou":
-        username_or_email = os.environ.get('FAKEYOU_USERNAME')
-        password = os.environ.get('FAKEYOU_PASSWORD')
-        fakeyou_cookie = None
-        if username_or_email and password:
-            fakeyou_cookie = fakeyou.sign_in(username_or_email, password)
-        audio_urls = fakeyou.generate_voices(
-            script,
-            fakeyou_on_voice_url_generated,
-            fakeyou_job_delay,
-            fakeyou_poll_delay,
-            cookie=fakeyou_cookie,
-        )
-        audio_paths = []
-        for i, audio_url in enumerate(audio_urls):
-            if audio_url is None: continue
+        fakeyou_cookie = _fakeyou_cookie()
+
+        from concurrent.futures import ThreadPoolExecutor, Future
+        downloads: dict[int, Future] = {}
+
+        def download(i: int, audio_url: str):
             audio_path = fakeyou.download_voice(audio_url)
-            audio_paths.append(audio_path)
             if on_voice_downloaded:
                 on_voice_downloaded(i, audio_path)
+            return audio_path
+
+        # downloads overlap with the jobs that are still generating
+        with ThreadPoolExecutor(max_workers=4) as download_executor:
+            def on_voice_url_generated(i: int, audio_url: str):
+                downloads[i] = download_executor.submit(download, i, audio_url)
+                if fakeyou_on_voice_url_generated:
+                    fakeyou_on_voice_url_generated(i, audio_url)
+
+            audio_urls = fakeyou.generate_voices(
+                script,
+                on_voice_url_generated,
+                fakeyou_job_delay,
+                fakeyou_poll_delay,
+                cookie=fakeyou_cookie,
+                max_jobs_in_flight=fakeyou_max_jobs,
+            )
+            # urls that were already in the script never went through the callback
+            for i, audio_url in enumerate(audio_urls):
+                if audio_url is not None and i not in downloads:
+                    downloads[i] = download_executor.submit(download, i, audio_url)
+            audio_paths: List[str | None] = [downloads[i].result() if i in downloads else None for i in range(len(audio_urls))]
         return audio_paths
     else:
         audio_paths = gtts.generate_voices(script, on_voice_downloaded)
@@ -62,6 +292,11 @@ def add_voices(
         on_voice_generated: Optional[Callable[[int, str], None]] = None,
         fakeyou_job_delay:int=30,
         fakeyou_poll_delay:int=10,
+        fakeyou_max_jobs:int=3,
+        on_voice_downloaded: Optional[Callable[[int, str], None]] = None,
+        cache_voices:bool=False,
+        voice_cache:DiskCache | None = None,
+        lease:Lease | None = None,
         ):
     """
     Given a script, returns the same script but with the audio paths filled in.
@@ -73,12 +308,140 @@ def add_voices(
     :param on_voice_generated: A callback to call after each voice clip is generated which takes the clip index and path to the generated audio
     :param fakeyou_job_delay: The number of seconds to wait between starting audio generation jobs. Lower values render faster but are more likely to get rate limited. (FakeYou only)
     :param fakeyou_poll_delay: The number of seconds to wait between polling for audio generation job completion. (FakeYou only)
+    :param fakeyou_max_jobs: The maximum number of audio generation jobs to have in flight at once. (FakeYou only)
+    :param on_voice_downloaded: A callback to call as soon as each voice clip is available as a local file which takes the clip index and path to the audio
+    :param cache_voices: If True, generated voices are kept in a persistent on-disk cache and reused by later runs with the same voice and line
+    :param voice_cache: The cache to use instead of the persistent one, e.g. a RenderManifest. Takes precedence over cache_voices
+    :param lease: The lease that holds the voices, in the cache or the artifact store. Without one, they are not held, and may be deleted once the cache or store needs the space
     """
     audio_paths = generate_voices(
         script,
         engine=engine,
+        on_voice_downloaded=on_voice_downloaded,
+        fakeyou_on_voice_url_generated=on_voice_generated,
+        fakeyou_job_delay=fakeyou_job_delay,
+        fakeyou_poll_delay=fakeyou_poll_delay,
+        fakeyou_max_jobs=fakeyou_max_jobs,
+        voice_cache=voice_cache or (get_cache("voices") if cache_voices else None),
+        lease=lease,
+    )
+    return script.replace(clips=[clip.replace(audio_path=audio_path) for clip, audio_path in zip(script.clips, audio_paths)])
+
+async def agenerate_voices(
+        script: Script,
+        engine:Engine="fakeyou",
+        on_voice_downloaded: Optional[Callable[[int, str], None]] = None,
+        fakeyou_on_voice_url_generated: Optional[Callable[[int, str], None]] = None,
+        fakeyou_job_delay:int=30,
+        fakeyou_poll_delay:int=10,
+        fakeyou_max_jobs:int=3,
+        voice_cache: DiskCache | None = None,
+        lease: Lease | None = None,
+        ):
+    """
+    The async version of generate_voices, which waits on FakeYou without blocking the event loop.
+    See generate_voices for the parameters.
+    """
+    plan = _VoicePlan(
+        script,
+        engine=engine,
+        on_voice_downloaded=on_voice_downloaded,
+        fakeyou_on_voice_url_generated=fakeyou_on_voice_url_generated,
+        voice_cache=voice_cache,
+        lease=lease,
+    )
+    generated_paths = await _agenerate_voices(
+        plan.script,
+        engine=engine,
+        on_voice_downloaded=plan.on_generated_voice_downloaded,
+        fakeyou_on_voice_url_generated=plan.on_voice_url_generated,
+        fakeyou_job_delay=fakeyou_job_delay,
+        fakeyou_poll_delay=fakeyou_poll_delay,
+        fakeyou_max_jobs=fakeyou_max_jobs,
+    )
+    return plan.finish(generated_paths)
+
+async def _agenerate_voices(
+        script: Script,
+        engine:Engine="fakeyou",
+        on_voice_downloaded: Optional[Callable[[int, str], None]] = None,
+        fakeyou_on_voice_url_generated: Optional[Callable[[int, str], None]] = None,
+        fakeyou_job_delay:int=30,
+        fakeyou_poll_delay:int=10,
+        fakeyou_max_jobs:int=3,
+        ):
+    """
+    The async version of _generate_voices.
+    gTTS has no async client, so the gtts engine runs in a worker thread and calls on_voice_downloaded from it.
+    """
+    import asyncio
+    from ..aio import gather
+    from .integrations import fakeyou as fakeyou
+    from .integrations import gtts as gtts
+    if engine != "fakeyou":
+        return await asyncio.to_thread(gtts.generate_voices, script, on_voice_downloaded)
+
+    fakeyou_cookie = await _afakeyou_cookie()
+    download_slots = asyncio.Semaphore(4)
+    downloads: dict[int, asyncio.Future] = {}
+
+    async def download(i: int, audio_url: str):
+        async with download_slots:
+            audio_path = await fakeyou.adownload_voice(audio_url)
+        if on_voice_downloaded:
+            on_voice_downloaded(i, audio_path)
+        return audio_path
+
+    # downloads overlap with the jobs that are still generating
+    def on_voice_url_generated(i: int, audio_url: str):
+        downloads[i] = asyncio.ensure_future(download(i, audio_url))
+        if fakeyou_on_voice_url_generated:
+            fakeyou_on_voice_url_generated(i, audio_url)
+
+    try:
+        audio_urls = await fakeyou.agenerate_voices(
+            script,
+            on_voice_url_generated,
+            fakeyou_job_delay,
+            fakeyou_poll_delay,
+            cookie=fakeyou_cookie,
+            max_jobs_in_flight=fakeyou_max_jobs,
+        )
+        # urls that were already in the script never went through the callback
+        for i, audio_url in enumerate(audio_urls):
+            if audio_url is not None and i not in downloads:
+                downloads[i] = asyncio.ensure_future(download(i, audio_url))
+        downloaded = dict(zip(downloads.keys(), await gather(*downloads.values())))
+    except BaseException:
+        for task in downloads.values():
+            task.cancel()
+        raise
+    return [downloaded.get(i) for i in range(len(audio_urls))]
+
+async def aadd_voices(
+        script: Script,
+        engine:Engine="fakeyou",
+        on_voice_generated: Optional[Callable[[int, str], None]] = None,
+        fakeyou_job_delay:int=30,
+        fakeyou_poll_delay:int=10,
+        fakeyou_max_jobs:int=3,
+        on_voice_downloaded: Optional[Callable[[int, str], None]] = None,
+        cache_voices:bool=False,
+        voice_cache:DiskCache | None = None,
+        lease:Lease | None = None,
+        ):
+    """
+    The async version of add_voices. See add_voices for the parameters.
+    """
+    audio_paths = await agenerate_voices(
+        script,
+        engine=engine,
+        on_voice_downloaded=on_voice_downloaded,
         fakeyou_on_voice_url_generated=on_voice_generated,
         fakeyou_job_delay=fakeyou_job_delay,
         fakeyou_poll_delay=fakeyou_poll_delay,
+        fakeyou_max_jobs=fakeyou_max_jobs,
+        voice_cache=voice_cache or (get_cache("voices") if cache_voices else None),
+        lease=lease,
     )
     return script.replace(clips=[clip.replace(audio_path=audio_path) for clip, audio_path in zip(script.clips, audio_paths)])
\ No newline at end of file
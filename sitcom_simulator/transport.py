@@ -0,0 +1,265 @@
+from dataclasses import dataclass
+import asyncio
+import threading
+import logging
+import time
+import weakref
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+@dataclass
+class TransportSettings:
+    """
+    Settings for the shared HTTP session used by every integration.
+
+    :param retries: How many times a request is retried after a connection error or a retryable status code
+    :param backoff_factor: The base of the exponential backoff between retries, in seconds (0.5 waits 0.5s, 1s, 2s, ...). A Retry-After header takes precedence
+    :param retry_statuses: The status codes that are retried, e.g. rate limiting and transient server errors
+    :param connect_timeout: How many seconds to wait for a connection before giving up
+    :param read_timeout: How many seconds to wait for the server to send data before giving up
+    :param pool_maxsize: How many keep-alive connections to keep open per host
+    """
+    retries: int = 3
+    backoff_factor: float = 0.5
+    retry_statuses: tuple[int, ...] = RETRY_STATUSES
+    connect_timeout: float = 10
+    read_timeout: float = 60
+    pool_maxsize: int = 10
+
+_settings = TransportSettings()
+_session = None
+_async_clients: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary() # event loop -> httpx.AsyncClient
+_lock = threading.Lock()
+
+def _create_session(settings: TransportSettings):
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    class TimeoutSession(requests.Session):
+        """
+        A session that applies the default timeouts to requests that don't set their own.
+        """
+        def request(self, method, url, **kwargs):
+            kwargs.setdefault('timeout', (settings.connect_timeout, settings.read_timeout))
+            return super().request(method, url, **kwargs)
+
+    retry = Retry(
+        total=settings.retries,
+        backoff_factor=settings.backoff_factor,
+        status_forcelist=settings.retry_statuses,
+        allowed_methods=None, # FakeYou job submissions carry an idempotency token, so POSTs are safe to retry too
+        raise_on_status=False, # hand the last response back so callers can report the error as usual
+    )
+    adapter = HTTPAdapter(max_retries=retry, pool_connections=settings.pool_maxsize, pool_maxsize=settings.pool_maxsize)
+    session = TimeoutSession()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+def get_session():
+    """
+    Returns the process-wide requests session.
+
+    Reusing one session keeps connections alive between requests to the same host (FakeYou, FreePD, image and audio CDNs),
+    so most requests skip the TCP and TLS handshakes. Requests that fail with a connection error, 429 or 5xx are retried with exponential backoff,
+    and every request has a timeout. The session is safe to share between threads.
+    """
+    global _session
+    with _lock:
+        if _session is None:
+            _session = _create_session(_settings)
+        return _session
+
+def configure(settings: TransportSettings):
+    """
+    Replaces the transport settings. The shared session is rebuilt with the new settings on its next use.
+
+    :param settings: The new settings
+    """
+    global _settings, _session
+    with _lock:
+        _settings = settings
+        if _session is not None:
+            _session.close()
+        _session = None
+        _async_clients.clear()
+
+def get(url: str, **kwargs):
+    """
+    Sends a GET request with the shared session. Takes the same arguments as requests.get.
+    """
+    return get_session().get(url, **kwargs)
+
+def post(url: str, **kwargs):
+    """
+    Sends a POST request with the shared session. Takes the same arguments as requests.post.
+    """
+    return get_session().post(url, **kwargs)
+
+DOWNLOAD_CHUNK_SIZE = 256 * 1024 # bytes held in memory at a time while downloading
+
+def download(
+        url: str,
+        destination: str,
+        headers: dict | None = None,
+        chunk_size:int=DOWNLOAD_CHUNK_SIZE,
+        attempts:int=3,
+    ) -> str:
+    """
+    Downloads a file to the destination path in fixed-size chunks and returns the destination path.
+
+    Only one chunk is held in memory at a time, so memory use doesn't grow with the size of the file.
+    If the connection drops partway through, the download resumes where it left off with a Range request
+    (or starts over if the server doesn't support ranges). HTTP errors raise requests.HTTPError.
+
+    :param url: The URL of the file to download
+    :param destination: The path to write the file to
+    :param headers: Extra headers to send with the request
+    :param chunk_size: How many bytes to read and write at a time
+    :param attempts: How many times to try before giving up on a download that keeps getting interrupted
+    """
+    import requests
+
+    written = 0
+    for attempt in range(attempts):
+        request_headers = dict(headers or {})
+        if written:
+            request_headers['Range'] = f"bytes={written}-"
+        try:
+            with get_session().get(url, headers=request_headers, stream=True) as response:
+                response.raise_for_status()
+                if written and response.status_code != 206: # the server ignored the range, so start over
+                    written = 0
+                with open(destination, 'ab' if written else 'wb') as f:
+                    for chunk in response.iter_content(chunk_size=chunk_size):
+                        f.write(chunk)
+                        written += len(chunk)
+            return destination
+        except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+            if attempt == attempts - 1:
+                raise
+            logging.warning(f"Download of {url} interrupted after {written} bytes, resuming: {e}")
+            time.sleep(_settings.backoff_factor * 2**attempt)
+    return destination
+
+def _import_httpx():
+    try:
+        import httpx
+    except ImportError as e:
+        raise ImportError("The async API needs httpx. Install it with: pip install sitcom-simulator[async]") from e
+    return httpx
+
+def get_async_client():
+    """
+    Returns the httpx client shared by every coroutine on the running event loop, creating it on first use.
+
+    It is the async counterpart of get_session, with the same connection pooling and timeouts.
+    An httpx client can only be used on the event loop that created it, so each loop gets its own.
+    Requires httpx, which is an optional dependency (pip install sitcom-simulator[async]).
+    """
+    httpx = _import_httpx()
+    loop = asyncio.get_running_loop()
+    with _lock:
+        client = _async_clients.get(loop)
+        if client is None:
+            client = httpx.AsyncClient(
+                timeout=httpx.Timeout(_settings.read_timeout, connect=_settings.connect_timeout),
+                limits=httpx.Limits(max_keepalive_connections=_settings.pool_maxsize),
+                follow_redirects=True, # like requests
+            )
+            _async_clients[loop] = client
+        return client
+
+async def aclose():
+    """
+    Closes the httpx client of the running event loop, if it has one. Call it before the loop shuts down.
+    """
+    with _lock:
+        client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+def _retry_after(response) -> float | None:
+    try:
+        return float(response.headers['Retry-After'])
+    except (KeyError, ValueError):
+        return None
+
+async def _asend(method: str, url: str, stream:bool=False, **kwargs):
+    """
+    Sends a request with the shared async client, retrying connection errors and retryable status codes
+    with the same exponential backoff as the shared session. Like the session, the last response is returned even if its status is an error.
+    """
+    httpx = _import_httpx()
+    client = get_async_client()
+    for attempt in range(_settings.retries + 1):
+        last_attempt = attempt == _settings.retries
+        try:
+            response = await client.send(client.build_request(method, url, **kwargs), stream=stream)
+        except httpx.TransportError:
+            if last_attempt:
+                raise
+            await asyncio.sleep(_settings.backoff_factor * 2**attempt)
+            continue
+        if response.status_code not in _settings.retry_statuses or last_attempt:
+            return response
+        await response.aclose()
+        retry_after = _retry_after(response)
+        await asyncio.sleep(retry_after if retry_after is not None else _settings.backoff_factor * 2**attempt)
+
+async def aget(url: str, **kwargs):
+    """
+    Sends a GET request with the shared async client and returns the httpx response. Takes the same arguments as httpx.AsyncClient.get.
+    """
+    return await _asend('GET', url, **kwargs)
+
+async def apost(url: str, **kwargs):
+    """
+    Sends a POST request with the shared async client and returns the httpx response. Takes the same arguments as httpx.AsyncClient.post.
+    """
+    return await _asend('POST', url, **kwargs)
+
+async def adownload(
+        url: str,
+        destination: str,
+        headers: dict | None = None,
+        chunk_size:int=DOWNLOAD_CHUNK_SIZE,
+        attempts:int=3,
+    ) -> str:
+    """
+    Downloads a file to the destination path in fixed-size chunks and returns the destination path, without blocking the event loop while waiting on the network.
+    It resumes interrupted downloads like download. HTTP errors raise httpx.HTTPStatusError.
+
+    :param url: The URL of the file to download
+    :param destination: The path to write the file to
+    :param headers: Extra headers to send with the request
+    :param chunk_size: How many bytes to read and write at a time
+    :param attempts: How many times to try before giving up on a download that keeps getting interrupted
+    """
+    httpx = _import_httpx()
+
+    written = 0
+    for attempt in range(attempts):
+        request_headers = dict(headers or {})
+        if written:
+            request_headers['Range'] = f"bytes={written}-"
+        try:
+            response = await _asend('GET', url, stream=True, headers=request_headers)
+            try:
+                response.raise_for_status()
+                if written and response.status_code != 206: # the server ignored the range, so start over
+                    written = 0
+                with open(destination, 'ab' if written else 'wb') as f:
+                    async for chunk in response.aiter_bytes(chunk_size=chunk_size):
+                        f.write(chunk)
+                        written += len(chunk)
+            finally:
+                await response.aclose()
+            return destination
+        except httpx.TransportError as e:
+            if attempt == attempts - 1:
+                raise
+            logging.warning(f"Download of {url} interrupted after {written} bytes, resuming: {e}")
+            await asyncio.sleep(_settings.backoff_factor * 2**attempt)
+    return destination
@@ -1 +1 @@
-from .video_generator import render_video
\ No newline at end of file
+from .video_generator import render_video, create_renderer, arender_video, acreate_renderer
\ No newline at end of file
@@ -0,0 +1,144 @@
+from collections import Counter
+from dataclasses import asdict
+from functools import lru_cache
+import logging
+import math
+import threading
+from ...artifacts import Lease
+
+# rendered caption images by hash of everything that affects them -> (path, x, y)
+_rendered: dict[str, tuple[str, int, int]] = {}
+_users: Counter[str] = Counter() # how many renders are using each rendered caption
+_lock = threading.Lock()
+
+@lru_cache(maxsize=32)
+def _load_font(font: str, size: int):
+    from PIL import ImageFont
+    return ImageFont.truetype(font, size)
+
+def _rgba(color: str, alpha: float) -> tuple[int, int, int, int]:
+    from PIL import ImageColor
+    return (*ImageColor.getrgb(color)[:3], round(255 * alpha))
+
+def render_caption(
+        text: str,
+        font: str,
+        font_size: int,
+        width: int,
+        height: int,
+        y_ratio_from_bottom: float,
+        caption_bg_settings=None,
+        lease: Lease | None = None,
+    ) -> tuple[str, int, int] | None:
+    """
+    Rasterizes a caption once to a transparent PNG laid out like the drawtext filter would draw it,
+    and returns the path to the PNG and where to overlay it on the frame (x, y).
+    Returns None if Pillow can't load the font, in which case the caption should be drawn with drawtext instead.
+
+    Captions are remembered by their text, font, size and style, so a caption that appears in several clips
+    (or in renders running at the same time) is only rasterized once. The PNG is held in the artifact store until
+    every lease that used it has ended, and is then released and forgotten. Without a lease, it is not held, and may be deleted once the store needs the space.
+
+    :param text: The caption text, already wrapped into lines
+    :param font: The path or name of the font, as for CaptionSettings.font
+    :param font_size: The font size in pixels
+    :param width: The width of the video
+    :param height: The height of the video
+    :param y_ratio_from_bottom: Where the middle of the caption goes, as a fraction of the height from the bottom
+    :param caption_bg_settings: The BoxSettings or ShadowSettings of the caption background, if any
+    :param lease: The lease of the render that uses the caption
+    """
+    from PIL import Image, ImageDraw
+    from ...cache import hash_key
+    from ... import artifacts
+    from .ffmpeg import BoxSettings, ShadowSettings
+
+    key = hash_key(
+        text,
+        font,
+        font_size,
+        width,
+        height,
+        y_ratio_from_bottom,
+        [type(caption_bg_settings).__name__, asdict(caption_bg_settings) if caption_bg_settings else None],
+    )
+    with _lock:
+        if key in _rendered:
+            return _use(key, lease)
+
+    try:
+        pil_font = _load_font(font, font_size)
+    except OSError as e:
+        logging.warning(f"Pillow can't load the font {font}, falling back to drawtext for captions: {e}")
+        return None
+
+    # drawtext lays lines out one font height apart, each centered in the width of the longest line
+    lines = text.split('\n')
+    ascent, descent = pil_font.getmetrics()
+    line_height = ascent + descent
+    text_width = math.ceil(max(pil_font.getlength(line) for line in lines))
+    text_height = line_height * len(lines)
+
+    box = caption_bg_settings if isinstance(caption_bg_settings, BoxSettings) else None
+    shadow = caption_bg_settings if isinstance(caption_bg_settings, ShadowSettings) else None
+    margin = math.ceil(max(box.border_width if box else 0, abs(shadow.x) if shadow else 0, abs(shadow.y) if shadow else 0))
+    size = (text_width + 2 * margin, text_height + 2 * margin)
+
+    def draw_lines(offset_x: float, offset_y: float, fill) -> 'Image.Image':
+        layer = Image.new('RGBA', size, (0, 0, 0, 0))
+        draw = ImageDraw.Draw(layer)
+        for i, line in enumerate(lines):
+            draw.text((margin + text_width / 2 + offset_x, margin + i * line_height + offset_y), line, font=pil_font, fill=fill, anchor='ma')
+        return layer
+
+    image = Image.new('RGBA', size, (0, 0, 0, 0))
+    if box:
+        ImageDraw.Draw(image).rectangle(
+            (margin - box.border_width, margin - box.border_width, margin + text_width + box.border_width - 1, margin + text_height + box.border_width - 1),
+            fill=_rgba(box.color, box.alpha),
+        )
+    if shadow:
+        image = Image.alpha_composite(image, draw_lines(shadow.x, shadow.y, _rgba(shadow.color, shadow.alpha)))
+    image = Image.alpha_composite(image, draw_lines(0, 0, (255, 255, 255, 255)))
+
+    caption_path = artifacts.scratch_path(suffix='.png')
+    image.save(caption_path, format='PNG')
+    caption_path = artifacts.get_store().add(caption_path) # the one hold on the caption, until its last lease ends
+
+    # the same position as drawtext's x='(w - text_w) / 2' and y='(h - (text_h / 2)) - h*ratio'
+    x = round((width - text_width) / 2) - margin
+    y = round(height - text_height / 2 - height * y_ratio_from_bottom) - margin
+    with _lock:
+        if key in _rendered: # rendered by another thread in the meantime
+            artifacts.get_store().release(caption_path)
+        else:
+            _rendered[key] = (caption_path, x, y)
+        return _use(key, lease)
+
+def _use(key: str, lease: Lease | None) -> tuple[str, int, int]:
+    """
+    Counts one more user of a rendered caption, who is done when the lease ends. Must be called with the lock held.
+    A caption that no lease is using isn't held, so it is released and forgotten right away.
+    """
+    from ... import artifacts
+    caption = _rendered[key]
+    if lease:
+        _users[key] += 1
+        lease.on_release(lambda: _release(key))
+    elif not _users[key]:
+        del _rendered[key]
+        artifacts.get_store().release(caption[0])
+    return caption
+
+def _release(key: str):
+    """
+    Counts one user of a rendered caption as done. The last one releases the caption's PNG and forgets it.
+    """
+    from ... import artifacts
+    with _lock:
+        _users[key] -= 1
+        if _users[key] > 0:
+            return
+        del _users[key]
+        caption_path, _, _ = _rendered.pop(key)
+    artifacts.get_store().release(caption_path)
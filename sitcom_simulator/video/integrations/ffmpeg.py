@@ -1,19 +1,32 @@
 import random
 from ...models import Script, Clip
-from typing import List
+from typing import Any, Iterator, List, NoReturn
 import os
 import textwrap
 from tqdm import tqdm
 import tempfile
-import atexit
-from dataclasses import dataclass
+from dataclasses import dataclass, asdict
 import math
 from typing import Literal
+from concurrent.futures import ThreadPoolExecutor, Future
+import asyncio
+import threading
+from ...cache import DiskCache, hash_file, hash_key
+from ... import artifacts
+from ...artifacts import Lease
+from ..probe import media_duration, media_durations
 
 FRAME_RATE = 24
+# every clip gets the same audio layout so the clips can be joined without resampling
+AUDIO_SAMPLE_RATE = 44100
+AUDIO_CHANNELS = 2
 MAX_CLIP_SECONDS = 15
 FFMPEG_QUALITY:Literal["ultrafast", "superfast", "veryfast", "faster", "fast", "medium", "slow", "slower", "veryslow"] = "slow"
 
+RenderEngine = Literal["clips", "single_pass", "stream_copy"]
+EncoderProfileName = Literal["draft", "standard", "final"]
+PanAndZoomEngine = Literal["zoompan", "pillow"]
+
 @dataclass
 class ShadowSettings:
     """
@@ -62,6 +75,8 @@ class BoxSettings:
             "boxborderw": self.border_width
         }
 
+CaptionEngine = Literal['drawtext', 'pillow']
+
 @dataclass
 class CaptionSettings:
     """
@@ -70,10 +85,12 @@ class CaptionSettings:
     :param font: The path to the font file to use for the captions
     :param max_width: The maximum width of the captions, in characters
     :param y_ratio_from_bottom: The y ratio from the bottom of the screen to place the captions
+    :param engine: How captions are drawn. 'drawtext' draws them on every frame with ffmpeg, 'pillow' rasterizes each caption once and overlays the image
     """
     font: str = 'Arial'
     max_width: int = 30
     y_ratio_from_bottom: float = 6/24
+    engine: CaptionEngine = 'drawtext'
 
     def formatted_caption(self, text: str):
         """
@@ -96,6 +113,8 @@ class ClipSettings:
     :param max_zoom_factor: The maximum zoom factor for the pan and zoom effect
     :param min_zoom_factor: The minimum zoom factor for the pan and zoom effect. At least some zoom is necessary for panning.
     :param max_pan_speed: The maximum speed of the pan and zoom effect
+    :param pan_and_zoom_engine: How the pan and zoom effect is rendered. "zoompan" uses ffmpeg's zoompan filter on an image upscaled to twice the output size to hide its jitter. "pillow" warps the image with Pillow at the output size with subpixel precision and pipes the frames into ffmpeg, which is much faster. The single_pass render engine always uses zoompan
+    :param frame_rate: The frame rate of the video. Lower frame rates render faster, e.g. for drafts
     """
     clip_buffer_seconds:float=0.15
     min_clip_seconds:float=1.5
@@ -103,6 +122,217 @@ class ClipSettings:
     max_zoom_factor:float=1.3 # magic number that seems to work well
     min_zoom_factor:float=1.05 # magic number that seems to work well
     max_pan_speed:float=6 # magic number that seems to work well
+    pan_and_zoom_engine:PanAndZoomEngine="zoompan"
+    frame_rate:int=FRAME_RATE
+
+@dataclass
+class KenBurnsMotion:
+    """
+    The pan and zoom of one clip, so the zoompan and Pillow engines move the image the same way.
+
+    :param zoom_start: The zoom factor of the first frame
+    :param zoom_end: The zoom factor of the last frame
+    :param pan_x: The horizontal pan speed, in output pixels per unit of frame offset (see frame_offset)
+    :param pan_y: The vertical pan speed, in output pixels per unit of frame offset
+    :param total_frames: The number of frames the zoom is spread over
+    :param frame_rate: The frame rate the motion is rendered at
+    """
+    zoom_start: float
+    zoom_end: float
+    pan_x: float
+    pan_y: float
+    total_frames: int
+    frame_rate: int = FRAME_RATE
+
+    @staticmethod
+    def random(rng: random.Random, duration: float, width: int, height: int, clip_settings: ClipSettings) -> 'KenBurnsMotion':
+        """
+        Picks a random pan and zoom for a clip of the given duration and size.
+        """
+        zoom_start = clip_settings.min_zoom_factor  # Start with no zoom
+        zoom_end = rng.uniform(clip_settings.min_zoom_factor, clip_settings.max_zoom_factor)  # Target end zoom level, adjust as needed
+        zoom_out = rng.choice([True, False])  # Randomly zoom in or out
+        if zoom_out:
+            zoom_start, zoom_end = zoom_end, zoom_start  # Reverse the zoom levels for a zoom out effect
+        # Maximum pan speed (pixels per frame, scaled to 720p reference screen width)
+        max_pan = clip_settings.max_pan_speed * (min(width, height) / 720)
+        return KenBurnsMotion(
+            zoom_start=zoom_start,
+            zoom_end=zoom_end,
+            pan_x=rng.uniform(-max_pan, max_pan),
+            pan_y=rng.uniform(-max_pan, max_pan),
+            total_frames=max(1, int(duration * clip_settings.frame_rate)), # Total frames based on video duration and frame rate
+            frame_rate=clip_settings.frame_rate,
+        )
+
+    def zoom(self, frame: int) -> float:
+        """
+        Returns the zoom factor of the given frame. Zoom continues smoothly for the entire duration.
+        """
+        return self.zoom_start + (frame / self.total_frames) * (self.zoom_end - self.zoom_start)
+
+    def frame_offset(self, frame: int) -> float:
+        """
+        Returns how far the given frame is from the middle of the clip, in units that scale with the square root of the clip length,
+        so that shorter clips are punchier and longer clips are smoother.
+        """
+        return (frame - self.total_frames / 2) / math.sqrt(self.total_frames)
+
+    def zoompan_args(self, width: int, height: int, prezoom_scale_factor: float) -> dict:
+        """
+        Returns the arguments of ffmpeg's zoompan filter for an input upscaled by prezoom_scale_factor.
+        """
+        frame_offset = f"((on-{self.total_frames/2})/{math.sqrt(self.total_frames)})"
+        return dict(
+            z=f'{self.zoom_start}+(on/{self.total_frames})*{self.zoom_end-self.zoom_start}',
+            x=f'(iw/2.0-(iw/zoom/2.0))+{self.pan_x * prezoom_scale_factor}*{frame_offset}',
+            y=f'(ih/2.0-(ih/zoom/2.0))+{self.pan_y * prezoom_scale_factor}*{frame_offset}',
+            d=1,  # Apply the effect continuously across frames
+            s=f'{width}x{height}',
+            fps=self.frame_rate,
+        )
+
+    def window(self, frame: int, width: int, height: int) -> tuple[float, float, float]:
+        """
+        Returns the left and top of the visible part of the image and its zoom factor for the given frame,
+        with left and top as fractions of the image size (the image is already cropped to the output aspect ratio).
+        Like zoompan, the window is kept inside the image.
+        """
+        zoom = self.zoom(frame)
+        offset = self.frame_offset(frame)
+        left = 0.5 - 0.5 / zoom + self.pan_x / width * offset
+        top = 0.5 - 0.5 / zoom + self.pan_y / height * offset
+        max_start = 1 - 1 / zoom
+        return min(max(left, 0), max_start), min(max(top, 0), max_start), zoom
+
+def ken_burns_frame_size(image_path: str, motion: KenBurnsMotion, width: int, height: int) -> tuple[int, int]:
+    """
+    Returns the size ken_burns_frames renders its frames at: the output size, or smaller if the image has fewer pixels than that.
+    Small images are resampled at (about) their own resolution and left for ffmpeg to scale up,
+    which is much faster than magnifying them in Python and looks the same.
+
+    :param image_path: The path to the image
+    :param motion: The pan and zoom to apply
+    :param width: The width of the video
+    :param height: The height of the video
+    """
+    from PIL import Image
+    with Image.open(image_path) as image: # only reads the header
+        image_width, image_height = image.size
+    # the widest the visible window gets, in image pixels
+    window_width = min(image_width, image_height * width / height) / min(motion.zoom_start, motion.zoom_end)
+    scale = min(1, window_width / width)
+    return max(2, round(width * scale / 2) * 2), max(2, round(height * scale / 2) * 2)
+
+def ken_burns_frames(image_path: str, motion: KenBurnsMotion, width: int, height: int, frame_count: int, frame_size: tuple[int, int] | None = None, max_workers:int=2):
+    """
+    Yields the frames of the pan and zoom effect on the image as raw RGB24 bytes, for piping into ffmpeg.
+
+    Each frame is resampled straight from the original image with a fractional source window,
+    so the window moves by fractions of a pixel instead of jumping between whole pixels,
+    and no upscaled copy of the image is needed to hide the jitter.
+    Pillow releases the GIL while resampling, so a few frames are rendered ahead in parallel while ffmpeg encodes the previous ones.
+
+    :param image_path: The path to the image
+    :param motion: The pan and zoom to apply
+    :param width: The width of the video
+    :param height: The height of the video
+    :param frame_count: The number of frames to generate
+    :param frame_size: The size to render the frames at. Defaults to the video size (see ken_burns_frame_size)
+    :param max_workers: The number of frames to render at the same time
+    """
+    from PIL import Image
+    from collections import deque
+    image = Image.open(image_path).convert('RGB')
+    frame_size = frame_size or (width, height)
+
+    # the part of the image that covers the output aspect ratio, like scale with force_original_aspect_ratio=increase + crop
+    cover_scale = max(width / image.width, height / image.height)
+    crop_width, crop_height = width / cover_scale, height / cover_scale
+    crop_x, crop_y = (image.width - crop_width) / 2, (image.height - crop_height) / 2
+
+    def render_frame(frame: int) -> bytes:
+        left, top, zoom = motion.window(frame, width, height)
+        x = crop_x + left * crop_width
+        y = crop_y + top * crop_height
+        box = (x, y, x + crop_width / zoom, y + crop_height / zoom)
+        return image.resize(frame_size, Image.Resampling.BILINEAR, box=box).tobytes()
+
+    # a bounded window of frames in flight, so memory doesn't grow with the length of the clip
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending: deque[Future] = deque()
+        for frame in range(frame_count):
+            pending.append(executor.submit(render_frame, frame))
+            if len(pending) > max_workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+@dataclass
+class EncoderSettings:
+    """
+    Settings for the libx264 video encoder.
+
+    :param preset: The x264 preset. Slower presets compress better at the same quality
+    :param bitrate: The target video bitrate, e.g. '8000K'. None lets the encoder decide
+    :param pix_fmt: The output pixel format. None keeps the format of the filtered frames
+    :param crf: The constant rate factor, which targets a constant quality instead of a bitrate. Lower is better, 23 is x264's default. None uses x264's default
+    :param max_bitrate: The highest bitrate the encoder may use, e.g. '8000K', which caps the size of CRF encodes on detailed frames. None leaves the bitrate uncapped
+    """
+    preset: Literal["ultrafast", "superfast", "veryfast", "faster", "fast", "medium", "slow", "slower", "veryslow"] = FFMPEG_QUALITY
+    bitrate: str | None = '8000K'
+    pix_fmt: str | None = 'yuv420p' # necessary for compatibility
+    crf: int | None = None
+    max_bitrate: str | None = None
+
+    def to_dict(self):
+        """
+        Returns a dictionary representation of the encoder settings for use as FFmpeg output options.
+        """
+        options: dict[str, str] = {
+            "vcodec": "libx264",
+            "preset": self.preset,
+        }
+        if self.pix_fmt:
+            options["pix_fmt"] = self.pix_fmt
+        if self.bitrate:
+            options["b:v"] = self.bitrate
+        if self.crf is not None:
+            options["crf"] = str(self.crf)
+        if self.max_bitrate:
+            options["maxrate"] = self.max_bitrate
+            options["bufsize"] = self.max_bitrate # one second of video, so the cap holds over short stretches too
+        return options
+
+@dataclass
+class EncoderProfile:
+    """
+    The encoder settings of one quality tier.
+
+    :param intermediate: The encoder settings of intermediate clips, which are encoded again when they are concatenated
+    :param final: The encoder settings of the final video, and of clips that are stream-copied into it
+    """
+    intermediate: EncoderSettings
+    final: EncoderSettings
+
+INTERMEDIATE_ENCODER_SETTINGS = EncoderSettings(preset='superfast', bitrate=None, pix_fmt=None)
+FINAL_ENCODER_SETTINGS = EncoderSettings(preset=FFMPEG_QUALITY, bitrate=None, crf=20, max_bitrate='8000K')
+
+ENCODER_PROFILES: dict[EncoderProfileName, EncoderProfile] = {
+    # a quick preview to check timing, not quality
+    "draft": EncoderProfile(
+        intermediate=EncoderSettings(preset='ultrafast', bitrate=None, pix_fmt=None, crf=28),
+        final=EncoderSettings(preset='ultrafast', bitrate=None, crf=28),
+    ),
+    "standard": EncoderProfile(
+        intermediate=INTERMEDIATE_ENCODER_SETTINGS,
+        final=EncoderSettings(preset='medium', bitrate=None, crf=23, max_bitrate='8000K'),
+    ),
+    "final": EncoderProfile(
+        intermediate=INTERMEDIATE_ENCODER_SETTINGS,
+        final=FINAL_ENCODER_SETTINGS,
+    ),
+}
 
 failed_image_captions = [
     "This image has been seized by the FBI",
@@ -120,45 +350,22 @@ failed_image_captions = [
     "Image seized by the government",
 ]
 
-def render_clip(
+def clip_duration(
         clip: Clip,
-        width:int=720,
-        height:int=1280,
         speed:float=1.0,
-        pan_and_zoom:bool=True,
         clip_settings:ClipSettings=ClipSettings(),
-        caption_settings:CaptionSettings=CaptionSettings(),
-        caption_bg_settings:BoxSettings|ShadowSettings=BoxSettings(),
-        audio_codec:Literal['mp3', 'aac']='mp3',
-    ):
+    ) -> float:
     """
-    Renders a video clip from the given clip object and returns the path to the rendered video file.
+    Returns how long the given clip will last in the rendered video, in seconds.
 
-    :param clip: The clip to render
-    :param width: The width of the video
-    :param height: The height of the video
+    :param clip: The clip to measure
     :param speed: The speed of the final video. 1.0 is normal speed
-    :param pan_and_zoom: If True, the pan and zoom effect on images will be enabled
     :param clip_settings: The settings for rendering the video clip
-    :param caption_settings: The settings for the captions
-    :param caption_bg_settings: The settings for the caption background
-    :param audio_codec: The audio codec to use for the output video
     """
-    width = int(round(width))
-    height = int(round(height))
-
-    import ffmpeg
-    caption = clip.speech or clip.title
-    title_clip = not not clip.title
-    if caption:
-        caption = caption_settings.formatted_caption(caption)
-
-    scale_factor = min(width, height) / 720 # 720 is the reference screen width
-    
     if clip.audio_path:
         try:
             audio_path = clip.audio_path.replace('/', '\\') if os.name == 'nt' else clip.audio_path
-            audio_duration = float(ffmpeg.probe(audio_path)['streams'][0]['duration']) if clip.audio_path else 0
+            audio_duration = media_duration(audio_path)
         except Exception as e:
             print(f"Error probing audio duration: {e}.\nHave you put ffmpeg and ffprobe binaries into the root project directory?")
             print(clip.audio_path)
@@ -171,18 +378,59 @@ def render_clip(
     duration = min(duration, MAX_CLIP_SECONDS) # maximum duration for a clip (to prevent long AI audio glitches)
     duration = duration / speed
     if clip.duration and not clip.speaker: # 'not speaker' in case the llm forgets proper syntax
-        duration = clip.duration
-    
+        duration = float(clip.duration)
+    return duration
+
+def _clip_streams(
+        clip: Clip,
+        duration: float,
+        width:int,
+        height:int,
+        speed:float,
+        pan_and_zoom:bool,
+        clip_settings:ClipSettings,
+        caption_settings:CaptionSettings,
+        caption_bg_settings:BoxSettings|ShadowSettings|None,
+        video_source=None,
+        audio_source=None,
+        rng:random.Random|None=None,
+        prerendered_motion:bool=False,
+        lease:Lease|None=None,
+    ):
+    """
+    Builds the ffmpeg video and audio streams for a single clip without running them.
+
+    Shared by render_clip, which encodes the streams to their own file,
+    and render_video_single_pass, which wires every clip into one graph.
+    video_source and audio_source override the endlessly looping image (or blank frame)
+    and the voice (or silence) inputs that would otherwise be created for the clip.
+    rng drives the random pan and zoom, so a seeded generator makes the output reproducible.
+    If prerendered_motion is True, video_source already has the pan and zoom at the output size (see ken_burns_frames).
+    lease holds the caption image drawn by the pillow caption engine until the clip is no longer needed.
+    """
+    import ffmpeg
+    rng = rng or random.Random()
+    caption = clip.speech or clip.title
+    title_clip = not not clip.title
+    if caption:
+        caption = caption_settings.formatted_caption(caption)
+
+    scale_factor = min(width, height) / 720 # 720 is the reference screen width
+
     no_image = clip.image_path is None
     seized_image = clip.image_path is None and not title_clip
 
-    if no_image or seized_image:
-        video_input = ffmpeg.input(f'color=c=black:s={width}x{height}:d=5', f='lavfi')
+    if video_source is not None:
+        video_input = video_source
+    elif no_image or seized_image:
+        video_input = ffmpeg.input(f'color=c=black:s={width}x{height}:r={clip_settings.frame_rate}:d={duration}', f='lavfi')
     else:
-        video_input = ffmpeg.input(clip.image_path, loop=1, framerate=FRAME_RATE)
+        video_input = ffmpeg.input(clip.image_path, loop=1, framerate=clip_settings.frame_rate)
+
+    if not (no_image or seized_image or prerendered_motion):
         # the zoom effect is jittery for some strange reason
         # but if we upscale the image first, the jitter is less noticeable
-        # at the cost of slower rendering
+        # at the cost of slower rendering (see the pillow pan and zoom engine)
         prezoom_scale_factor = 2 if pan_and_zoom else 1
         prezoom_scale_width = int(width * prezoom_scale_factor)
         prezoom_scale_height = int(height * prezoom_scale_factor)
@@ -192,79 +440,411 @@ def render_clip(
             .filter('crop', prezoom_scale_width, prezoom_scale_height)
         )
         if pan_and_zoom:
-            zoom_start = clip_settings.min_zoom_factor  # Start with no zoom
-            zoom_end = random.uniform(clip_settings.min_zoom_factor, clip_settings.max_zoom_factor)  # Target end zoom level, adjust as needed
-            zoom_out = random.choice([True, False])  # Randomly zoom in or out
-            if zoom_out:
-                zoom_start, zoom_end = zoom_end, zoom_start  # Reverse the zoom levels for a zoom out effect
-            total_frames = int(duration * FRAME_RATE)  # Total frames based on video duration and frame rate
-
-            # Ensure zoom continues smoothly for the entire duration
-            zoom_expr = f'{zoom_start}+(on/{total_frames})*{zoom_end-zoom_start}'
-
-            # Randomly pan the image 
-            max_pan = clip_settings.max_pan_speed * (min(width, height) / 720) * prezoom_scale_factor  # Maximum pan speed (pixels per frame, scaled to 720p reference screen width
-            # the sqrt(total_frames) is to make the pan speed scale with the duration of the clip
-            # so that shorter clips are punchier and longer clips are smoother
-            frame_offset = f"((on-{total_frames/2})/{math.sqrt(total_frames)})"
-            x_expr = f'(iw/2.0-(iw/zoom/2.0))+{random.uniform(-max_pan, max_pan)}*{frame_offset}'
-            y_expr = f'(ih/2.0-(ih/zoom/2.0))+{random.uniform(-max_pan, max_pan)}*{frame_offset}'
-
-            video_input = video_input.zoompan(
-                z=zoom_expr, 
-                x=x_expr, 
-                y=y_expr, 
-                d=1,  # Apply the effect continuously across frames
-                s=f'{width}x{height}', 
-                fps=FRAME_RATE,
-                )
+            motion = KenBurnsMotion.random(rng, duration, width, height, clip_settings)
+            video_input = video_input.zoompan(**motion.zoompan_args(width, height, prezoom_scale_factor))
 
     speaking_delay_ms = clip_settings.speaking_delay_seconds * 1000
 
     # make sure every clip has an audio track, even if it's silent
     if clip.audio_path is None:
-        audio_input = ffmpeg.input('anullsrc', format='lavfi', t=duration).audio
+        audio_input = audio_source if audio_source is not None else ffmpeg.input('anullsrc', format='lavfi', t=duration).audio
     else:
         audio_input = (
-            ffmpeg
-            .input(clip.audio_path)
+            (audio_source if audio_source is not None else ffmpeg.input(clip.audio_path).audio)
             .filter('adelay', f'{speaking_delay_ms}|{speaking_delay_ms}')
             .filter('apad', pad_dur=duration)
             .filter('atempo', speed)
             .filter('speechnorm')
         )
 
-    caption_bg_dict = caption_bg_settings.to_dict() if isinstance(caption_bg_settings, BoxSettings) else caption_bg_settings.to_dict()
+    caption_bg_dict = caption_bg_settings.to_dict() if caption_bg_settings else {}
     
     if caption or seized_image:
-        video_input = video_input.filter(
-            'drawtext',
-            text=caption if caption else random.choice(failed_image_captions),
-            fontfile=caption_settings.font,
-            fontsize=48 * scale_factor, # scales the font size with 720px as the reference screen width
-            fontcolor='white',
-            text_align="M+C", # had to dig deep into FFmpeg source code to learn that you combine flags with a plus sign
-            x='(w - text_w) / 2',
-            y=f'(h - (text_h / 2)) - h*{caption_settings.y_ratio_from_bottom if not title_clip else 0.5}',
-            **caption_bg_dict,
-        )
+        caption_text = caption if caption else rng.choice(failed_image_captions)
+        font_size = 48 * scale_factor # scales the font size with 720px as the reference screen width
+        y_ratio_from_bottom = caption_settings.y_ratio_from_bottom if not title_clip else 0.5
+        caption_image = None
+        if caption_settings.engine == 'pillow':
+            from .captions import render_caption
+            caption_image = render_caption(caption_text, caption_settings.font, round(font_size), width, height, y_ratio_from_bottom, caption_bg_settings, lease=lease)
+        if caption_image:
+            # the caption is the same on every frame, so it is drawn once and composited, instead of laid out again for each frame
+            caption_path, x, y = caption_image
+            video_input = video_input.overlay(ffmpeg.input(caption_path), x=x, y=y, format='yuv444')
+        else:
+            video_input = video_input.filter(
+                'drawtext',
+                text=caption_text,
+                fontfile=caption_settings.font,
+                fontsize=font_size,
+                fontcolor='white',
+                text_align="M+C", # had to dig deep into FFmpeg source code to learn that you combine flags with a plus sign
+                x='(w - text_w) / 2',
+                y=f'(h - (text_h / 2)) - h*{y_ratio_from_bottom}',
+                **caption_bg_dict,
+            )
 
     video_input = video_input.filter('setpts', f'PTS/{speed}')
 
+    return video_input, audio_input
+
+def clip_cache_key(
+        clip: Clip,
+        width:int,
+        height:int,
+        speed:float,
+        pan_and_zoom:bool,
+        clip_settings:ClipSettings,
+        caption_settings:CaptionSettings,
+        caption_bg_settings:BoxSettings|ShadowSettings|None,
+        audio_codec:str,
+        encoder_settings:EncoderSettings,
+    ) -> str:
+    """
+    Returns a content hash of everything that affects how the given clip renders.
+    Two clips with the same key produce identical intermediate files.
+    """
+    return hash_key(
+        hash_file(clip.image_path) if clip.image_path else None,
+        hash_file(clip.audio_path) if clip.audio_path else None,
+        clip.speech,
+        clip.title,
+        clip.duration,
+        bool(clip.speaker), # a clip's fixed duration is ignored when it has a speaker
+        asdict(clip_settings),
+        asdict(caption_settings),
+        [type(caption_bg_settings).__name__, asdict(caption_bg_settings) if caption_bg_settings else None],
+        width,
+        height,
+        speed,
+        pan_and_zoom,
+        audio_codec,
+        asdict(encoder_settings),
+        AUDIO_SAMPLE_RATE,
+        AUDIO_CHANNELS,
+    )
+
+def render_clip(
+        clip: Clip,
+        width:int=720,
+        height:int=1280,
+        speed:float=1.0,
+        pan_and_zoom:bool=True,
+        clip_settings:ClipSettings=ClipSettings(),
+        caption_settings:CaptionSettings=CaptionSettings(),
+        caption_bg_settings:BoxSettings|ShadowSettings=BoxSettings(),
+        audio_codec:Literal['mp3', 'aac']='mp3',
+        encoder_settings:EncoderSettings=INTERMEDIATE_ENCODER_SETTINGS,
+        cache:DiskCache|None=None,
+        lease:Lease|None=None,
+    ):
+    """
+    Renders a video clip from the given clip object and returns the path to the rendered video file.
+
+    If a cache is given, the clip is looked up by a hash of its inputs and ffmpeg is skipped entirely on a hit.
+    The pan and zoom randomness is seeded from that hash so a cached clip always matches a fresh render.
+
+    :param clip: The clip to render
+    :param width: The width of the video
+    :param height: The height of the video
+    :param speed: The speed of the final video. 1.0 is normal speed
+    :param pan_and_zoom: If True, the pan and zoom effect on images will be enabled
+    :param clip_settings: The settings for rendering the video clip
+    :param caption_settings: The settings for the captions
+    :param caption_bg_settings: The settings for the caption background
+    :param audio_codec: The audio codec to use for the output video
+    :param encoder_settings: The video encoder settings. Clips that will be stream-copied into the final video must use the final encoder settings
+    :param cache: The cache to read rendered clips from and store them in. The returned path belongs to the cache and is held until it is released with cache.release. Without a cache, the clip is added to the artifact store and held until it is released with artifacts.get_store().release
+    :param lease: The lease that holds the clip's caption image from the pillow caption engine. Without one, the image is not held, and may be deleted once the store needs the space
+    """
+    import ffmpeg
+    job = _prepare_clip(
+        clip,
+        width=width,
+        height=height,
+        speed=speed,
+        pan_and_zoom=pan_and_zoom,
+        clip_settings=clip_settings,
+        caption_settings=caption_settings,
+        caption_bg_settings=caption_bg_settings,
+        audio_codec=audio_codec,
+        encoder_settings=encoder_settings,
+        cache=cache,
+        lease=lease,
+    )
+    if isinstance(job, str): # cached
+        return job
     try:
-        input_streams = [video_input] if audio_input is None else [video_input, audio_input]
-        with tempfile.NamedTemporaryFile(suffix='.mp4', delete=False) as temp_file:
-            intermediate_clip = (
-                ffmpeg.output(*input_streams, temp_file.name, vcodec='libx264', preset='superfast', acodec=audio_codec, t=duration)
-                .overwrite_output()
-                .run(capture_stderr=True, overwrite_output=True)
-            )
-            atexit.register(os.remove, temp_file.name)
-            return temp_file.name
+        if job.frames is None:
+            job.output.run(capture_stderr=True, overwrite_output=True)
+        else:
+            _run_with_frames(job.output, job.frames)
     except ffmpeg.Error as e:
+        job.fail(e)
+    return job.store()
+
+async def arender_clip(
+        clip: Clip,
+        width:int=720,
+        height:int=1280,
+        speed:float=1.0,
+        pan_and_zoom:bool=True,
+        clip_settings:ClipSettings=ClipSettings(),
+        caption_settings:CaptionSettings=CaptionSettings(),
+        caption_bg_settings:BoxSettings|ShadowSettings=BoxSettings(),
+        audio_codec:Literal['mp3', 'aac']='mp3',
+        encoder_settings:EncoderSettings=INTERMEDIATE_ENCODER_SETTINGS,
+        cache:DiskCache|None=None,
+        lease:Lease|None=None,
+    ):
+    """
+    The async version of render_clip, which waits on ffmpeg without blocking the event loop. See render_clip for the parameters.
+    """
+    import ffmpeg
+    job = _prepare_clip(
+        clip,
+        width=width,
+        height=height,
+        speed=speed,
+        pan_and_zoom=pan_and_zoom,
+        clip_settings=clip_settings,
+        caption_settings=caption_settings,
+        caption_bg_settings=caption_bg_settings,
+        audio_codec=audio_codec,
+        encoder_settings=encoder_settings,
+        cache=cache,
+        lease=lease,
+    )
+    if isinstance(job, str): # cached
+        return job
+    try:
+        await _arun(job.output, job.frames)
+    except ffmpeg.Error as e:
+        job.fail(e)
+    return job.store()
+
+@dataclass
+class _ClipJob:
+    """
+    The ffmpeg run that renders one clip, prepared by _prepare_clip, so render_clip and arender_clip only differ in how they run ffmpeg.
+    """
+    output: Any # the ffmpeg-python output
+    output_path: str
+    frames: Iterator[bytes] | None # raw frames for ffmpeg's stdin, when the pillow engine renders the pan and zoom
+    cache: DiskCache | None
+    cache_key: str | None
+
+    def store(self) -> str:
+        """
+        Moves the rendered clip into the cache, or the artifact store if there is no cache, and returns its path there.
+        """
+        if self.cache:
+            assert self.cache_key is not None # _prepare_clip always computes the key when there is a cache
+            return self.cache.put(self.cache_key, self.output_path, suffix='.mp4', move=True, hold=True)
+        return artifacts.get_store().add(self.output_path, suffix='.mp4')
+
+    def fail(self, e) -> NoReturn:
+        """
+        Removes the partial output and raises the ffmpeg error.
+        """
+        if os.path.exists(self.output_path):
+            os.remove(self.output_path)
         print('FFmpeg Error:', e.stderr.decode() if e.stderr else str(e))  # Decoding the stderr for better readability
         raise Exception(f"ffmpeg error: {e.stderr.decode() if e.stderr else str(e)}")
 
+def _prepare_clip(
+        clip: Clip,
+        width:int,
+        height:int,
+        speed:float,
+        pan_and_zoom:bool,
+        clip_settings:ClipSettings,
+        caption_settings:CaptionSettings,
+        caption_bg_settings:BoxSettings|ShadowSettings,
+        audio_codec:Literal['mp3', 'aac'],
+        encoder_settings:EncoderSettings,
+        cache:DiskCache|None,
+        lease:Lease|None,
+    ) -> str | _ClipJob:
+    """
+    Returns the path of the clip if it's cached, or the ffmpeg run that renders it. See render_clip for the parameters.
+    """
+    width = int(round(width))
+    height = int(round(height))
+
+    import ffmpeg
+    rng = None
+    cache_key = None
+    if cache:
+        cache_key = clip_cache_key(
+            clip,
+            width=width,
+            height=height,
+            speed=speed,
+            pan_and_zoom=pan_and_zoom,
+            clip_settings=clip_settings,
+            caption_settings=caption_settings,
+            caption_bg_settings=caption_bg_settings,
+            audio_codec=audio_codec,
+            encoder_settings=encoder_settings,
+        )
+        cached_clip = cache.get(cache_key, suffix='.mp4', hold=True)
+        if cached_clip:
+            return cached_clip
+        rng = random.Random(cache_key)
+    rng = rng or random.Random()
+
+    duration = clip_duration(clip, speed=speed, clip_settings=clip_settings)
+    frames = None
+    video_source = None
+    if pan_and_zoom and clip_settings.pan_and_zoom_engine == "pillow" and clip.image_path:
+        motion = KenBurnsMotion.random(rng, duration, width, height, clip_settings)
+        # the frames are sped up afterwards like any other video, so a sped up clip needs more of them
+        frame_width, frame_height = ken_burns_frame_size(clip.image_path, motion, width, height)
+        frames = ken_burns_frames(clip.image_path, motion, width, height, frame_count=math.ceil(duration * speed * clip_settings.frame_rate) + 1, frame_size=(frame_width, frame_height))
+        video_source = ffmpeg.input('pipe:', format='rawvideo', pix_fmt='rgb24', s=f'{frame_width}x{frame_height}', framerate=clip_settings.frame_rate)
+        if (frame_width, frame_height) != (width, height):
+            video_source = video_source.filter('scale', width, height)
+    video_input, audio_input = _clip_streams(
+        clip,
+        duration=duration,
+        width=width,
+        height=height,
+        speed=speed,
+        pan_and_zoom=pan_and_zoom,
+        clip_settings=clip_settings,
+        caption_settings=caption_settings,
+        caption_bg_settings=caption_bg_settings,
+        video_source=video_source,
+        rng=rng,
+        prerendered_motion=frames is not None,
+        lease=lease,
+    )
+
+    input_streams = [video_input] if audio_input is None else [video_input, audio_input]
+    output_path = cache.temp_path(suffix='.mp4') if cache else artifacts.scratch_path(suffix='.mp4')
+    output = (
+        ffmpeg.output(*input_streams, output_path, acodec=audio_codec, ar=AUDIO_SAMPLE_RATE, ac=AUDIO_CHANNELS, r=clip_settings.frame_rate, t=duration, **encoder_settings.to_dict())
+        .overwrite_output()
+    )
+    return _ClipJob(output=output, output_path=output_path, frames=frames, cache=cache, cache_key=cache_key)
+
+def _run_with_frames(output, frames):
+    """
+    Runs an ffmpeg output whose video input is 'pipe:', writing the given raw frames to ffmpeg's stdin as it encodes.
+    Raises ffmpeg.Error like ffmpeg-python's run if ffmpeg fails.
+    """
+    import ffmpeg
+    import subprocess
+    # stderr goes to a file rather than a pipe, so ffmpeg can't block on a full pipe while we're busy writing frames
+    with tempfile.TemporaryFile() as stderr:
+        process = subprocess.Popen(output.compile(), stdin=subprocess.PIPE, stderr=stderr)
+        try:
+            for frame in frames:
+                process.stdin.write(frame)
+            process.stdin.close()
+        except BrokenPipeError:
+            pass # ffmpeg stops reading once it has enough frames for the clip
+        except BaseException: # e.g. the frames failed to render, or KeyboardInterrupt
+            # otherwise ffmpeg would be left waiting on stdin for frames that never come
+            process.kill()
+            process.wait()
+            raise
+        if process.wait() != 0:
+            stderr.seek(0)
+            raise ffmpeg.Error('ffmpeg', None, stderr.read())
+
+async def _arun(output, frames: Iterator[bytes] | None = None):
+    """
+    Runs an ffmpeg output with asyncio.create_subprocess_exec, so waiting on ffmpeg doesn't block the event loop or a thread.
+    If frames are given, they are written to ffmpeg's stdin as it encodes, like _run_with_frames.
+    Raises ffmpeg.Error like ffmpeg-python's run if ffmpeg fails.
+    """
+    import ffmpeg
+    process = await asyncio.create_subprocess_exec(
+        *output.compile(),
+        stdin=asyncio.subprocess.PIPE if frames is not None else asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    # stdin and stderr were requested as pipes above, so they are never None
+    assert process.stderr is not None
+    # stderr is read alongside, so ffmpeg can't block on a full pipe while we're busy writing frames
+    stderr = asyncio.ensure_future(process.stderr.read())
+    try:
+        if frames is not None:
+            assert process.stdin is not None
+            try:
+                # the frames are rendered by Pillow, so each one is rendered off the event loop
+                while (frame := await asyncio.to_thread(next, frames, None)) is not None:
+                    process.stdin.write(frame)
+                    await process.stdin.drain()
+                process.stdin.close()
+            except (BrokenPipeError, ConnectionResetError):
+                pass # ffmpeg stops reading once it has enough frames for the clip
+        returncode = await process.wait()
+    except BaseException: # e.g. cancelled because another clip failed
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+        stderr.cancel()
+        raise
+    if returncode != 0:
+        raise ffmpeg.Error('ffmpeg', None, await stderr)
+    await stderr
+
+def _mix_background_music(audio, background_music:str|None, bgm_volume:float, duration:float):
+    """
+    Mixes the background music into the given audio stream, trimmed to the given duration.
+    Returns the audio stream unchanged if there is no background music.
+
+    The music's loudness is measured once per song (see music.loudness.track_loudness), so normalizing it here is a static gain
+    instead of a loudnorm pass over the whole song. The music is trimmed as it's read, so nothing past the end of the video is decoded.
+    """
+    import ffmpeg
+    from ...music.loudness import track_loudness
+    if not background_music:
+        return audio
+    bgm_input = ffmpeg.input(background_music, t=duration).audio
+    loudness = track_loudness(background_music)
+    if loudness is not None:
+        bgm_input = bgm_input.filter('volume', f"{loudness.gain_to(bgm_volume):.2f}dB")
+    else: # couldn't be measured, so fall back to normalizing while rendering
+        bgm_input = bgm_input.filter('loudnorm', i=bgm_volume).filter('atrim', duration=duration)
+    return ffmpeg.filter([audio, bgm_input], 'amix')  # Mix concatenated audio and bgm
+
+def _final_video_output(
+        video,
+        audio,
+        output_filename:str,
+        audio_codec:Literal['mp3', 'aac'],
+        frame_rate:int=FRAME_RATE,
+        encoder_settings:EncoderSettings=FINAL_ENCODER_SETTINGS,
+    ):
+    """
+    Returns the ffmpeg output that encodes the final video and audio streams, and the sanitized output path.
+    """
+    import ffmpeg
+    sanitized_filename = output_filename.replace(':', '').replace('?', '')
+
+    # Output the concatenated streams
+    output = (
+        ffmpeg
+        .output(
+            video,
+            audio,
+            sanitized_filename,
+            acodec=audio_codec,
+            # the same audio format as the intermediate clips, so every render engine produces the same audio
+            ar=AUDIO_SAMPLE_RATE,
+            ac=AUDIO_CHANNELS,
+            r=frame_rate,
+            **encoder_settings.to_dict(),
+            )
+        .overwrite_output()
+    )
+
+    return output, sanitized_filename
 
 def concatenate_clips(
         filenames: List[str],
@@ -272,6 +852,10 @@ def concatenate_clips(
         background_music:str|None=None,
         bgm_volume:float=-24,
         audio_codec:Literal['mp3', 'aac']='mp3',
+        stream_copy:bool=False,
+        durations:List[float]|None=None,
+        frame_rate:int=FRAME_RATE,
+        encoder_settings:EncoderSettings=FINAL_ENCODER_SETTINGS,
         ):
     """
     Combines the given video clips into a single video file and returns the path to the concatenated video file.
@@ -279,11 +863,85 @@ def concatenate_clips(
     :param filenames: The list of video file paths to combine
     :param output_filename: The name of the output file
     :param background_music: The path to the background music file
-    :param bgm_volume: The volume of the background music, between 0 and 1
+    :param bgm_volume: The loudness of the background music in LUFS, good values are between -24 and -16
     :param audio_codec: The audio codec to use for the output video
+    :param stream_copy: If True, the video streams are joined with the concat demuxer and copied without re-encoding. Every clip must share the same resolution, frame rate and encoder settings
+    :param durations: The duration of each clip, if already known (e.g., from clip_duration). Otherwise the clips are probed
+    :param frame_rate: The frame rate of the output video
+    :param encoder_settings: The video encoder settings of the output video. Not used when stream copying, since the clips are already encoded
+    """
+    total_audio_duration = sum(durations) if durations is not None else sum(media_durations(filenames))
+    output, sanitized_filename, concat_list = _concatenation_output(
+        filenames,
+        output_filename,
+        background_music=background_music,
+        bgm_volume=bgm_volume,
+        audio_codec=audio_codec,
+        stream_copy=stream_copy,
+        total_duration=total_audio_duration,
+        frame_rate=frame_rate,
+        encoder_settings=encoder_settings,
+    )
+    try:
+        output.run(capture_stderr=True)
+    finally:
+        if concat_list:
+            os.remove(concat_list) # only needed while ffmpeg reads it
+    return sanitized_filename
+
+async def aconcatenate_clips(
+        filenames: List[str],
+        output_filename: str,
+        background_music:str|None=None,
+        bgm_volume:float=-24,
+        audio_codec:Literal['mp3', 'aac']='mp3',
+        stream_copy:bool=False,
+        durations:List[float]|None=None,
+        frame_rate:int=FRAME_RATE,
+        encoder_settings:EncoderSettings=FINAL_ENCODER_SETTINGS,
+        ):
+    """
+    The async version of concatenate_clips, which waits on ffmpeg without blocking the event loop. See concatenate_clips for the parameters.
+    """
+    total_audio_duration = sum(durations) if durations is not None else sum(await asyncio.to_thread(media_durations, filenames))
+    output, sanitized_filename, concat_list = _concatenation_output(
+        filenames,
+        output_filename,
+        background_music=background_music,
+        bgm_volume=bgm_volume,
+        audio_codec=audio_codec,
+        stream_copy=stream_copy,
+        total_duration=total_audio_duration,
+        frame_rate=frame_rate,
+        encoder_settings=encoder_settings,
+    )
+    try:
+        await _arun(output)
+    finally:
+        if concat_list:
+            os.remove(concat_list) # only needed while ffmpeg reads it
+    return sanitized_filename
+
+def _concatenation_output(
+        filenames: List[str],
+        output_filename: str,
+        background_music:str|None,
+        bgm_volume:float,
+        audio_codec:Literal['mp3', 'aac'],
+        stream_copy:bool,
+        total_duration:float,
+        frame_rate:int,
+        encoder_settings:EncoderSettings,
+        ):
+    """
+    Returns the ffmpeg output that combines the clips, the sanitized output path,
+    and the path of the concat list to delete once ffmpeg is done (None if not stream copying). See concatenate_clips for the parameters.
     """
     import ffmpeg
 
+    if stream_copy:
+        return _stream_copy_output(filenames, output_filename, background_music, bgm_volume, audio_codec, total_duration)
+
     # Create input sets for each file in the list
     input_clips = [ffmpeg.input(f) for f in filenames]
     
@@ -294,42 +952,550 @@ def concatenate_clips(
     # Concatenate each stream type separately
     concatenated_video = ffmpeg.concat(*video_streams, v=1, a=0)
     concatenated_audio = ffmpeg.concat(*audio_streams, v=0, a=1)
-
-    total_audio_duration = sum([float(ffmpeg.probe(f)['streams'][0]['duration']) for f in filenames])
     
     # If background music is provided, adjust its volume and mix it with concatenated audio
-    if background_music:
-        bgm_input = (
+    concatenated_audio = _mix_background_music(concatenated_audio, background_music, bgm_volume, total_duration)
+
+    output, sanitized_filename = _final_video_output(concatenated_video, concatenated_audio, output_filename, audio_codec, frame_rate=frame_rate, encoder_settings=encoder_settings)
+    return output, sanitized_filename, None
+
+def _stream_copy_output(
+        filenames: List[str],
+        output_filename: str,
+        background_music:str|None,
+        bgm_volume:float,
+        audio_codec:Literal['mp3', 'aac'],
+        total_duration:float,
+        ):
+    """
+    Returns the ffmpeg output that joins the clips with the concat demuxer, copying the video and re-encoding only the (mixed) audio,
+    along with the sanitized output path and the path of the concat list it reads.
+    """
+    import ffmpeg
+
+    with tempfile.NamedTemporaryFile(mode='w', suffix='.txt', delete=False) as concat_list:
+        for filename in filenames:
+            escaped = os.path.abspath(filename).replace("'", "'\\''")
+            concat_list.write(f"file '{escaped}'\n")
+
+    try:
+        joined = ffmpeg.input(concat_list.name, f='concat', safe=0)
+        audio = _mix_background_music(joined.audio, background_music, bgm_volume, total_duration)
+
+        sanitized_filename = output_filename.replace(':', '').replace('?', '')
+        output = (
             ffmpeg
-            .input(background_music)
-            # .filter('volume', str(bgm_volume)) # old way, ~.25 worked well
-            .filter('loudnorm', i=bgm_volume) # new way, more consistent
-            .filter('atrim', duration=total_audio_duration)
+            .output(
+                joined.video,
+                audio,
+                sanitized_filename,
+                vcodec='copy',
+                acodec=audio_codec,
+                )
+            .overwrite_output()
         )
-        concatenated_audio = ffmpeg.filter([concatenated_audio, bgm_input], 'amix')  # Mix concatenated audio and bgm
+    except BaseException:
+        os.remove(concat_list.name)
+        raise
+    return output, sanitized_filename, concat_list.name
 
-    sanitized_filename = output_filename.replace(':', '').replace('?', '')
+def _video_source_key(clip: Clip):
+    if clip.image_path is None:
+        return ('blank', None)
+    return ('image', clip.image_path)
 
-    # Output the concatenated streams
-    (
-        ffmpeg
-        .output(
-            concatenated_video,
-            concatenated_audio,
-            sanitized_filename,
-            vcodec='libx264',
-            pix_fmt='yuv420p', # necessary for compatibility
-            acodec=audio_codec,
-            r=FRAME_RATE,
-            preset=FFMPEG_QUALITY,
-            **{'b:v': '8000K'}
-            )
-        .overwrite_output()
-        .run(capture_stderr=True)
+def _audio_source_key(clip: Clip):
+    if clip.audio_path is None:
+        return ('silence', None)
+    return ('audio', clip.audio_path)
+
+def _split_sources(keys: list, make_source, split_filter: str) -> dict:
+    """
+    Opens each distinct source once and returns a dict of key -> list of streams, one stream per use of that key.
+    """
+    from collections import Counter
+    branches = {}
+    for key, uses in Counter(keys).items():
+        source = make_source(key)
+        if uses == 1:
+            branches[key] = [source]
+        else:
+            split = source.filter_multi_output(split_filter, uses)
+            branches[key] = [split.stream(i) for i in range(uses)]
+    return branches
+
+def render_video_single_pass(
+        script: Script,
+        output_path: str='output.mp4',
+        width:int=720,
+        height:int=1280,
+        speed:float=1.0,
+        pan_and_zoom:bool=True,
+        clip_settings:ClipSettings=ClipSettings(),
+        caption_settings:CaptionSettings=CaptionSettings(),
+        caption_bg_settings:BoxSettings|ShadowSettings=BoxSettings(),
+        bgm_volume:float=-24,
+        audio_codec:Literal['mp3', 'aac']='mp3',
+        encoder_settings:EncoderSettings=FINAL_ENCODER_SETTINGS,
+        lease:Lease|None=None,
+    ):
+    """
+    Renders a video from the given script with a single ffmpeg process and returns the path to the rendered video file.
+
+    Every clip is wired into one filter graph and concatenated in memory,
+    so the video is encoded exactly once and no intermediate clip files are written.
+    Only one ffmpeg process runs, so this engine does not use max_workers.
+
+    :param script: The script to render
+    :param output_path: The path to save the rendered video
+    :param width: The width of the video
+    :param height: The height of the video
+    :param speed: The speed of the final video. 1.0 is normal speed
+    :param pan_and_zoom: If True, the pan and zoom effect on images will be enabled
+    :param clip_settings: The settings for rendering the video clips
+    :param caption_settings: The settings for the captions
+    :param caption_bg_settings: The settings for the caption background
+    :param bgm_volume: The volume of the background music, good values are between -24 and -16
+    :param audio_codec: The audio codec to use for the output video
+    :param encoder_settings: The video encoder settings of the output video
+    :param lease: The lease that holds the caption images from the pillow caption engine. Without one, they are not held, and may be deleted once the store needs the space
+    """
+    import ffmpeg
+    output, sanitized_filename = _single_pass_output(
+        script,
+        output_path,
+        width=width,
+        height=height,
+        speed=speed,
+        pan_and_zoom=pan_and_zoom,
+        clip_settings=clip_settings,
+        caption_settings=caption_settings,
+        caption_bg_settings=caption_bg_settings,
+        bgm_volume=bgm_volume,
+        audio_codec=audio_codec,
+        encoder_settings=encoder_settings,
+        lease=lease,
     )
+    print("Rendering final video...")
+    try:
+        output.run(capture_stderr=True)
+    except ffmpeg.Error as e:
+        print('FFmpeg Error:', e.stderr.decode() if e.stderr else str(e))
+        raise Exception(f"ffmpeg error: {e.stderr.decode() if e.stderr else str(e)}")
+    return sanitized_filename
 
+async def arender_video_single_pass(
+        script: Script,
+        output_path: str='output.mp4',
+        width:int=720,
+        height:int=1280,
+        speed:float=1.0,
+        pan_and_zoom:bool=True,
+        clip_settings:ClipSettings=ClipSettings(),
+        caption_settings:CaptionSettings=CaptionSettings(),
+        caption_bg_settings:BoxSettings|ShadowSettings=BoxSettings(),
+        bgm_volume:float=-24,
+        audio_codec:Literal['mp3', 'aac']='mp3',
+        encoder_settings:EncoderSettings=FINAL_ENCODER_SETTINGS,
+        lease:Lease|None=None,
+    ):
+    """
+    The async version of render_video_single_pass, which waits on ffmpeg without blocking the event loop. See render_video_single_pass for the parameters.
+    """
+    import ffmpeg
+    output, sanitized_filename = _single_pass_output(
+        script,
+        output_path,
+        width=width,
+        height=height,
+        speed=speed,
+        pan_and_zoom=pan_and_zoom,
+        clip_settings=clip_settings,
+        caption_settings=caption_settings,
+        caption_bg_settings=caption_bg_settings,
+        bgm_volume=bgm_volume,
+        audio_codec=audio_codec,
+        encoder_settings=encoder_settings,
+        lease=lease,
+    )
+    print("Rendering final video...")
+    try:
+        await _arun(output)
+    except ffmpeg.Error as e:
+        print('FFmpeg Error:', e.stderr.decode() if e.stderr else str(e))
+        raise Exception(f"ffmpeg error: {e.stderr.decode() if e.stderr else str(e)}")
     return sanitized_filename
 
+def _single_pass_output(
+        script: Script,
+        output_path: str,
+        width:int,
+        height:int,
+        speed:float,
+        pan_and_zoom:bool,
+        clip_settings:ClipSettings,
+        caption_settings:CaptionSettings,
+        caption_bg_settings:BoxSettings|ShadowSettings,
+        bgm_volume:float,
+        audio_codec:Literal['mp3', 'aac'],
+        encoder_settings:EncoderSettings,
+        lease:Lease|None,
+    ):
+    """
+    Returns the ffmpeg output that renders the whole script in one graph, and the sanitized output path. See render_video_single_pass for the parameters.
+    """
+    import ffmpeg
+    width = int(round(width))
+    frame_rate = clip_settings.frame_rate
+    height = int(round(height))
+
+    # ffmpeg-python merges identical nodes, and a looping input feeding several clips would
+    # buffer frames for every clip that isn't playing yet. So each distinct source is opened once
+    # as a single frame (or a short silence) and split into one branch per clip that uses it
+    durations = [clip_duration(clip, speed=speed, clip_settings=clip_settings) for clip in script.clips]
+    video_keys = [_video_source_key(clip) for clip in script.clips]
+    audio_keys = [_audio_source_key(clip) for clip in script.clips]
+    video_branches = _split_sources(
+        video_keys,
+        lambda key: ffmpeg.input(key[1], framerate=frame_rate) if key[0] == 'image'
+            else ffmpeg.input(f'color=c=black:s={width}x{height}:r={frame_rate}:d={1/frame_rate}', f='lavfi'),
+        'split',
+    )
+    audio_branches = _split_sources(
+        audio_keys,
+        lambda key: ffmpeg.input(key[1]).audio if key[0] == 'audio'
+            else ffmpeg.input('anullsrc', format='lavfi', t=1/frame_rate).audio,
+        'asplit',
+    )
+
+    segments = []
+    total_duration = 0.0
+    for clip, duration, video_key, audio_key in tqdm(zip(script.clips, durations, video_keys, audio_keys), desc="Building video graph", total=len(script.clips)):
+        video_source = video_branches[video_key].pop().filter('loop', loop=-1, size=1)
+        audio_source = audio_branches[audio_key].pop()
+        if audio_key[0] == 'silence':
+            audio_source = audio_source.filter('apad', whole_dur=duration)
+        video, audio = _clip_streams(
+            clip,
+            duration=duration,
+            width=width,
+            height=height,
+            speed=speed,
+            pan_and_zoom=pan_and_zoom,
+            clip_settings=clip_settings,
+            caption_settings=caption_settings,
+            caption_bg_settings=caption_bg_settings,
+            video_source=video_source,
+            audio_source=audio_source,
+            lease=lease,
+        )
+        # intermediate files get trimmed by the muxer, but inside one graph every segment
+        # must end on its own and share the same geometry before it reaches the concat filter
+        video = (
+            video
+            .trim(duration=duration)
+            .setpts('PTS-STARTPTS')
+            .filter('setsar', 1)
+        )
+        audio = (
+            audio
+            .filter('atrim', duration=duration)
+            .filter('asetpts', 'PTS-STARTPTS')
+        )
+        segments.extend([video, audio])
+        total_duration += duration
+
+    concatenated = ffmpeg.concat(*segments, v=1, a=1).node
+    concatenated_video, concatenated_audio = concatenated[0], concatenated[1]
+    concatenated_audio = _mix_background_music(concatenated_audio, script.metadata.bgm_path, bgm_volume, total_duration)
+
+    return _final_video_output(concatenated_video, concatenated_audio, output_path, audio_codec, frame_rate=frame_rate, encoder_settings=encoder_settings)
+
+class ClipRenderer:
+    """
+    Renders intermediate clips on a worker pool as soon as they are submitted, then concatenates them in script order.
+
+    This lets rendering start before every asset of the script exists:
+    submit each clip once its audio and image are ready, and call finish once the rest of the script (e.g., the music) is done.
+
+    :param width: The width of the video
+    :param height: The height of the video
+    :param speed: The speed of the final video. 1.0 is normal speed
+    :param pan_and_zoom: If True, the pan and zoom effect on images will be enabled
+    :param clip_settings: The settings for rendering the video clips
+    :param caption_settings: The settings for the captions
+    :param caption_bg_settings: The settings for the caption background
+    :param bgm_volume: The volume of the background music, good values are between -24 and -16
+    :param audio_codec: The audio codec to use for the output video
+    :param max_workers: The maximum number of intermediate clips to render at the same time. Each worker runs its own ffmpeg process, so memory usage grows with this value
+    :param stream_copy: If True, clips are rendered with the final encoder settings and joined without re-encoding the video
+    :param clip_cache: A cache of rendered intermediate clips, so unchanged clips are not rendered again
+    :param encoder_profile: The encoder settings of the intermediate clips and the final video
+    :param lease: The lease that holds the caption images from the pillow caption engine. Without one, they are not held, and may be deleted once the store needs the space
+    """
+    def __init__(
+            self,
+            width:int=720,
+            height:int=1280,
+            speed:float=1.0,
+            pan_and_zoom:bool=True,
+            clip_settings:ClipSettings=ClipSettings(),
+            caption_settings:CaptionSettings=CaptionSettings(),
+            caption_bg_settings:BoxSettings|ShadowSettings=BoxSettings(),
+            bgm_volume:float=-24,
+            audio_codec:Literal['mp3', 'aac']='mp3',
+            max_workers:int=1,
+            stream_copy:bool=False,
+            clip_cache:DiskCache|None=None,
+            encoder_profile:EncoderProfile=ENCODER_PROFILES["final"],
+            lease:Lease|None=None,
+        ):
+        self.width = width
+        self.height = height
+        self.speed = speed
+        self.pan_and_zoom = pan_and_zoom
+        self.clip_settings = clip_settings
+        self.caption_settings = caption_settings
+        self.caption_bg_settings = caption_bg_settings
+        self.bgm_volume = bgm_volume
+        self.audio_codec = audio_codec
+        self.stream_copy = stream_copy
+        self.clip_cache = clip_cache
+        self.encoder_profile = encoder_profile
+        self.lease = lease
+        # each clip is an independent ffmpeg subprocess, so threads are enough to keep the cores busy
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_workers))
+        self._futures: dict[int, Future] = {}
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def submit(self, index: int, clip: Clip):
+        """
+        Starts rendering the clip at the given script index in the background.
+        A clip that was already submitted, or submitted after close, is not rendered.
+
+        :param index: The index of the clip in the script
+        :param clip: The clip to render, with its audio and image paths filled in
+        """
+        with self._lock:
+            if self._closed or index in self._futures:
+                return
+            self._futures[index] = self._executor.submit(
+                render_clip,
+                clip=clip,
+                width=self.width,
+                height=self.height,
+                clip_settings=self.clip_settings,
+                caption_settings=self.caption_settings,
+                caption_bg_settings=self.caption_bg_settings,
+                speed=self.speed,
+                pan_and_zoom=self.pan_and_zoom,
+                audio_codec=self.audio_codec,
+                encoder_settings=self.encoder_profile.final if self.stream_copy else self.encoder_profile.intermediate,
+                cache=self.clip_cache,
+                lease=self.lease,
+            )
+
+    def finish(self, script: Script, output_path: str='output.mp4') -> str:
+        """
+        Renders any clips that were not submitted yet, waits for every clip, and concatenates them into the final video.
+        Returns the path to the rendered video file.
+
+        :param script: The complete script, including the background music
+        :param output_path: The path to save the rendered video
+        """
+        for i, clip in enumerate(script.clips):
+            self.submit(i, clip)
+        # waiting in script order keeps the concatenation order deterministic
+        futures = [self._futures[i] for i in range(len(script.clips))]
+        try:
+            try:
+                for future in tqdm(futures, desc="Rendering intermediate video clips"):
+                    if future.exception():
+                        # the clips that haven't started are dropped, and shutdown waits for the running ones
+                        for other in futures:
+                            other.cancel()
+                        future.result()
+            finally:
+                self._executor.shutdown()
+            intermediate_clips = [future.result() for future in futures]
+            if self.clip_cache:
+                print(self.clip_cache.summary())
+
+            print("Rendering final video...")
+            return concatenate_clips(
+                intermediate_clips,
+                output_path,
+                background_music=script.metadata.bgm_path,
+                bgm_volume=self.bgm_volume,
+                audio_codec=self.audio_codec,
+                stream_copy=self.stream_copy,
+                # every clip is rendered with exactly this duration, so there's no need to probe them
+                durations=[clip_duration(clip, speed=self.speed, clip_settings=self.clip_settings) for clip in script.clips],
+                frame_rate=self.clip_settings.frame_rate,
+                encoder_settings=self.encoder_profile.final,
+            )
+        finally:
+            _release_clips(futures, self.clip_cache)
+
+    def close(self):
+        """
+        Abandons the render, e.g. because an asset of the script failed to generate:
+        drops the clips that haven't started, waits for the running ones, and releases every rendered clip.
+        Call it instead of finish, not after it.
+        """
+        with self._lock:
+            self._closed = True
+            futures = list(self._futures.values())
+        for future in futures:
+            future.cancel()
+        self._executor.shutdown()
+        _release_clips(futures, self.clip_cache)
+
+class AsyncClipRenderer:
+    """
+    The async version of ClipRenderer, which renders each clip with its own ffmpeg subprocess on the event loop instead of on a thread pool,
+    so one event loop can render many videos at once. Up to max_workers clips of this renderer run at the same time.
+
+    Create it inside the event loop that will run it. submit can be called from other threads too, e.g., from a worker thread's callback.
+    The parameters are the same as ClipRenderer's.
+    """
+    def __init__(
+            self,
+            width:int=720,
+            height:int=1280,
+            speed:float=1.0,
+            pan_and_zoom:bool=True,
+            clip_settings:ClipSettings=ClipSettings(),
+            caption_settings:CaptionSettings=CaptionSettings(),
+            caption_bg_settings:BoxSettings|ShadowSettings=BoxSettings(),
+            bgm_volume:float=-24,
+            audio_codec:Literal['mp3', 'aac']='mp3',
+            max_workers:int=1,
+            stream_copy:bool=False,
+            clip_cache:DiskCache|None=None,
+            encoder_profile:EncoderProfile=ENCODER_PROFILES["final"],
+            lease:Lease|None=None,
+        ):
+        self.width = width
+        self.height = height
+        self.speed = speed
+        self.pan_and_zoom = pan_and_zoom
+        self.clip_settings = clip_settings
+        self.caption_settings = caption_settings
+        self.caption_bg_settings = caption_bg_settings
+        self.bgm_volume = bgm_volume
+        self.audio_codec = audio_codec
+        self.stream_copy = stream_copy
+        self.clip_cache = clip_cache
+        self.encoder_profile = encoder_profile
+        self.lease = lease
+        self._loop = asyncio.get_running_loop()
+        self._render_slots = asyncio.Semaphore(max(1, max_workers))
+        self._tasks: dict[int, asyncio.Task] = {}
+        self._closed = False
+
+    def submit(self, index: int, clip: Clip):
+        """
+        Starts rendering the clip at the given script index in the background.
+        A clip that was already submitted, or submitted after close, is not rendered.
+
+        :param index: The index of the clip in the script
+        :param clip: The clip to render, with its audio and image paths filled in
+        """
+        try:
+            on_loop = asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            on_loop = False
+        if on_loop:
+            self._start(index, clip)
+        else:
+            self._loop.call_soon_threadsafe(self._start, index, clip)
+
+    def _start(self, index: int, clip: Clip):
+        if self._closed or index in self._tasks:
+            return
+        self._tasks[index] = self._loop.create_task(self._render(clip))
+
+    async def _render(self, clip: Clip) -> str:
+        async with self._render_slots:
+            return await arender_clip(
+                clip=clip,
+                width=self.width,
+                height=self.height,
+                clip_settings=self.clip_settings,
+                caption_settings=self.caption_settings,
+                caption_bg_settings=self.caption_bg_settings,
+                speed=self.speed,
+                pan_and_zoom=self.pan_and_zoom,
+                audio_codec=self.audio_codec,
+                encoder_settings=self.encoder_profile.final if self.stream_copy else self.encoder_profile.intermediate,
+                cache=self.clip_cache,
+                lease=self.lease,
+            )
+
+    async def finish(self, script: Script, output_path: str='output.mp4') -> str:
+        """
+        Renders any clips that were not submitted yet, waits for every clip, and concatenates them into the final video.
+        Returns the path to the rendered video file.
+
+        :param script: The complete script, including the background music
+        :param output_path: The path to save the rendered video
+        """
+        from ...aio import gather
+        for i, clip in enumerate(script.clips):
+            self._start(i, clip)
+        # gathered in script order, which keeps the concatenation order deterministic
+        tasks = [self._tasks[i] for i in range(len(script.clips))]
+        progress = tqdm(desc="Rendering intermediate video clips", total=len(tasks))
+        for task in tasks:
+            task.add_done_callback(lambda _: progress.update())
+        try:
+            try:
+                # on the first failure, the other clips are cancelled and waited for before it's raised
+                intermediate_clips = await gather(*tasks)
+            finally:
+                progress.close()
+            if self.clip_cache:
+                print(self.clip_cache.summary())
+
+            print("Rendering final video...")
+            return await aconcatenate_clips(
+                intermediate_clips,
+                output_path,
+                background_music=script.metadata.bgm_path,
+                bgm_volume=self.bgm_volume,
+                audio_codec=self.audio_codec,
+                stream_copy=self.stream_copy,
+                # every clip is rendered with exactly this duration, so there's no need to probe them
+                durations=[clip_duration(clip, speed=self.speed, clip_settings=self.clip_settings) for clip in script.clips],
+                frame_rate=self.clip_settings.frame_rate,
+                encoder_settings=self.encoder_profile.final,
+            )
+        finally:
+            _release_clips(tasks, self.clip_cache)
+
+    async def close(self):
+        """
+        The async version of ClipRenderer.close, which cancels the clips that are rendering and waits for them to stop.
+        """
+        self._closed = True
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        _release_clips(tasks, self.clip_cache)
+
+def _release_clips(futures: list[Future] | list[asyncio.Task], clip_cache: DiskCache | None):
+    """
+    Releases every intermediate clip that rendered, including when another clip failed or the render was cancelled.
+    The clips are held by the cache, or by the artifact store if there is no cache.
+    """
+    store = clip_cache or artifacts.get_store()
+    for future in futures:
+        if future.done() and not future.cancelled() and future.exception() is None:
+            store.release(future.result())
+
 def render_video(
         script: Script,
         output_path: str='output.mp4',
@@ -342,6 +1508,11 @@ def render_video(
         caption_bg_settings:BoxSettings|ShadowSettings=BoxSettings(),
         bgm_volume:float=-24,
         audio_codec:Literal['mp3', 'aac']='mp3',
+        max_workers:int=1,
+        engine:RenderEngine="clips",
+        clip_cache:DiskCache|None=None,
+        encoder_profile:EncoderProfile|EncoderProfileName="final",
+        lease:Lease|None=None,
     ):
     """
     Renders a video from the given script and returns the path to the rendered video file.
@@ -359,29 +1530,104 @@ def render_video(
     :param caption_bg_settings: The settings for the caption background
     :param bgm_volume: The volume of the background music, good values are between -24 and -16
     :param audio_codec: The audio codec to use for the output video
+    :param max_workers: The maximum number of intermediate clips to render at the same time. Each worker runs its own ffmpeg process, so memory usage grows with this value
+    :param engine: "clips" renders each clip to an intermediate file and then concatenates them. "single_pass" renders the whole video with one ffmpeg graph and a single encode. "stream_copy" renders each clip with the final encoder settings and joins them without re-encoding the video.
+    :param clip_cache: A cache of rendered intermediate clips, so unchanged clips are not rendered again. Not used by the single_pass engine
+    :param encoder_profile: The encoder settings, or the name of a profile in ENCODER_PROFILES. "draft" encodes fast for previews, "standard" balances speed and size, "final" encodes slowly for the best quality per byte
+    :param lease: The lease that holds the caption images from the pillow caption engine. Without one, they are not held, and may be deleted once the store needs the space
     """
-    intermediate_clips = []    
-    for clip in tqdm(script.clips, desc="Rendering intermediate video clips"):
-        clip_file = render_clip(
-            clip=clip,
+    if isinstance(encoder_profile, str):
+        encoder_profile = ENCODER_PROFILES[encoder_profile]
+    if engine == "single_pass":
+        return render_video_single_pass(
+            script=script,
+            output_path=output_path,
             width=width,
             height=height,
+            speed=speed,
+            pan_and_zoom=pan_and_zoom,
             clip_settings=clip_settings,
             caption_settings=caption_settings,
             caption_bg_settings=caption_bg_settings,
+            bgm_volume=bgm_volume,
+            audio_codec=audio_codec,
+            encoder_settings=encoder_profile.final,
+            lease=lease,
+        )
+
+    renderer = ClipRenderer(
+        width=width,
+        height=height,
+        speed=speed,
+        pan_and_zoom=pan_and_zoom,
+        clip_settings=clip_settings,
+        caption_settings=caption_settings,
+        caption_bg_settings=caption_bg_settings,
+        bgm_volume=bgm_volume,
+        audio_codec=audio_codec,
+        max_workers=max_workers,
+        stream_copy=engine == "stream_copy",
+        clip_cache=clip_cache,
+        encoder_profile=encoder_profile,
+        lease=lease,
+    )
+    return renderer.finish(script, output_path)
+
+async def arender_video(
+        script: Script,
+        output_path: str='output.mp4',
+        width:int=720,
+        height:int=1280,
+        speed:float=1.0,
+        pan_and_zoom:bool=True,
+        clip_settings:ClipSettings=ClipSettings(),
+        caption_settings:CaptionSettings=CaptionSettings(),
+        caption_bg_settings:BoxSettings|ShadowSettings=BoxSettings(),
+        bgm_volume:float=-24,
+        audio_codec:Literal['mp3', 'aac']='mp3',
+        max_workers:int=1,
+        engine:RenderEngine="clips",
+        clip_cache:DiskCache|None=None,
+        encoder_profile:EncoderProfile|EncoderProfileName="final",
+        lease:Lease|None=None,
+    ):
+    """
+    The async version of render_video, which runs ffmpeg with asyncio subprocesses instead of blocking threads on them.
+    See render_video for the parameters.
+    """
+    if isinstance(encoder_profile, str):
+        encoder_profile = ENCODER_PROFILES[encoder_profile]
+    if engine == "single_pass":
+        return await arender_video_single_pass(
+            script=script,
+            output_path=output_path,
+            width=width,
+            height=height,
             speed=speed,
             pan_and_zoom=pan_and_zoom,
+            clip_settings=clip_settings,
+            caption_settings=caption_settings,
+            caption_bg_settings=caption_bg_settings,
+            bgm_volume=bgm_volume,
             audio_codec=audio_codec,
+            encoder_settings=encoder_profile.final,
+            lease=lease,
         )
-        intermediate_clips.append(clip_file)
 
-    print("Rendering final video...")
-    final_video_path = concatenate_clips(
-        intermediate_clips,
-        output_path,
-        background_music=script.metadata.bgm_path,
+    renderer = AsyncClipRenderer(
+        width=width,
+        height=height,
+        speed=speed,
+        pan_and_zoom=pan_and_zoom,
+        clip_settings=clip_settings,
+        caption_settings=caption_settings,
+        caption_bg_settings=caption_bg_settings,
         bgm_volume=bgm_volume,
         audio_codec=audio_codec,
+        max_workers=max_workers,
+        stream_copy=engine == "stream_copy",
+        clip_cache=clip_cache,
+        encoder_profile=encoder_profile,
+        lease=lease,
     )
-    
-    return final_video_path
\ No newline at end of file
+    return await renderer.finish(script, output_path)
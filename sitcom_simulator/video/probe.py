@@ -0,0 +1,160 @@
+from typing import Iterable, List
+import os
+import struct
+import threading
+import logging
+
+# cached durations by (absolute path, modification time, size), so a changed file is probed again
+_durations: dict[tuple[str, int, int], float] = {}
+_lock = threading.Lock()
+
+def media_duration(path: str) -> float:
+    """
+    Returns the duration of an audio or video file in seconds.
+
+    WAV and MP3 durations are read straight from the file headers, without starting a process.
+    Other formats (and files the native readers don't understand) fall back to ffprobe.
+    Results are cached by path, modification time and size, so each file is only measured once per process.
+
+    :param path: The path to the media file
+    """
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+    with _lock:
+        if key in _durations:
+            return _durations[key]
+    duration = _native_duration(path)
+    if duration is None:
+        duration = _ffprobe_duration(path)
+    with _lock:
+        _durations[key] = duration
+    return duration
+
+def media_durations(paths: Iterable[str], max_workers:int=4) -> List[float]:
+    """
+    Returns the durations of several media files, in the same order, measuring the files that need ffprobe in parallel.
+
+    :param paths: The paths to the media files
+    :param max_workers: The maximum number of files to measure at the same time
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    paths = list(paths)
+    if len(paths) <= 1:
+        return [media_duration(path) for path in paths]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(media_duration, paths))
+
+def _ffprobe_duration(path: str) -> float:
+    import ffmpeg
+    probe = ffmpeg.probe(path)
+    stream = probe['streams'][0]
+    return float(stream['duration'] if 'duration' in stream else probe['format']['duration'])
+
+def _native_duration(path: str) -> float | None:
+    try:
+        with open(path, 'rb') as f:
+            header = f.read(12)
+            f.seek(0)
+            if header[:4] == b'RIFF' and header[8:12] == b'WAVE':
+                return _wav_duration(f, os.path.getsize(path))
+            if header[:3] == b'ID3' or (len(header) >= 2 and header[0] == 0xFF and header[1] & 0xE0 == 0xE0):
+                return _mp3_duration(f.read())
+    except (OSError, ValueError, struct.error) as e:
+        logging.debug(f"Couldn't read the duration of {path} natively: {e}")
+    return None
+
+def _wav_duration(f, file_size: int) -> float | None:
+    """
+    Returns the duration of a WAV file from its fmt and data chunks.
+    """
+    f.seek(12)
+    byte_rate = None
+    while True:
+        chunk_header = f.read(8)
+        if len(chunk_header) < 8:
+            return None
+        chunk_id, chunk_size = struct.unpack('<4sI', chunk_header)
+        if chunk_id == b'fmt ':
+            fmt = f.read(chunk_size)
+            audio_format, channels, sample_rate, byte_rate = struct.unpack('<HHII', fmt[:12])
+            if audio_format not in (1, 3, 0xFFFE): # only uncompressed PCM has a fixed byte rate we can trust
+                return None
+            if chunk_size % 2:
+                f.seek(1, os.SEEK_CUR)
+        elif chunk_id == b'data':
+            if not byte_rate:
+                return None
+            # streamed WAVs may not know their length up front and leave the size at 0 or 0xFFFFFFFF
+            data_size = chunk_size if 0 < chunk_size < 0xFFFFFFFF else file_size - f.tell()
+            data_size = min(data_size, file_size - f.tell())
+            return data_size / byte_rate
+        else:
+            f.seek(chunk_size + chunk_size % 2, os.SEEK_CUR)
+
+_MP3_BITRATES = {
+    # (version is MPEG-1, layer) -> kbps by index
+    (True, 3): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    (True, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    (True, 1): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    (False, 3): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    (False, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    (False, 1): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+}
+_MP3_SAMPLE_RATES = {3: [44100, 48000, 32000], 2: [22050, 24000, 16000], 0: [11025, 12000, 8000]} # by version bits
+
+def _mp3_frame(data: bytes, offset: int):
+    """
+    Parses the MPEG audio frame header at the offset and returns (frame length, samples per frame, sample rate), or None if there is no valid header.
+    """
+    if offset + 4 > len(data) or data[offset] != 0xFF or data[offset + 1] & 0xE0 != 0xE0:
+        return None
+    version_bits = (data[offset + 1] >> 3) & 0x3
+    layer = 4 - ((data[offset + 1] >> 1) & 0x3)
+    bitrate_index = data[offset + 2] >> 4
+    sample_rate_index = (data[offset + 2] >> 2) & 0x3
+    padding = (data[offset + 2] >> 1) & 0x1
+    if version_bits == 1 or layer == 4 or bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None
+    mpeg1 = version_bits == 3
+    bitrate = _MP3_BITRATES[(mpeg1, layer)][bitrate_index] * 1000
+    sample_rate = _MP3_SAMPLE_RATES[version_bits][sample_rate_index]
+    if layer == 1:
+        return (12 * bitrate // sample_rate + padding) * 4, 384, sample_rate
+    samples = 1152 if layer == 2 or mpeg1 else 576
+    return samples // 8 * bitrate // sample_rate + padding, samples, sample_rate
+
+def _mp3_duration(data: bytes) -> float | None:
+    """
+    Returns the duration of an MP3 file, from its Xing/Info header if it has one or by counting its frames otherwise.
+    """
+    offset = 0
+    if data[:3] == b'ID3':
+        size = data[6:10]
+        offset = 10 + ((size[0] << 21) | (size[1] << 14) | (size[2] << 7) | size[3])
+        if data[5] & 0x10: # footer present
+            offset += 10
+    first_frame = _mp3_frame(data, offset)
+    if first_frame is None:
+        return None
+    _, samples_per_frame, sample_rate = first_frame
+
+    # VBR files usually say how many frames they have in the first frame
+    for tag in (b'Xing', b'Info'):
+        tag_offset = data.find(tag, offset, offset + 64)
+        if tag_offset != -1:
+            flags = struct.unpack('>I', data[tag_offset + 4:tag_offset + 8])[0]
+            if flags & 0x1:
+                frame_count = struct.unpack('>I', data[tag_offset + 8:tag_offset + 12])[0]
+                return frame_count * samples_per_frame / sample_rate
+
+    samples = 0
+    while True:
+        frame = _mp3_frame(data, offset)
+        if frame is None or frame[0] <= 0:
+            break
+        frame_length, frame_samples, _ = frame
+        samples += frame_samples
+        offset += frame_length
+    if samples == 0:
+        return None
+    return samples / sample_rate
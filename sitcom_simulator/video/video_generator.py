@@ -1,5 +1,11 @@
-from typing import List, Literal
-from ..models import Script
+from typing import List, Literal, Optional, Callable
+from ..models import Script, Clip
+from ..cache import DiskCache, get_cache
+from ..artifacts import Lease
+
+# --draft renders a quick preview to check timing: small, choppy and without pan and zoom
+DRAFT_RESOLUTION = 540 # 540x960 in portrait, since x264 needs even dimensions
+DRAFT_FRAME_RATE = 12
 
 def render_video(
         script: Script,
@@ -20,8 +26,17 @@ def render_video(
         max_zoom_factor:float=1.3,
         min_zoom_factor:float=1.05,
         max_pan_speed:float=6,
+        pan_and_zoom_engine:Literal['zoompan', 'pillow']='zoompan',
+        caption_engine:Literal['drawtext', 'pillow']='drawtext',
+        frame_rate:int=24,
         bgm_volume:float=-24,
         audio_codec:Literal['mp3', 'aac']='mp3',
+        max_workers:int=1,
+        engine:Literal['clips', 'single_pass', 'stream_copy']='clips',
+        cache_clips:bool=False,
+        encoder_profile:Literal['draft', 'standard', 'final']='final',
+        clip_cache:DiskCache | None = None,
+        lease:Lease | None = None,
     ):
     """
     Renders a video from the given script and returns the path to the rendered video.
@@ -44,47 +59,562 @@ def render_video(
     :param max_zoom_factor: The maximum zoom factor for pan and zoom
     :param min_zoom_factor: The minimum zoom factor for pan and zoom
     :param max_pan_speed: The maximum pan speed for pan and zoom
+    :param pan_and_zoom_engine: How the pan and zoom effect is rendered. "zoompan" uses ffmpeg's zoompan filter on an upscaled image. "pillow" warps the image at the output size with Pillow, which is much faster. The single_pass engine always uses zoompan.
+    :param caption_engine: How captions are drawn. "drawtext" draws them on every frame with ffmpeg's drawtext filter. "pillow" rasterizes each caption once with Pillow and overlays the image, which is faster. Falls back to drawtext if Pillow can't load the font.
+    :param frame_rate: The frame rate of the video. Lower frame rates render faster, e.g. for drafts.
     :param bgm_volume: The volume of the background music
     :param audio_codec: The audio codec to use for the video. mp3 seems to be more compatible with more video players, but aac is higher quality and is necessary for viewing videos in an iPhone browser.
+    :param max_workers: The maximum number of intermediate clips to render in parallel. Higher values render faster on machines with many cores, but use more memory.
+    :param engine: The render engine to use. "clips" renders each clip to its own file before concatenating them, while "single_pass" builds one ffmpeg graph for the whole video and encodes it exactly once. "stream_copy" renders each clip with the final encoder settings and joins them without re-encoding the video, which makes the final step much faster for long scripts.
+    :param cache_clips: If True, rendered clips are kept in a persistent on-disk cache, so re-rendering a script only renders the clips whose inputs changed.
+    :param encoder_profile: The encoder quality tier. "draft" encodes as fast as possible for previews, "standard" balances speed and size, and "final" encodes slowly for the best quality per byte.
+    :param clip_cache: The cache of rendered clips to use instead of the persistent one, e.g. a RenderManifest. Takes precedence over cache_clips. Not used by the single_pass engine.
+    :param lease: The lease that holds the images and audio downloaded from the script's URLs in the artifact store, and the caption images drawn by the pillow caption engine. Without one, they are not held, and may be deleted once the store needs the space.
     """
 
-    # rely on image_path first, but if it's not there and image_url is, download the image
-    import requests
-    import tempfile
-    for i, clip in enumerate(script.clips):
-        if clip.image_path:
-            continue
-        if clip.image_url:
+    from .integrations import ffmpeg
+
+    if engine != 'single_pass':
+        renderer = create_renderer(
+            font=font,
+            resolution=resolution,
+            orientation=orientation,
+            speed=speed,
+            pan_and_zoom=pan_and_zoom,
+            clip_buffer_seconds=clip_buffer_seconds,
+            min_clip_seconds=min_clip_seconds,
+            speaking_delay_seconds=speaking_delay_seconds,
+            caption_bg_style=caption_bg_style,
+            caption_bg_alpha=caption_bg_alpha,
+            caption_bg_color=caption_bg_color,
+            caption_bg_shadow_distance_x=caption_bg_shadow_distance_x,
+            caption_bg_shadow_distance_y=caption_bg_shadow_distance_y,
+            max_zoom_factor=max_zoom_factor,
+            min_zoom_factor=min_zoom_factor,
+            max_pan_speed=max_pan_speed,
+            pan_and_zoom_engine=pan_and_zoom_engine,
+            caption_engine=caption_engine,
+            frame_rate=frame_rate,
+            bgm_volume=bgm_volume,
+            audio_codec=audio_codec,
+            max_workers=max_workers,
+            engine=engine,
+            cache_clips=cache_clips,
+            encoder_profile=encoder_profile,
+            clip_cache=clip_cache,
+            lease=lease,
+        )
+        # clips whose assets are already local start rendering while the rest are downloading
+        script = prefetch_assets(script, on_clip_ready=renderer.submit, lease=lease)
+        return renderer.finish(script, output_path)
+
+    script = prefetch_assets(script, lease=lease)
+
+    settings = _ffmpeg_settings(
+        font=font,
+        resolution=resolution,
+        orientation=orientation,
+        clip_buffer_seconds=clip_buffer_seconds,
+        min_clip_seconds=min_clip_seconds,
+        speaking_delay_seconds=speaking_delay_seconds,
+        caption_bg_style=caption_bg_style,
+        caption_bg_alpha=caption_bg_alpha,
+        caption_bg_color=caption_bg_color,
+        caption_bg_shadow_distance_x=caption_bg_shadow_distance_x,
+        caption_bg_shadow_distance_y=caption_bg_shadow_distance_y,
+        max_zoom_factor=max_zoom_factor,
+        min_zoom_factor=min_zoom_factor,
+        max_pan_speed=max_pan_speed,
+        pan_and_zoom_engine=pan_and_zoom_engine,
+        caption_engine=caption_engine,
+        frame_rate=frame_rate,
+    )
+
+    return ffmpeg.render_video(
+        script=script,
+        output_path=output_path,
+        speed=speed,
+        pan_and_zoom=pan_and_zoom,
+        bgm_volume=bgm_volume,
+        audio_codec=audio_codec,
+        engine=engine,
+        encoder_profile=encoder_profile,
+        lease=lease,
+        **settings,
+    )
+
+async def arender_video(
+        script: Script,
+        font: str,
+        output_path="output.mp4",
+        resolution:int=1080,
+        orientation:str="portrait",
+        speed:float=1.0,
+        pan_and_zoom:bool=True,
+        clip_buffer_seconds:float=0.35,
+        min_clip_seconds:float=1.5,
+        speaking_delay_seconds:float=0.12,
+        caption_bg_style:Literal['box_shadow', 'text_shadow', 'none']='text_shadow',
+        caption_bg_alpha:float=0.6,
+        caption_bg_color:str="black",
+        caption_bg_shadow_distance_x:float=5,
+        caption_bg_shadow_distance_y:float=5,
+        max_zoom_factor:float=1.3,
+        min_zoom_factor:float=1.05,
+        max_pan_speed:float=6,
+        pan_and_zoom_engine:Literal['zoompan', 'pillow']='zoompan',
+        caption_engine:Literal['drawtext', 'pillow']='drawtext',
+        frame_rate:int=24,
+        bgm_volume:float=-24,
+        audio_codec:Literal['mp3', 'aac']='mp3',
+        max_workers:int=1,
+        engine:Literal['clips', 'single_pass', 'stream_copy']='clips',
+        cache_clips:bool=False,
+        encoder_profile:Literal['draft', 'standard', 'final']='final',
+        clip_cache:DiskCache | None = None,
+        lease:Lease | None = None,
+    ):
+    """
+    The async version of render_video. Downloads and ffmpeg runs are awaited instead of blocking threads,
+    so one event loop can render many videos at once. See render_video for the parameters.
+    """
+
+    from .integrations import ffmpeg
+
+    if engine != 'single_pass':
+        renderer = await acreate_renderer(
+            font=font,
+            resolution=resolution,
+            orientation=orientation,
+            speed=speed,
+            pan_and_zoom=pan_and_zoom,
+            clip_buffer_seconds=clip_buffer_seconds,
+            min_clip_seconds=min_clip_seconds,
+            speaking_delay_seconds=speaking_delay_seconds,
+            caption_bg_style=caption_bg_style,
+            caption_bg_alpha=caption_bg_alpha,
+            caption_bg_color=caption_bg_color,
+            caption_bg_shadow_distance_x=caption_bg_shadow_distance_x,
+            caption_bg_shadow_distance_y=caption_bg_shadow_distance_y,
+            max_zoom_factor=max_zoom_factor,
+            min_zoom_factor=min_zoom_factor,
+            max_pan_speed=max_pan_speed,
+            pan_and_zoom_engine=pan_and_zoom_engine,
+            caption_engine=caption_engine,
+            frame_rate=frame_rate,
+            bgm_volume=bgm_volume,
+            audio_codec=audio_codec,
+            max_workers=max_workers,
+            engine=engine,
+            cache_clips=cache_clips,
+            encoder_profile=encoder_profile,
+            clip_cache=clip_cache,
+            lease=lease,
+        )
+        # clips whose assets are already local start rendering while the rest are downloading
+        script = await aprefetch_assets(script, on_clip_ready=renderer.submit, lease=lease)
+        return await renderer.finish(script, output_path)
+
+    script = await aprefetch_assets(script, lease=lease)
+
+    settings = _ffmpeg_settings(
+        font=font,
+        resolution=resolution,
+        orientation=orientation,
+        clip_buffer_seconds=clip_buffer_seconds,
+        min_clip_seconds=min_clip_seconds,
+        speaking_delay_seconds=speaking_delay_seconds,
+        caption_bg_style=caption_bg_style,
+        caption_bg_alpha=caption_bg_alpha,
+        caption_bg_color=caption_bg_color,
+        caption_bg_shadow_distance_x=caption_bg_shadow_distance_x,
+        caption_bg_shadow_distance_y=caption_bg_shadow_distance_y,
+        max_zoom_factor=max_zoom_factor,
+        min_zoom_factor=min_zoom_factor,
+        max_pan_speed=max_pan_speed,
+        pan_and_zoom_engine=pan_and_zoom_engine,
+        caption_engine=caption_engine,
+        frame_rate=frame_rate,
+    )
+
+    return await ffmpeg.arender_video(
+        script=script,
+        output_path=output_path,
+        speed=speed,
+        pan_and_zoom=pan_and_zoom,
+        bgm_volume=bgm_volume,
+        audio_codec=audio_codec,
+        engine=engine,
+        encoder_profile=encoder_profile,
+        lease=lease,
+        **settings,
+    )
+
+def prefetch_assets(
+        script: Script,
+        on_clip_ready: Optional[Callable[[int, Clip], None]] = None,
+        max_downloads:int=8,
+        lease:Lease | None = None,
+    ) -> Script:
+    """
+    Downloads every clip's missing image and audio (from image_url and audio_url) concurrently,
+    and returns the script with the local paths filled in. Paths that are already set are used as-is.
+
+    Each distinct URL is downloaded only once, even if several clips use it.
+    Failed downloads are logged and leave the path empty, like a clip without that asset.
+
+    :param script: The script whose assets to download
+    :param on_clip_ready: A callback to call as soon as each clip's assets are all local which takes the clip index and the clip with its paths filled in
+    :param max_downloads: The maximum number of files to download at the same time
+    :param lease: The lease that holds the downloaded files in the artifact store. Without one, they are not held, and may be deleted once the store needs the space
+    """
+    from .. import transport, artifacts
+    from concurrent.futures import ThreadPoolExecutor, Future
+    import threading
+    import logging
+
+    def download(url: str, suffix: str) -> str:
+        path = artifacts.scratch_path(suffix=suffix)
+        return artifacts.adopt(transport.download(url, path), lease=lease)
+
+    clips = list(script.clips)
+    reported: set[int] = set()
+    lock = threading.Lock()
+    with ThreadPoolExecutor(max_workers=max(1, max_downloads)) as executor:
+        downloads: dict[str, Future] = {}
+        # for each clip, the downloads it's waiting for: (field name, url)
+        waiting_for: list[list[tuple[str, str]]] = []
+        for clip in clips:
+            needed = _missing_downloads(clip)
+            for field, url in needed:
+                if url not in downloads:
+                    downloads[url] = executor.submit(download, url, _download_suffix(field, url))
+            waiting_for.append(needed)
+
+        def on_download_finished(i: int):
+            with lock:
+                if i in reported or not all(downloads[url].done() for _, url in waiting_for[i]):
+                    return
+                reported.add(i) # so the clip is only reported once
+                paths = {}
+                for field, url in waiting_for[i]:
+                    try:
+                        paths[field] = downloads[url].result()
+                    except Exception as e:
+                        logging.error(f"Failed to download {field.split('_')[0]} for clip {i}: {e}")
+                clips[i] = clips[i].replace(**paths)
+                clip = clips[i]
+            if on_clip_ready:
+                on_clip_ready(i, clip)
+
+        def download_callback(i: int) -> Callable[[Future], None]:
+            def on_done(_: Future):
+                on_download_finished(i)
+            return on_done
+
+        for i, needed in enumerate(waiting_for):
+            if not needed:
+                if on_clip_ready:
+                    on_clip_ready(i, clips[i])
+                continue
+            for _, url in needed:
+                downloads[url].add_done_callback(download_callback(i))
+
+    return script.replace(clips=clips)
+
+async def aprefetch_assets(
+        script: Script,
+        on_clip_ready: Optional[Callable[[int, Clip], None]] = None,
+        max_downloads:int=8,
+        lease:Lease | None = None,
+    ) -> Script:
+    """
+    The async version of prefetch_assets, which downloads without blocking the event loop. See prefetch_assets for the parameters.
+    Requires httpx (pip install sitcom-simulator[async]) if any asset has to be downloaded.
+    """
+    from .. import transport, artifacts
+    from ..aio import gather
+    import asyncio
+    import logging
+
+    download_slots = asyncio.Semaphore(max(1, max_downloads))
+
+    async def download(url: str, suffix: str) -> str:
+        async with download_slots:
+            path = artifacts.scratch_path(suffix=suffix)
+            return artifacts.adopt(await transport.adownload(url, path), lease=lease)
+
+    clips = list(script.clips)
+    downloads: dict[str, asyncio.Task] = {}
+    # for each clip, the downloads it's waiting for: (field name, url)
+    waiting_for = [_missing_downloads(clip) for clip in clips]
+    for needed in waiting_for:
+        for field, url in needed:
+            if url not in downloads:
+                downloads[url] = asyncio.ensure_future(download(url, _download_suffix(field, url)))
+
+    async def fetch(i: int):
+        paths = {}
+        for field, url in waiting_for[i]:
             try:
-                response = requests.get(clip.image_url)
-                image_path = tempfile.NamedTemporaryFile(suffix=".png", delete=False).name
-                with open(image_path, 'wb') as f:
-                    f.write(response.content)
-                clip.image_path = image_path
+                paths[field] = await downloads[url]
             except Exception as e:
-                import logging
-                logging.error(f"Failed to download image for clip {i}: {e}")
+                logging.error(f"Failed to download {field.split('_')[0]} for clip {i}: {e}")
+        clips[i] = clips[i].replace(**paths)
+        if on_clip_ready:
+            on_clip_ready(i, clips[i])
+
+    try:
+        await gather(*(fetch(i) for i in range(len(clips))))
+    finally:
+        for task in downloads.values():
+            task.cancel() # only the ones still running, if a callback failed
+    return script.replace(clips=clips)
 
+def _missing_downloads(clip: Clip) -> list[tuple[str, str]]:
+    """
+    Returns the downloads the clip is missing, as (field name, url) pairs.
+    """
+    needed = []
+    # rely on image_path first, but if it's not there and image_url is, download the image
+    if not clip.image_path and clip.image_url:
+        needed.append(('image_path', clip.image_url))
     # same thing but with audio
-    for i, clip in enumerate(script.clips):
-        if clip.audio_path:
-            continue
-        if clip.audio_url:
-            try:
-                ext = clip.audio_url.split('.')[-1]
-                response = requests.get(clip.audio_url)
-                audio_path = tempfile.NamedTemporaryFile(suffix=ext, delete=False).name
-                with open(audio_path, 'wb') as f:
-                    f.write(response.content)
-                clip.audio_path = audio_path
-            except Exception as e:
-                import logging
-                logging.error(f"Failed to download audio for clip {i}: {e}")
+    if not clip.audio_path and clip.audio_url:
+        needed.append(('audio_path', clip.audio_url))
+    return needed
+
+def _download_suffix(field: str, url: str) -> str:
+    return ".png" if field == 'image_path' else f".{url.split('.')[-1]}"
 
+def create_renderer(
+        font: str,
+        resolution:int=1080,
+        orientation:str="portrait",
+        speed:float=1.0,
+        pan_and_zoom:bool=True,
+        clip_buffer_seconds:float=0.35,
+        min_clip_seconds:float=1.5,
+        speaking_delay_seconds:float=0.12,
+        caption_bg_style:Literal['box_shadow', 'text_shadow', 'none']='text_shadow',
+        caption_bg_alpha:float=0.6,
+        caption_bg_color:str="black",
+        caption_bg_shadow_distance_x:float=5,
+        caption_bg_shadow_distance_y:float=5,
+        max_zoom_factor:float=1.3,
+        min_zoom_factor:float=1.05,
+        max_pan_speed:float=6,
+        pan_and_zoom_engine:Literal['zoompan', 'pillow']='zoompan',
+        caption_engine:Literal['drawtext', 'pillow']='drawtext',
+        frame_rate:int=24,
+        bgm_volume:float=-24,
+        audio_codec:Literal['mp3', 'aac']='mp3',
+        max_workers:int=1,
+        engine:Literal['clips', 'stream_copy']='clips',
+        cache_clips:bool=False,
+        encoder_profile:Literal['draft', 'standard', 'final']='final',
+        clip_cache:DiskCache | None = None,
+        lease:Lease | None = None,
+    ):
+    """
+    Returns a renderer that renders clips in the background as soon as they are submitted.
+
+    Use it to start rendering before every asset is ready, e.g., from the on_voice_downloaded and on_image_generated callbacks:
+    call renderer.submit(index, clip) once a clip's audio and image are local files,
+    then renderer.finish(script, output_path) to render any remaining clips and concatenate the final video.
+    The parameters mean the same as in render_video. The single_pass engine can't render clips separately, so it is not supported.
+    """
     from .integrations import ffmpeg
+    return ffmpeg.ClipRenderer(**_renderer_options(
+        font=font,
+        resolution=resolution,
+        orientation=orientation,
+        speed=speed,
+        pan_and_zoom=pan_and_zoom,
+        clip_buffer_seconds=clip_buffer_seconds,
+        min_clip_seconds=min_clip_seconds,
+        speaking_delay_seconds=speaking_delay_seconds,
+        caption_bg_style=caption_bg_style,
+        caption_bg_alpha=caption_bg_alpha,
+        caption_bg_color=caption_bg_color,
+        caption_bg_shadow_distance_x=caption_bg_shadow_distance_x,
+        caption_bg_shadow_distance_y=caption_bg_shadow_distance_y,
+        max_zoom_factor=max_zoom_factor,
+        min_zoom_factor=min_zoom_factor,
+        max_pan_speed=max_pan_speed,
+        pan_and_zoom_engine=pan_and_zoom_engine,
+        caption_engine=caption_engine,
+        frame_rate=frame_rate,
+        bgm_volume=bgm_volume,
+        audio_codec=audio_codec,
+        max_workers=max_workers,
+        engine=engine,
+        cache_clips=cache_clips,
+        encoder_profile=encoder_profile,
+        clip_cache=clip_cache,
+        lease=lease,
+    ))
+
+async def acreate_renderer(
+        font: str,
+        resolution:int=1080,
+        orientation:str="portrait",
+        speed:float=1.0,
+        pan_and_zoom:bool=True,
+        clip_buffer_seconds:float=0.35,
+        min_clip_seconds:float=1.5,
+        speaking_delay_seconds:float=0.12,
+        caption_bg_style:Literal['box_shadow', 'text_shadow', 'none']='text_shadow',
+        caption_bg_alpha:float=0.6,
+        caption_bg_color:str="black",
+        caption_bg_shadow_distance_x:float=5,
+        caption_bg_shadow_distance_y:float=5,
+        max_zoom_factor:float=1.3,
+        min_zoom_factor:float=1.05,
+        max_pan_speed:float=6,
+        pan_and_zoom_engine:Literal['zoompan', 'pillow']='zoompan',
+        caption_engine:Literal['drawtext', 'pillow']='drawtext',
+        frame_rate:int=24,
+        bgm_volume:float=-24,
+        audio_codec:Literal['mp3', 'aac']='mp3',
+        max_workers:int=1,
+        engine:Literal['clips', 'stream_copy']='clips',
+        cache_clips:bool=False,
+        encoder_profile:Literal['draft', 'standard', 'final']='final',
+        clip_cache:DiskCache | None = None,
+        lease:Lease | None = None,
+    ):
+    """
+    The async version of create_renderer, which returns an AsyncClipRenderer that renders clips on the running event loop.
+    Its submit method starts a clip like create_renderer's, and its finish method must be awaited.
+    The parameters mean the same as in render_video.
+    """
+    from .integrations import ffmpeg
+    return ffmpeg.AsyncClipRenderer(**_renderer_options(
+        font=font,
+        resolution=resolution,
+        orientation=orientation,
+        speed=speed,
+        pan_and_zoom=pan_and_zoom,
+        clip_buffer_seconds=clip_buffer_seconds,
+        min_clip_seconds=min_clip_seconds,
+        speaking_delay_seconds=speaking_delay_seconds,
+        caption_bg_style=caption_bg_style,
+        caption_bg_alpha=caption_bg_alpha,
+        caption_bg_color=caption_bg_color,
+        caption_bg_shadow_distance_x=caption_bg_shadow_distance_x,
+        caption_bg_shadow_distance_y=caption_bg_shadow_distance_y,
+        max_zoom_factor=max_zoom_factor,
+        min_zoom_factor=min_zoom_factor,
+        max_pan_speed=max_pan_speed,
+        pan_and_zoom_engine=pan_and_zoom_engine,
+        caption_engine=caption_engine,
+        frame_rate=frame_rate,
+        bgm_volume=bgm_volume,
+        audio_codec=audio_codec,
+        max_workers=max_workers,
+        engine=engine,
+        cache_clips=cache_clips,
+        encoder_profile=encoder_profile,
+        clip_cache=clip_cache,
+        lease=lease,
+    ))
+
+def _renderer_options(
+        font: str,
+        resolution:int=1080,
+        orientation:str="portrait",
+        speed:float=1.0,
+        pan_and_zoom:bool=True,
+        clip_buffer_seconds:float=0.35,
+        min_clip_seconds:float=1.5,
+        speaking_delay_seconds:float=0.12,
+        caption_bg_style:Literal['box_shadow', 'text_shadow', 'none']='text_shadow',
+        caption_bg_alpha:float=0.6,
+        caption_bg_color:str="black",
+        caption_bg_shadow_distance_x:float=5,
+        caption_bg_shadow_distance_y:float=5,
+        max_zoom_factor:float=1.3,
+        min_zoom_factor:float=1.05,
+        max_pan_speed:float=6,
+        pan_and_zoom_engine:Literal['zoompan', 'pillow']='zoompan',
+        caption_engine:Literal['drawtext', 'pillow']='drawtext',
+        frame_rate:int=24,
+        bgm_volume:float=-24,
+        audio_codec:Literal['mp3', 'aac']='mp3',
+        max_workers:int=1,
+        engine:Literal['clips', 'stream_copy']='clips',
+        cache_clips:bool=False,
+        encoder_profile:Literal['draft', 'standard', 'final']='final',
+        clip_cache:DiskCache | None = None,
+        lease:Lease | None = None,
+    ) -> dict:
+    """
+    Translates the user-facing render options into the arguments of ClipRenderer and AsyncClipRenderer.
+    """
+    from .integrations import ffmpeg
+
+    if engine not in ['clips', 'stream_copy']:
+        raise ValueError(f"Engine {engine} does not render clips separately")
+
+    settings = _ffmpeg_settings(
+        font=font,
+        resolution=resolution,
+        orientation=orientation,
+        clip_buffer_seconds=clip_buffer_seconds,
+        min_clip_seconds=min_clip_seconds,
+        speaking_delay_seconds=speaking_delay_seconds,
+        caption_bg_style=caption_bg_style,
+        caption_bg_alpha=caption_bg_alpha,
+        caption_bg_color=caption_bg_color,
+        caption_bg_shadow_distance_x=caption_bg_shadow_distance_x,
+        caption_bg_shadow_distance_y=caption_bg_shadow_distance_y,
+        max_zoom_factor=max_zoom_factor,
+        min_zoom_factor=min_zoom_factor,
+        max_pan_speed=max_pan_speed,
+        pan_and_zoom_engine=pan_and_zoom_engine,
+        caption_engine=caption_engine,
+        frame_rate=frame_rate,
+    )
+
+    return dict(
+        speed=speed,
+        pan_and_zoom=pan_and_zoom,
+        bgm_volume=bgm_volume,
+        audio_codec=audio_codec,
+        max_workers=max_workers,
+        stream_copy=engine == "stream_copy",
+        clip_cache=clip_cache or (get_cache("clips") if cache_clips else None),
+        encoder_profile=ffmpeg.ENCODER_PROFILES[encoder_profile],
+        lease=lease,
+        **settings,
+    )
+
+def _ffmpeg_settings(
+        font: str,
+        resolution:int,
+        orientation:str,
+        clip_buffer_seconds:float,
+        min_clip_seconds:float,
+        speaking_delay_seconds:float,
+        caption_bg_style:Literal['box_shadow', 'text_shadow', 'none'],
+        caption_bg_alpha:float,
+        caption_bg_color:str,
+        caption_bg_shadow_distance_x:float,
+        caption_bg_shadow_distance_y:float,
+        max_zoom_factor:float,
+        min_zoom_factor:float,
+        max_pan_speed:float,
+        pan_and_zoom_engine:Literal['zoompan', 'pillow']='zoompan',
+        caption_engine:Literal['drawtext', 'pillow']='drawtext',
+        frame_rate:int=24,
+    ) -> dict:
+    """
+    Translates the user-facing render options into the dimensions and settings objects of the ffmpeg integration.
+    """
     from .integrations.ffmpeg import ClipSettings, CaptionSettings, BoxSettings, ShadowSettings
 
-    caption_bg_settings = None
+    caption_bg_settings: BoxSettings | ShadowSettings | None = None
     if caption_bg_style == 'box_shadow':
         caption_bg_settings = BoxSettings(
             alpha=caption_bg_alpha,
@@ -94,27 +624,25 @@ def render_video(
         caption_bg_settings = ShadowSettings(
             alpha=caption_bg_alpha,
             color='black',
-            x=caption_bg_shadow_distance_x,
-            y=caption_bg_shadow_distance_y,
+            # drawtext only takes whole-pixel shadow offsets
+            x=round(caption_bg_shadow_distance_x),
+            y=round(caption_bg_shadow_distance_y),
         )
 
     aspect_ratio = 16 / 9
 
     width, height = {
-        "landscape": (resolution * aspect_ratio, resolution),
-        "portrait": (resolution, resolution * aspect_ratio),
+        "landscape": (round(resolution * aspect_ratio), resolution),
+        "portrait": (resolution, round(resolution * aspect_ratio)),
         "square": (resolution, resolution),
     }[orientation]
 
-    return ffmpeg.render_video(
-        script=script,
-        output_path=output_path,
+    return dict(
         width=width,
         height=height,
-        speed=speed,
-        pan_and_zoom=pan_and_zoom,
         caption_settings=CaptionSettings(
             font=font,
+            engine=caption_engine,
         ),
         clip_settings=ClipSettings(
             clip_buffer_seconds=clip_buffer_seconds,
@@ -123,8 +651,8 @@ def render_video(
             max_zoom_factor=max_zoom_factor,
             min_zoom_factor=min_zoom_factor,
             max_pan_speed=max_pan_speed,
+            pan_and_zoom_engine=pan_and_zoom_engine,
+            frame_rate=frame_rate,
         ),
         caption_bg_settings=caption_bg_settings,
-        bgm_volume=bgm_volume,
-        audio_codec=audio_codec,
-    )
\ No newline at end of file
+    )